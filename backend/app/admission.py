@@ -0,0 +1,190 @@
+"""
+Admission control for heavy requests.
+
+``/analyze`` first passes the analysis gate: at most ``ANALYSIS_CONCURRENCY`` analyses run
+per worker, at most ``ANALYSIS_QUEUE`` more wait for a slot, and anything beyond that is
+refused at once with ``429`` and a ``Retry-After`` estimate. A request that waits longer
+than ``ADMISSION_TIMEOUT`` seconds gets ``503``. Admitted analyses run on the gate's own
+thread pool, so the event loop and the shared thread pool stay free for cheap endpoints.
+
+Inside an analysis, stages with their own resource profile (extraction, model inference,
+report rendering) are further limited by ``StageLimiter``s, which bound concurrency and
+the number of waiters the same way.
+
+Limits are per worker process; queue depth, active slots, waits and rejections are
+exported as Prometheus metrics labelled by limiter.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+
+from .metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT, ADMISSION_REJECTIONS
+
+
+class AdmissionRejected(Exception):
+    """Raised when a limiter refuses work; rendered as 429/503 with Retry-After"""
+
+    def __init__(self, limiter: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{limiter} is overloaded ({reason})")
+        self.limiter = limiter
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Limiter:
+    """Bookkeeping shared by the async gate and the thread-level stage limiters"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'timeout': 0}
+        self._hold_seconds = None  # moving average of slot hold time, for Retry-After
+        self._active_gauge = ADMISSION_ACTIVE.labels(name)
+        self._queue_gauge = ADMISSION_QUEUE_DEPTH.labels(name)
+        self._wait_histogram = ADMISSION_WAIT.labels(name)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queued work divided over the slots"""
+        hold = self._hold_seconds if self._hold_seconds is not None else 1.0
+        return max(1, math.ceil(hold * (self.waiting + 1) / self.limit))
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        ADMISSION_REJECTIONS.labels(self.name, reason).inc()
+        return AdmissionRejected(self.name, status_code, self.retry_after(), reason)
+
+    def _entered(self, waited: float):
+        self.active += 1
+        self.admitted += 1
+        self._active_gauge.inc()
+        self._wait_histogram.observe(waited)
+
+    def _left(self, held: float):
+        self.active -= 1
+        self._active_gauge.dec()
+        self._hold_seconds = held if self._hold_seconds is None else 0.8 * self._hold_seconds + 0.2 * held
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'limit': self.limit,
+            'queue_size': self.queue_size,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'retry_after': self.retry_after()
+        }
+
+
+class AdmissionGate(_Limiter):
+    """Request-level limiter awaited on the event loop; runs admitted work on its own threads"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        super().__init__(name, limit, queue_size, timeout)
+        self._semaphore = None  # created lazily inside the running event loop
+        self._executor = ThreadPoolExecutor(max_workers=self.limit, thread_name_prefix=name)
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Wait for a slot (or be rejected), then run ``func(*args)`` on the gate's threads"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.waiting >= self.queue_size:
+            raise self._reject(429, 'queue_full')
+
+        started = time.perf_counter()
+        self.waiting += 1
+        self._queue_gauge.inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(503, 'timeout')
+        finally:
+            self.waiting -= 1
+            self._queue_gauge.dec()
+
+        acquired = time.perf_counter()
+        self._entered(acquired - started)
+
+        def release(_=None):
+            self._left(time.perf_counter() - acquired)
+            self._semaphore.release()
+
+        # Copy the context so request-scoped state (profiling) follows the work
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, lambda: context.run(func, *args))
+        try:
+            return await asyncio.shield(future)
+        finally:
+            # A disconnected client cancels the request, not the running thread: keep the
+            # slot until the work has actually finished
+            if future.done():
+                release()
+            else:
+                future.add_done_callback(release)
+
+    @classmethod
+    def from_env(cls) -> "AdmissionGate":
+        return cls(
+            "analysis",
+            limit=int(os.getenv("ANALYSIS_CONCURRENCY", "2")),
+            queue_size=int(os.getenv("ANALYSIS_QUEUE", "16")),
+            timeout=float(os.getenv("ADMISSION_TIMEOUT", "30"))
+        )
+
+
+class StageLimiter(_Limiter):
+    """Blocking limiter for one pipeline stage, used from worker threads"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        super().__init__(name, limit, queue_size, timeout)
+        self._semaphore = threading.Semaphore(self.limit)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            if self.active >= self.limit and self.waiting >= self.queue_size:
+                raise self._reject(503, 'queue_full')
+            self.waiting += 1
+            self._queue_gauge.inc()
+
+        started = time.perf_counter()
+        acquired = self._semaphore.acquire(timeout=self.timeout)
+        with self._lock:
+            self.waiting -= 1
+            self._queue_gauge.dec()
+            if not acquired:
+                raise self._reject(503, 'timeout')
+            self._entered(time.perf_counter() - started)
+
+        entered = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._left(time.perf_counter() - entered)
+            self._semaphore.release()
+
+    @classmethod
+    def from_env(cls, stage: str, default_limit: int) -> "StageLimiter":
+        """Configure from {STAGE}_CONCURRENCY, {STAGE}_QUEUE and STAGE_TIMEOUT"""
+        prefix = stage.upper()
+        return cls(
+            stage,
+            limit=int(os.getenv(f"{prefix}_CONCURRENCY", str(default_limit))),
+            queue_size=int(os.getenv(f"{prefix}_QUEUE", "16")),
+            timeout=float(os.getenv("STAGE_TIMEOUT", "60"))
+        )
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -18,6 +18,30 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def add_missing_columns(bind=engine):
+    """Add columns declared on the models that existing tables lack, with their indexes
+
+    ``create_all`` only creates missing tables, so columns added to a model after its table
+    was created would otherwise break every query on it. Idempotent; runs at startup after
+    ``create_all``. New columns are added as nullable, the form every database accepts on a
+    table that already has rows.
+    """
+    existing_tables = set(inspect(bind).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspect(bind).get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        if not missing:
+            continue
+        with bind.begin() as connection:
+            for column in missing:
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        for index in table.indexes:
+            if any(column in missing for column in index.columns):
+                index.create(bind, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
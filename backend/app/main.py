@@ -1,22 +1,49 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from contextlib import nullcontext
+from datetime import date, datetime
+import asyncio
+import logging
 import os
+import time
 import uuid
 from typing import List, Optional
-import aiofiles
 
-from .database import get_db, engine
-from .models import Base, Contract
-from .schemas import ContractResponse, AnalysisResponse, ClauseResponse
-from .services.text_extractor import TextExtractor
-from .services.nlp_analyzer import NLPAnalyzer
+from .database import get_db, engine, SessionLocal, add_missing_columns
+from .models import Base, Contract, ContractClause
+from .schemas import (
+    ContractResponse, AnalysisResponse, ClauseResponse, SearchHit, SearchResponse, SimilarContract,
+    RescoreRequest, RescoreResponse, SimilarClauseRequest, SimilarClause, UpgradeResponse, AnalyticsResponse
+)
+from .services.text_extractor import TextExtractor, FAST_PDF_AVAILABLE
 from .services.risk_scorer import RiskScorer
 from .services.pdf_generator import PDFGenerator
+from .admission import AdmissionGate, AdmissionRejected, StageLimiter
+from .profiling import RequestProfiler, ProfilingMiddleware, annotate as annotate_profile
+from .metrics import (
+    PrometheusMiddleware, CONTENT_TYPE_LATEST, ANALYSES_IN_FLIGHT, DOCUMENTS_PROCESSED,
+    PAGES_PROCESSED, CLAUSES_PROCESSED, CACHE_LOOKUPS, DEGRADED_STAGES, stage_timer, render_latest
+)
+from .services.search_index import SearchIndex
+from .services.clause_cache import ClauseCache
+from .services.similarity_index import SimilarityIndex
+from .services.embedding_store import EmbeddingStore
+from .services.storage import BlobStore
+from .services.model_serving import create_nlp_analyzer
+from .services.rescoring import bulk_rescore
+from .services.pipeline import extract_stored, store_analysis, remove_contract
+from .services.exporter import ResultExporter, EXPORT_TABLES, MEDIA_TYPES, PARQUET_AVAILABLE
+from .services.time_budget import BudgetPlanner, TimeBudget
+from .services.analytics import PortfolioAnalytics
+
+logger = logging.getLogger(__name__)
 
-# Create tables
+# Create tables, and add columns introduced since an existing database was created
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
 
 app = FastAPI(title="Legal Contract Analyzer API", version="1.0.0")
 
@@ -28,16 +55,63 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware)
+
+# Opt-in capture of slow requests (PROFILING_ENABLED=true)
+request_profiler = RequestProfiler.from_env()
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
 
 # Initialize services
-text_extractor = TextExtractor()
-nlp_analyzer = NLPAnalyzer()
-risk_scorer = RiskScorer()
+text_extractor = TextExtractor.from_env()
+clause_cache = ClauseCache.from_env()
+nlp_analyzer = create_nlp_analyzer(clause_cache=clause_cache)
+risk_scorer = RiskScorer.from_env()
 pdf_generator = PDFGenerator()
+search_index = SearchIndex(engine)
+similarity_index = SimilarityIndex()
+embedding_store = EmbeddingStore.from_env()
+blob_store = BlobStore.from_env()
+analytics = PortfolioAnalytics()
+
+# Admission control: bounded analyses per worker, and per-stage limits inside them
+analysis_gate = AdmissionGate.from_env()
+extraction_limiter = StageLimiter.from_env("extraction", default_limit=analysis_gate.limit)
+inference_limiter = StageLimiter.from_env("inference", default_limit=1)
+report_limiter = StageLimiter.from_env("report", default_limit=2)
+
+# Per-request time budgets (ANALYSIS_TIME_BUDGET) and the stage costs they are planned with
+budget_planner = BudgetPlanner.from_env()
 
-# Create upload directory
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+@app.on_event("startup")
+async def load_search_index():
+    if search_index.requires_rebuild:
+        db = SessionLocal()
+        try:
+            search_index.rebuild(db)
+        finally:
+            db.close()
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+def _clause_response(clause_id: str, category: str, content: str, risk_level: str,
+                     explanation: str, suggestion: Optional[str], page: Optional[int] = None,
+                     regions: Optional[List[dict]] = None) -> ClauseResponse:
+    return ClauseResponse(
+        id=clause_id,
+        type=category,
+        content=content[:200] + "..." if len(content) > 200 else content,
+        risk_level=risk_level,
+        explanation=explanation or '',
+        suggestion=suggestion or '',
+        page=page,
+        regions=regions
+    )
 
 @app.get("/")
 async def root():
@@ -52,29 +126,42 @@ async def upload_contract(
     if not file.filename.lower().endswith(('.pdf', '.docx')):
         raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported")
     
-    # Generate unique filename
     file_id = str(uuid.uuid4())
     file_extension = os.path.splitext(file.filename)[1]
-    stored_filename = f"{file_id}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, stored_filename)
-    
-    # Save file
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
-    
-    # Create database record
-    contract = Contract(
-        id=file_id,
-        filename=file.filename,
-        file_path=file_path,
-        file_type=file_extension[1:],  # Remove the dot
-        status="uploaded"
-    )
     
-    db.add(contract)
-    db.commit()
-    db.refresh(contract)
+    # Store by content hash; re-uploads of identical bytes share one blob
+    content_hash, file_size, _ = await run_in_threadpool(blob_store.put, file.file)
+    
+    def add_reference():
+        with blob_store.references(db, content_hash):
+            if not blob_store.find(content_hash):
+                # The last other contract with these bytes was deleted along with the blob meanwhile
+                file.file.seek(0)
+                blob_store.put(file.file)
+            
+            # Create database record
+            contract = Contract(
+                id=file_id,
+                filename=file.filename,
+                file_path=blob_store.locator(content_hash),
+                file_type=file_extension[1:],  # Remove the dot
+                content_hash=content_hash,
+                file_size=file_size,
+                status="uploaded"
+            )
+            
+            db.add(contract)
+            try:
+                db.commit()
+            except Exception:
+                # Do not leave a blob behind that no contract references
+                db.rollback()
+                blob_store.release(db, content_hash)
+                raise
+        db.refresh(contract)
+        return contract
+    
+    contract = await run_in_threadpool(add_reference)
     
     return ContractResponse(
         id=contract.id,
@@ -84,61 +171,236 @@ async def upload_contract(
     )
 
 @app.post("/analyze/{contract_id}", response_model=AnalysisResponse)
-async def analyze_contract(contract_id: str, db: Session = Depends(get_db)):
+async def analyze_contract(
+    contract_id: str,
+    background_tasks: BackgroundTasks,
+    reuse_similar: bool = Query(True, description="Seed the summary from a near-duplicate prior analysis"),
+    mode: str = Query("abstractive", pattern="^(fast|abstractive)$",
+                      description="fast: extractive TextRank summary; abstractive: BART summary"),
+    budget: Optional[float] = Query(None, gt=0,
+                                    description="Seconds the analysis may take; stages are degraded to meet it"),
+    upgrade: bool = Query(False, description="Re-run degraded stages in full in the background"),
+    db: Session = Depends(get_db)
+):
     """Analyze a contract for clauses, risks, and generate summary"""
+    # The clock starts on arrival: waiting for admission uses up the budget too
+    time_budget = budget_planner.start(budget)
+    contract = db.query(Contract).filter(Contract.id == contract_id).first()
+    if not contract:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    
+    # Refused early under load; once admitted the work runs off the event loop
+    response = await analysis_gate.run(_run_analysis, contract_id, reuse_similar, mode, time_budget)
+    if upgrade and response.degraded_stages:
+        background_tasks.add_task(_upgrade_analysis, contract_id)
+        response.upgrading = True
+    return response
+
+@app.post("/analyze/{contract_id}/upgrade", response_model=UpgradeResponse, status_code=202)
+async def upgrade_analysis(contract_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Re-run the stages a time budget degraded; the degraded result is served until it finishes"""
     contract = db.query(Contract).filter(Contract.id == contract_id).first()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
+    if contract.status != "completed":
+        raise HTTPException(status_code=400, detail=f"Analysis not completed. Status: {contract.status}")
     
+    if contract.degraded_stages:
+        background_tasks.add_task(_upgrade_analysis, contract_id)
+    return UpgradeResponse(
+        contract_id=contract_id,
+        degraded_stages=contract.degraded_stages,
+        upgrading=bool(contract.degraded_stages)
+    )
+
+# Times a background upgrade is turned away by the analysis gate before it is given up
+UPGRADE_ATTEMPTS = 5
+
+async def _upgrade_analysis(contract_id: str):
+    db = SessionLocal()
     try:
-        # Update status
-        contract.status = "analyzing"
-        db.commit()
+        for attempt in range(UPGRADE_ATTEMPTS):
+            db.expire_all()
+            contract = db.query(Contract).filter(Contract.id == contract_id).first()
+            if not contract or contract.status != "completed" or not contract.degraded_stages:
+                return
+            # A degraded summary was asked for as abstractive; otherwise keep the mode it has
+            mode = "abstractive" if "summarization" in contract.degraded_stages else contract.summary_mode or "abstractive"
+            try:
+                await analysis_gate.run(_run_analysis, contract_id, True, mode, budget_planner.unlimited(), True)
+                return
+            except AdmissionRejected as e:
+                if attempt == UPGRADE_ATTEMPTS - 1:
+                    raise
+                # Background work yields to requests under load: wait as told, then try again
+                await asyncio.sleep(e.retry_after)
+    except Exception as e:
+        # The degraded result stays in place and reports the failure; the upgrade can be requested again
+        logger.warning(f"Upgrade of analysis {contract_id} failed: {e}")
+        db.rollback()
+        contract = db.query(Contract).filter(Contract.id == contract_id).first()
+        if contract and contract.status == "completed":
+            contract.error_message = f"Upgrade failed: {e}"
+            db.commit()
+    finally:
+        db.close()
+
+def _run_analysis(contract_id: str, reuse_similar: bool, mode: str, budget: TimeBudget,
+                  upgrade: bool = False) -> AnalysisResponse:
+    # A session of its own: admitted work runs on after a client disconnects, when the
+    # request's session is closed under it
+    db = SessionLocal()
+    try:
+        contract = db.query(Contract).filter(Contract.id == contract_id).first()
+        if not contract:
+            raise HTTPException(status_code=404, detail="Contract not found")
+        return _analyze(db, contract, reuse_similar, mode, budget, upgrade)
+    finally:
+        db.close()
+
+def _analyze(db: Session, contract: Contract, reuse_similar: bool, mode: str, budget: TimeBudget,
+             upgrade: bool) -> AnalysisResponse:
+    contract_id = contract.id
+    previous_status = contract.status
+    # Bind the request profile to this gate thread before the first stage, so extraction is
+    # sampled instead of the idle event loop
+    annotate_profile(contract_id=contract_id)
+    ANALYSES_IN_FLIGHT.inc()
+    try:
+        # Update status; an upgrade keeps serving the degraded result meanwhile
+        if not upgrade:
+            contract.status = "analyzing"
+            db.commit()
         
-        # Extract text
-        text = text_extractor.extract_text(contract.file_path, contract.file_type)
+        # Extract text; PDFs take the text layer only when full extraction would overrun the budget
+        file_size = contract.file_size or os.path.getsize(contract.file_path)
+        is_pdf = contract.file_type.lower() == "pdf"
+        fast_extraction = is_pdf and FAST_PDF_AVAILABLE and not budget.fits("extraction", file_size)
+        with extraction_limiter.slot(), stage_timer("extraction"):
+            with budget.measure("extraction", file_size if is_pdf and not fast_extraction else 0):
+                document = extract_stored(text_extractor, blob_store, contract, fast=fast_extraction)
+        if fast_extraction:
+            budget.degrade("extraction", "text layer only")
+        PAGES_PROCESSED.labels(contract.file_type).inc(document.page_count)
+        annotate_profile(
+            file_type=contract.file_type,
+            file_size=file_size,
+            page_count=document.page_count,
+            text_length=len(document.text)
+        )
         
         # Analyze with NLP
-        clauses = nlp_analyzer.classify_clauses(text)
-        risky_clauses = nlp_analyzer.detect_risky_clauses(text)
-        summary = nlp_analyzer.generate_summary(text)
+        with stage_timer("classification"):
+            clauses = nlp_analyzer.classify_clauses(document)
+        CLAUSES_PROCESSED.inc(len(clauses))
+        annotate_profile(clause_count=len(clauses))
+        with stage_timer("risk_patterns"):
+            risky_clauses = nlp_analyzer.detect_risky_clauses(document)
         
-        # Calculate risk score
-        risk_score = risk_scorer.calculate_risk_score(clauses, risky_clauses)
+        # Near-identical copies of an analyzed template reuse its summary instead of re-running it
+        with stage_timer("similarity"):
+            signature = similarity_index.signature([clause['text'] for clause in clauses] or [document.text])
+            seed = None
+            if reuse_similar:
+                matches = similarity_index.find_similar(
+                    db, signature, threshold=similarity_index.reuse_threshold, limit=1, exclude=contract_id
+                )
+                seed = db.query(Contract).filter(Contract.id == matches[0]['contract_id']).first() if matches else None
         
-        # Update contract with results
-        contract.extracted_text = text
-        contract.summary = summary
-        contract.risk_score = risk_score
-        contract.status = "completed"
+        # A fast summary is never reused for an abstractive request
+        if seed and seed.summary and (mode == "fast" or seed.summary_mode != "fast"):
+            summary = seed.summary
+            summary_mode = seed.summary_mode or "abstractive"
+            CACHE_LOOKUPS.labels("similar_summary", "hit").inc()
+        else:
+            seed = None
+            if reuse_similar:
+                CACHE_LOOKUPS.labels("similar_summary", "miss").inc()
+            # Abstractive chunks that fit the budget; none left means an extractive summary
+            chunks = len(nlp_analyzer.summary_chunks(document)) if mode == "abstractive" and nlp_analyzer.summarizer else 0
+            max_chunks = int(min(chunks, budget.affordable_units("summarization")))
+            if max_chunks < chunks:
+                if max_chunks:
+                    budget.degrade("summarization", f"{max_chunks} of {chunks} chunks")
+                else:
+                    mode = "fast"
+                    budget.degrade("summarization", "extractive")
+            with inference_limiter.slot() if mode == "abstractive" else nullcontext(), stage_timer("summarization"):
+                with budget.measure("summarization", max_chunks) as measured:
+                    summary, summary_mode = nlp_analyzer.summarize(document, mode=mode, risky_clauses=risky_clauses,
+                                                                   max_chunks=max_chunks or 3)
+                    # Only a BART summary that succeeded tells what a chunk costs
+                    if summary_mode != "abstractive":
+                        measured.units = 0
         
-        db.commit()
+        # Embeddings only serve clause similarity search; they are the first thing dropped
+        clause_vectors = None
+        embedded = len(clauses) if nlp_analyzer.classifier is not None else 0
+        if not budget.fits("embedding", embedded):
+            budget.degrade("embedding", "skipped")
+        else:
+            with inference_limiter.slot(), stage_timer("embedding"), budget.measure("embedding", embedded):
+                clause_vectors = nlp_analyzer.encode_clauses([clause['text'] for clause in clauses])
+        for stage in budget.degraded:
+            DEGRADED_STAGES.labels(stage).inc()
+        
+        # Calculate risk score, with the weights a re-score may have changed meanwhile
+        with stage_timer("scoring"):
+            risk_scorer.refresh()
+            risk_score = risk_scorer.calculate_risk_score(clauses, risky_clauses)
+        
+        with stage_timer("persistence"):
+            store_analysis(db, contract, {
+                'text': document.text,
+                'summary': summary,
+                'summary_mode': summary_mode,
+                'risk_score': risk_score,
+                'risk_breakdown': risk_scorer.get_risk_breakdown(clauses),
+                'risky_pattern_counts': risk_scorer.get_risky_pattern_counts(risky_clauses),
+                'clauses': clauses,
+                'risky_clauses': risky_clauses,
+                'signature': signature,
+                'degraded_stages': budget.degraded
+            }, search_index, similarity_index, embedding_store, analytics, clause_vectors)
+            db.commit()
+        DOCUMENTS_PROCESSED.labels(contract.file_type, "completed").inc()
         
         # Format clauses for response
-        clause_responses = []
-        for clause in clauses:
-            clause_responses.append(ClauseResponse(
-                id=str(uuid.uuid4()),
-                type=clause['category'],
-                content=clause['text'][:200] + "..." if len(clause['text']) > 200 else clause['text'],
-                risk_level=clause.get('risk_level', 'low'),
-                explanation=clause.get('explanation', ''),
-                suggestion=clause.get('suggestion', '')
-            ))
+        clause_responses = [
+            _clause_response(clause['id'], clause['category'], clause['text'],
+                             clause.get('risk_level', 'low'), clause.get('explanation', ''),
+                             clause.get('suggestion', ''), clause.get('page'), clause.get('regions'))
+            for clause in clauses
+        ]
         
         return AnalysisResponse(
             contract_id=contract_id,
             risk_score=risk_score,
             summary=summary,
             clauses=clause_responses,
-            status="completed"
+            status="completed",
+            seeded_from=seed.id if seed else None,
+            summary_mode=summary_mode,
+            degraded_stages=budget.degraded or None
         )
         
+    except AdmissionRejected:
+        # Overload is not an analysis failure; the client retries after Retry-After
+        db.rollback()
+        contract.status = previous_status
+        db.commit()
+        raise
     except Exception as e:
+        db.rollback()
+        if upgrade:
+            raise
         contract.status = "error"
         contract.error_message = str(e)
         db.commit()
+        DOCUMENTS_PROCESSED.labels(contract.file_type, "error").inc()
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    finally:
+        ANALYSES_IN_FLIGHT.dec()
 
 @app.get("/result/{contract_id}", response_model=AnalysisResponse)
 async def get_analysis_result(contract_id: str, db: Session = Depends(get_db)):
@@ -150,16 +412,32 @@ async def get_analysis_result(contract_id: str, db: Session = Depends(get_db)):
     if contract.status != "completed":
         raise HTTPException(status_code=400, detail=f"Analysis not completed. Status: {contract.status}")
     
-    # This is a simplified response - in a real implementation, 
-    # you'd store and retrieve the actual clause analysis results
+    clauses = (
+        db.query(ContractClause)
+        .filter(ContractClause.contract_id == contract_id)
+        .order_by(ContractClause.position)
+        .all()
+    )
+    
     return AnalysisResponse(
         contract_id=contract_id,
         risk_score=contract.risk_score or 0,
         summary=contract.summary or "",
-        clauses=[],
-        status=contract.status
+        clauses=[
+            _clause_response(clause.id, clause.category, clause.content, clause.risk_level,
+                             clause.explanation, clause.suggestion, clause.page, clause.regions)
+            for clause in clauses
+        ],
+        status=contract.status,
+        summary_mode=contract.summary_mode,
+        degraded_stages=contract.degraded_stages,
+        upgrade_error=contract.error_message
     )
 
+def _render_report(contract: Contract) -> str:
+    with report_limiter.slot():
+        return pdf_generator.generate_report(contract)
+
 @app.get("/download/{contract_id}")
 async def download_analysis_report(contract_id: str, db: Session = Depends(get_db)):
     """Download PDF report of contract analysis"""
@@ -170,8 +448,8 @@ async def download_analysis_report(contract_id: str, db: Session = Depends(get_d
     if contract.status != "completed":
         raise HTTPException(status_code=400, detail="Analysis not completed")
     
-    # Generate PDF report
-    report_path = pdf_generator.generate_report(contract)
+    # Generate PDF report off the event loop, within the report rendering limit
+    report_path = await run_in_threadpool(_render_report, contract)
     
     return FileResponse(
         report_path,
@@ -194,6 +472,208 @@ async def list_contracts(db: Session = Depends(get_db)):
         for contract in contracts
     ]
 
+@app.delete("/contracts/{contract_id}", status_code=204)
+def delete_contract(contract_id: str, db: Session = Depends(get_db)):
+    """Delete a contract, its analysis and, unless another contract shares it, its upload"""
+    contract = db.query(Contract).filter(Contract.id == contract_id).first()
+    if not contract:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    if contract.status == "analyzing":
+        raise HTTPException(status_code=409, detail="Analysis in progress")
+    
+    content_hash = contract.content_hash
+    file_path = contract.file_path
+    if not content_hash:
+        remove_contract(db, contract, search_index, similarity_index, embedding_store, analytics)
+        db.commit()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return Response(status_code=204)
+    
+    # Deduplicated uploads of the same bytes take this lock before adding their reference
+    with blob_store.references(db, content_hash):
+        remove_contract(db, contract, search_index, similarity_index, embedding_store, analytics)
+        db.commit()
+        blob_store.release(db, content_hash)
+    return Response(status_code=204)
+
+@app.get("/contracts/{contract_id}/similar", response_model=List[SimilarContract])
+async def similar_contracts(
+    contract_id: str,
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0, description="Minimum estimated Jaccard similarity (default and lowest accepted: the index's min_threshold)"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Near-duplicate contracts ranked by estimated Jaccard similarity of their clauses"""
+    if threshold is not None and threshold < similarity_index.min_threshold:
+        raise HTTPException(
+            status_code=400,
+            detail=f"threshold must be at least {similarity_index.min_threshold}; less similar contracts are not indexed reliably"
+        )
+    signature = similarity_index.get_signature(db, contract_id)
+    if signature is None:
+        raise HTTPException(status_code=404, detail="No similarity signature for contract; analyze it first")
+    
+    return [
+        SimilarContract(**match)
+        for match in similarity_index.find_similar(db, signature, threshold=threshold, limit=limit,
+                                                   exclude=contract_id)
+    ]
+
+@app.post("/clauses/similar", response_model=List[SimilarClause])
+def similar_clauses(request: SimilarClauseRequest, db: Session = Depends(get_db)):
+    """Clauses across all contracts closest in meaning to a stored clause or free text"""
+    if request.clause_id:
+        query = embedding_store.get_vector(db, request.clause_id)
+        if query is None:
+            raise HTTPException(status_code=404, detail="Clause has no stored embedding")
+    elif request.text:
+        # Shares the inference limit with analyses; overload is answered with 503 and Retry-After
+        with inference_limiter.slot():
+            vectors = nlp_analyzer.encode_clauses([request.text])
+        if vectors is None:
+            raise HTTPException(status_code=503, detail="Clause encoder is not loaded")
+        query = vectors[0]
+    else:
+        raise HTTPException(status_code=400, detail="Provide either clause_id or text")
+    
+    return embedding_store.find_similar(
+        db, query, top_k=request.top_k, approximate=request.approximate, exclude_clause=request.clause_id
+    )
+
+@app.get("/search", response_model=SearchResponse)
+async def search_contracts(
+    q: str = Query(..., min_length=1, description='Search terms; use double quotes for phrases'),
+    scope: str = Query("clauses", pattern="^(clauses|contracts)$"),
+    category: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Ranked full-text search over analyzed contracts and their clauses"""
+    started = time.perf_counter()
+    total, hits = search_index.search(db, q, scope=scope, category=category, page=page, page_size=page_size)
+    
+    # Resolve filenames for the current page in a single query
+    contract_ids = {hit['contract_id'] for hit in hits}
+    filenames = dict(
+        db.query(Contract.id, Contract.filename).filter(Contract.id.in_(contract_ids)).all()
+    ) if contract_ids else {}
+    
+    return SearchResponse(
+        query=q,
+        total=total,
+        page=page,
+        page_size=page_size,
+        took_ms=round((time.perf_counter() - started) * 1000, 2),
+        hits=[
+            SearchHit(filename=filenames.get(hit['contract_id'], ''), **hit)
+            for hit in hits
+            if hit['contract_id'] in filenames
+        ]
+    )
+
+@app.get("/analytics", response_model=AnalyticsResponse)
+def portfolio_analytics(
+    since: Optional[date] = Query(None, description="Contracts uploaded on or after this day"),
+    until: Optional[date] = Query(None, description="Contracts uploaded before this day"),
+    file_type: Optional[str] = Query(None, description="pdf, docx, ..."),
+    db: Session = Depends(get_db)
+):
+    """Portfolio risk distribution, high-risk counts per day and average score per file type"""
+    return AnalyticsResponse(**analytics.summary(db, since, until, file_type))
+
+@app.get("/export/{table}")
+def export_results(
+    table: str,
+    format: str = Query("parquet", pattern="^(parquet|csv)$"),
+    since: Optional[datetime] = Query(None, description="Contracts uploaded on or after this time"),
+    until: Optional[datetime] = Query(None, description="Contracts uploaded before this time"),
+    status: Optional[List[str]] = Query(None),
+    include_text: bool = False,
+    batch_size: int = Query(5000, ge=100, le=50000)
+):
+    """Stream a results table (contracts, clauses, risky_matches, scores) as Parquet or CSV"""
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table. Available: {', '.join(EXPORT_TABLES)}")
+    if format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Parquet export requires pyarrow; use format=csv")
+    exporter = ResultExporter(batch_size=batch_size, include_text=include_text)
+    
+    def body():
+        # The export outlives the request's dependencies, so it holds its own session
+        db = SessionLocal()
+        try:
+            yield from exporter.stream(db, table, format, since=since, until=until, status=status)
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    return Response(render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def require_profile_access(authorization: Optional[str] = Header(None)):
+    """Captures hold stack samples and request metadata: PROFILE_TOKEN as a bearer token"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not request_profiler.authorized(token):
+        raise HTTPException(status_code=403, detail="A valid PROFILE_TOKEN bearer token is required")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_profile_access)])
+async def list_profiles():
+    """Recent slow-request profile captures, newest first"""
+    return request_profiler.list_captures()
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_access)])
+async def download_profile(profile_id: str):
+    """Download a capture as collapsed stacks (flamegraph.pl / speedscope input)"""
+    path = request_profiler.capture_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(path, media_type='text/plain', filename=f"profile_{profile_id}.folded")
+
+@app.post("/admin/rescore", response_model=RescoreResponse)
+def rescore_portfolio(request: Optional[RescoreRequest] = None, db: Session = Depends(get_db)):
+    """Recompute every stored risk score from persisted clause counts, without running NLP
+    
+    Weights in the body are merged over the configured ones and saved to RISK_WEIGHTS_FILE,
+    so later analyses in every worker score with them too.
+    """
+    overrides = request.model_dump(exclude_none=True) if request else {}
+    if overrides:
+        try:
+            risk_scorer.update(overrides)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    else:
+        risk_scorer.refresh()
+    return RescoreResponse(**bulk_rescore(db, risk_scorer, analytics=analytics))
+
+@app.get("/admin/admission")
+async def admission_stats():
+    """Concurrency, queue depth and rejections of each limiter in this worker"""
+    return {
+        limiter.name: limiter.stats()
+        for limiter in (analysis_gate, extraction_limiter, inference_limiter, report_limiter)
+    }
+
+@app.get("/admin/budget")
+async def budget_stats():
+    """Default time budget and the per-unit stage costs budgets are planned with"""
+    return budget_planner.stats()
+
+@app.get("/cache/clauses/stats")
+async def clause_cache_stats():
+    """Hit rate and size of the cross-contract clause result cache"""
+    return clause_cache.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
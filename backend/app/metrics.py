@@ -0,0 +1,159 @@
+from prometheus_client import (
+    Counter, Histogram, Gauge, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+)
+from prometheus_client import multiprocess
+from contextlib import contextmanager
+import os
+import time
+
+# Latency buckets from 5ms to 5 minutes: cheap endpoints and full analyses share one layout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_LATENCY = Histogram(
+    "contract_api_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+STAGE_LATENCY = Histogram(
+    "contract_analysis_stage_duration_seconds",
+    "Duration of each analysis pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+MODEL_INFERENCE_LATENCY = Histogram(
+    "contract_model_inference_duration_seconds",
+    "Wall-clock time of a single model call",
+    ["model"],
+    buckets=LATENCY_BUCKETS
+)
+
+MODEL_BATCH_SIZE = Histogram(
+    "contract_model_batch_size",
+    "Number of inputs passed to a single model call",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+DOCUMENTS_PROCESSED = Counter(
+    "contract_documents_processed_total",
+    "Contracts analyzed, by file type and outcome",
+    ["file_type", "status"]
+)
+
+PAGES_PROCESSED = Counter(
+    "contract_pages_processed_total",
+    "Pages extracted from analyzed contracts",
+    ["file_type"]
+)
+
+CLAUSES_PROCESSED = Counter(
+    "contract_clauses_processed_total",
+    "Clauses classified"
+)
+
+CACHE_LOOKUPS = Counter(
+    "contract_cache_lookups_total",
+    "Cache lookups by cache and result (hit, shared_hit, miss)",
+    ["cache", "result"]
+)
+
+DEGRADED_STAGES = Counter(
+    "contract_degraded_stages_total",
+    "Analysis stages cut short to meet a request's time budget",
+    ["stage"]
+)
+
+ANALYSES_IN_FLIGHT = Gauge(
+    "contract_analyses_in_flight",
+    "Analyses currently running",
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_ACTIVE = Gauge(
+    "contract_admission_active",
+    "Requests or stage executions holding a concurrency slot, by limiter",
+    ["limiter"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "contract_admission_queue_depth",
+    "Requests or stage executions waiting for a concurrency slot, by limiter",
+    ["limiter"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_WAIT = Histogram(
+    "contract_admission_wait_seconds",
+    "Time spent waiting for a concurrency slot",
+    ["limiter"],
+    buckets=LATENCY_BUCKETS
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "contract_admission_rejections_total",
+    "Requests rejected by admission control, by limiter and reason (queue_full, timeout)",
+    ["limiter", "reason"]
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Observe the duration of a pipeline stage, also when it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def model_timer(model: str, batch_size: int = 1):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        MODEL_INFERENCE_LATENCY.labels(model).observe(time.perf_counter() - started)
+        MODEL_BATCH_SIZE.labels(model).observe(batch_size)
+
+
+def render_latest() -> bytes:
+    """Prometheus text exposition; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request latency labelled by route template, not raw path"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # FastAPI stores the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status["code"])
+            ).observe(time.perf_counter() - started)
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, DateTime, Float
+from sqlalchemy import Column, String, Text, Integer, BigInteger, Date, DateTime, Float, ForeignKey, LargeBinary, Index, JSON
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -9,11 +9,84 @@ class Contract(Base):
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_type = Column(String, nullable=False)  # pdf, docx
+    content_hash = Column(String, index=True)  # SHA-256 of the upload; key in the blob store
+    file_size = Column(Integer)
     status = Column(String, default="uploaded")  # uploaded, analyzing, completed, error
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     
     # Analysis results
     extracted_text = Column(Text)
     summary = Column(Text)
+    summary_mode = Column(String)  # fast (extractive) or abstractive
     risk_score = Column(Float)
-    error_message = Column(Text)
\ No newline at end of file
+    error_message = Column(Text)
+    
+    # Scoring inputs kept so scores can be recomputed without re-running NLP
+    risk_breakdown = Column(JSON)  # {category: {low: n, medium: n, high: n}}
+    risky_pattern_counts = Column(JSON)  # {risky pattern type: n}
+    degraded_stages = Column(JSON)  # {stage: how} when a time budget cut stages short
+
+class ContractClause(Base):
+    __tablename__ = "contract_clauses"
+    
+    id = Column(String, primary_key=True, index=True)
+    contract_id = Column(String, ForeignKey("contracts.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # order of the clause in the document
+    category = Column(String, nullable=False, index=True)
+    risk_level = Column(String, nullable=False)  # low, medium, high
+    content = Column(Text, nullable=False)
+    explanation = Column(Text)
+    suggestion = Column(Text)
+    page = Column(Integer)  # first page of the clause, when segmented from the PDF layout
+    regions = Column(JSON)  # [{page, x0, top, x1, bottom}] in PDF points, from the top-left corner
+
+class ContractRiskyMatch(Base):
+    __tablename__ = "contract_risky_matches"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    contract_id = Column(String, ForeignKey("contracts.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # order of detection
+    type = Column(String, nullable=False, index=True)  # risky pattern type
+    risk_level = Column(String, nullable=False)
+    matched_text = Column(Text, nullable=False)
+    context = Column(Text)
+
+class ContractSignature(Base):
+    __tablename__ = "contract_signatures"
+    
+    contract_id = Column(String, ForeignKey("contracts.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # MinHash values as packed uint32
+
+class ContractLSHBucket(Base):
+    __tablename__ = "contract_lsh_buckets"
+    
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)  # hash of the band's MinHash values
+    contract_id = Column(String, ForeignKey("contracts.id"), primary_key=True)
+    
+    __table_args__ = (Index("ix_contract_lsh_buckets_contract_id", "contract_id"),)
+
+class ClauseEmbedding(Base):
+    __tablename__ = "clause_embeddings"
+    
+    row = Column(Integer, primary_key=True, autoincrement=False)  # row in the embedding matrix file
+    clause_id = Column(String, ForeignKey("contract_clauses.id"), nullable=False, index=True)
+    contract_id = Column(String, ForeignKey("contracts.id"), nullable=False, index=True)
+
+class AnalyticsContractRollup(Base):
+    __tablename__ = "analytics_contract_rollups"
+    
+    day = Column(Date, primary_key=True)  # upload day (UTC)
+    file_type = Column(String, primary_key=True)
+    risk_level = Column(String, primary_key=True)  # level of the contract's risk score
+    contracts = Column(Integer, nullable=False, default=0)
+    risk_score_sum = Column(Float, nullable=False, default=0.0)
+
+class AnalyticsClauseRollup(Base):
+    __tablename__ = "analytics_clause_rollups"
+    
+    day = Column(Date, primary_key=True)  # upload day of the contract (UTC)
+    file_type = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    risk_level = Column(String, primary_key=True)
+    clauses = Column(Integer, nullable=False, default=0)
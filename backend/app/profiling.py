@@ -0,0 +1,230 @@
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+_current_request: ContextVar[Optional["ActiveRequest"]] = ContextVar("profiled_request", default=None)
+
+
+class ActiveRequest:
+    def __init__(self, method: str, path: str, forced: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.trigger = forced  # "header" or "sampled"; None until the latency threshold is crossed
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.annotations = {}
+
+
+def annotate(**values):
+    """Attach metadata (contract size, page count, ...) to the current request's profile
+
+    Also binds the profile to the calling thread, so work moved to a thread pool is the
+    work that gets sampled.
+    """
+    request = _current_request.get()
+    if request is not None:
+        request.thread_id = threading.get_ident()
+        request.annotations.update(values)
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for slow requests
+
+    One background thread samples the Python stack of every in-flight request that was
+    selected for profiling: requests carrying the debug header or picked by the sample
+    rate are sampled from the start, any other request once it has been running longer
+    than the latency threshold. Stacks are aggregated in the collapsed ("folded") format
+    read by flamegraph.pl, speedscope and similar tools, and saved next to a JSON file with
+    request metadata when the request finishes.
+
+    The debug header must carry ``token``, which also guards reading the captures; without a
+    token the header is ignored and captures cannot be read over HTTP.
+    """
+
+    def __init__(self, enabled: bool = False, threshold_ms: float = 2000, sample_rate: float = 0.0,
+                 interval_ms: float = 10, output_dir: str = "profiles", max_captures: int = 50,
+                 debug_header: str = "x-debug-profile", token: Optional[str] = None):
+        self.enabled = enabled
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self.max_captures = max_captures
+        self.debug_header = debug_header.lower().encode('latin-1')
+        self.token = token or None
+
+        self._active: Dict[str, ActiveRequest] = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        return cls(
+            enabled=os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes"),
+            threshold_ms=float(os.getenv("PROFILE_THRESHOLD_MS", "2000")),
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "10")),
+            output_dir=os.getenv("PROFILE_DIR", "profiles"),
+            max_captures=int(os.getenv("PROFILE_MAX_CAPTURES", "50")),
+            token=os.getenv("PROFILE_TOKEN")
+        )
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether a token presented by a client grants profiling access"""
+        return self.token is not None and token is not None and hmac.compare_digest(token, self.token)
+
+    def start(self, method: str, path: str, headers: List) -> ActiveRequest:
+        forced = None
+        if any(name == self.debug_header and self.authorized(value.decode('latin-1')) for name, value in headers):
+            forced = "header"
+        elif self.sample_rate and random.random() < self.sample_rate:
+            forced = "sampled"
+
+        request = ActiveRequest(method, path, forced)
+        with self._lock:
+            self._active[request.id] = request
+            if self._sampler is None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self._sampler.start()
+        return request
+
+    def finish(self, request: ActiveRequest, status: int):
+        with self._lock:
+            self._active.pop(request.id, None)
+        duration = time.perf_counter() - request.started
+        if request.trigger is None or not request.stacks:
+            return
+        try:
+            self._save(request, status, duration)
+        except OSError as e:
+            logger.warning(f"Could not save request profile {request.id}: {e}")
+
+    def list_captures(self) -> List[Dict[str, Any]]:
+        captures = []
+        if not os.path.isdir(self.output_dir):
+            return captures
+        for name in os.listdir(self.output_dir):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.output_dir, name)) as f:
+                        captures.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(captures, key=lambda capture: capture["started_at"], reverse=True)
+
+    def capture_path(self, profile_id: str) -> Optional[str]:
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        path = os.path.join(self.output_dir, f"{profile_id}.folded")
+        return path if os.path.exists(path) else None
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                now = time.perf_counter()
+                targets = []
+                for request in self._active.values():
+                    if request.trigger is None and now - request.started >= self.threshold:
+                        request.trigger = "threshold"
+                    if request.trigger is not None:
+                        targets.append(request)
+            if not targets:
+                continue
+
+            frames = sys._current_frames()
+            for request in targets:
+                frame = frames.get(request.thread_id)
+                if frame is not None:
+                    request.stacks[self._collapse(frame)] += 1
+            del frames
+
+    @staticmethod
+    def _collapse(frame, max_depth: int = 128) -> str:
+        """Root-to-leaf stack in collapsed format: frames joined by semicolons"""
+        names = []
+        while frame is not None and len(names) < max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _save(self, request: ActiveRequest, status: int, duration: float):
+        base = os.path.join(self.output_dir, request.id)
+        with open(base + ".folded", "w") as f:
+            for stack, count in request.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        metadata = {
+            "id": request.id,
+            "method": request.method,
+            "path": request.path,
+            "status": status,
+            "trigger": request.trigger,
+            "started_at": request.started_at.isoformat(),
+            "duration_ms": round(duration * 1000, 1),
+            "samples": sum(request.stacks.values()),
+            "interval_ms": self.interval * 1000,
+            **request.annotations
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(metadata, f, indent=2)
+        self._prune()
+
+    def _prune(self):
+        captures = self.list_captures()
+        for capture in captures[self.max_captures:]:
+            for extension in (".folded", ".json"):
+                try:
+                    os.remove(os.path.join(self.output_dir, capture["id"] + extension))
+                except OSError:
+                    pass
+
+
+class ProfilingMiddleware:
+    """ASGI middleware registering each HTTP request with the profiler"""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request = self.profiler.start(scope["method"], scope["path"], scope["headers"])
+        token = _current_request.set(request)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            self.profiler.finish(request, status["code"])
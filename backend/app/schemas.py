@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
 class ContractResponse(BaseModel):
     id: str
@@ -19,10 +19,89 @@ class ClauseResponse(BaseModel):
     risk_level: str
     explanation: str
     suggestion: Optional[str] = None
+    page: Optional[int] = None  # with layout segmentation: first page of the clause
+    regions: Optional[List[Dict[str, Any]]] = None  # and its boxes per page, in PDF points
 
 class AnalysisResponse(BaseModel):
     contract_id: str
     risk_score: float
     summary: str
     clauses: List[ClauseResponse]
-    status: str
\ No newline at end of file
+    status: str
+    seeded_from: Optional[str] = None  # near-duplicate contract whose summary was reused
+    summary_mode: Optional[str] = None  # fast (extractive) or abstractive
+    degraded_stages: Optional[Dict[str, str]] = None  # stages cut short to meet the time budget
+    upgrading: bool = False  # a full analysis is running in the background
+    upgrade_error: Optional[str] = None  # why the last background upgrade failed, if it did
+
+class UpgradeResponse(BaseModel):
+    contract_id: str
+    degraded_stages: Optional[Dict[str, str]] = None
+    upgrading: bool
+
+class SearchHit(BaseModel):
+    contract_id: str
+    filename: str
+    clause_id: Optional[str] = None
+    category: Optional[str] = None
+    snippet: str
+    score: float
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int
+    page: int
+    page_size: int
+    took_ms: float
+    hits: List[SearchHit]
+
+class SimilarContract(BaseModel):
+    contract_id: str
+    filename: str
+    similarity: float  # estimated Jaccard similarity of clause shingles
+    risk_score: Optional[float] = None
+
+class RescoreRequest(BaseModel):
+    category_weights: Optional[Dict[str, float]] = None
+    risk_scores: Optional[Dict[str, float]] = None
+    risky_pattern_penalty: Optional[float] = None
+    default_weight: Optional[float] = None
+
+class RescoreResponse(BaseModel):
+    scanned: int
+    updated: int
+    seconds: float
+
+class SimilarClauseRequest(BaseModel):
+    clause_id: Optional[str] = None  # a stored clause, or
+    text: Optional[str] = None  # free clause text to embed
+    top_k: int = Field(10, ge=1, le=100)
+    approximate: bool = False  # use the IVF index when one is built
+
+class SimilarClause(BaseModel):
+    clause_id: str
+    contract_id: str
+    filename: str
+    category: str
+    risk_level: str
+    content: str
+    similarity: float  # cosine similarity of clause embeddings
+
+class DailyRisk(BaseModel):
+    day: date  # upload day (UTC)
+    contracts: int
+    high_risk_contracts: int
+    high_risk_clauses: int
+
+class FileTypeRisk(BaseModel):
+    file_type: str
+    contracts: int
+    average_risk_score: float
+
+class AnalyticsResponse(BaseModel):
+    contracts: int
+    average_risk_score: Optional[float] = None
+    risk_levels: Dict[str, int]  # contracts per risk level of their score
+    categories: Dict[str, Dict[str, int]]  # clauses per category and risk level
+    daily: List[DailyRisk]
+    file_types: List[FileTypeRisk]
@@ -0,0 +1,262 @@
+"""
+Portfolio analytics, rolled up incrementally.
+
+Two tables hold the aggregates the dashboard reads:
+
+- ``analytics_contract_rollups``: analyzed contracts and the sum of their risk scores, by
+  upload day, file type and the risk level of the score
+- ``analytics_clause_rollups``: classified clauses by upload day, file type, category and
+  risk level
+
+A contract counts once it has a risk score; a failed re-analysis keeps counting its last
+result. Everything that changes a score or the clause counts (storing an analysis,
+re-scoring, backfilling scoring inputs, deleting a contract) hands the contract's
+contribution before and after the change to ``PortfolioAnalytics``, which adds the
+difference with one upsert per table in the caller's transaction. Reads only aggregate
+rollup rows, so their cost depends on the date range, not on the number of contracts.
+
+The tables can be recomputed from the contracts (run while no analysis is writing):
+
+    python -m app.services.analytics rebuild
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import time
+
+from ..models import Contract, AnalyticsContractRollup, AnalyticsClauseRollup
+from .risk_scorer import RiskScorer, RISK_LEVELS
+
+# Rows per multi-row upsert statement, well below SQLite's bound variable limit
+UPSERT_BATCH = 500
+
+# Contract attributes a rollup contribution is computed from
+CONTRIBUTION_ATTRIBUTES = ["upload_date", "file_type", "risk_score", "risk_breakdown"]
+
+# (day, file type, score level), risk score, {(day, file type, category, risk level): clauses}
+Contribution = Tuple[Tuple[date, str, str], float, Dict[Tuple[date, str, str, str], int]]
+
+
+class RollupDelta:
+    """Net change of rollup rows accumulated over any number of contracts"""
+
+    def __init__(self):
+        self.contracts = defaultdict(lambda: [0, 0.0])
+        self.clauses = defaultdict(int)
+
+    def add(self, contribution: Optional[Contribution], sign: int = 1):
+        if contribution is None:
+            return
+        key, risk_score, clauses = contribution
+        self.contracts[key][0] += sign
+        self.contracts[key][1] += sign * risk_score
+        for clause_key, count in clauses.items():
+            self.clauses[clause_key] += sign * count
+
+    def change(self, before: Optional[Contribution], after: Optional[Contribution]):
+        self.add(before, -1)
+        self.add(after, 1)
+
+
+class PortfolioAnalytics:
+    """Maintains and reads the rollup tables"""
+
+    def __init__(self, scorer: Optional[RiskScorer] = None):
+        self.scorer = scorer or RiskScorer()
+
+    def contribution(self, upload_date: Optional[datetime], file_type: str, risk_score: Optional[float],
+                     risk_breakdown: Optional[Dict[str, Dict[str, int]]]) -> Optional[Contribution]:
+        """What one contract adds to the rollups; None until it has been scored"""
+        if risk_score is None or upload_date is None:
+            return None
+        if upload_date.tzinfo is not None:
+            upload_date = upload_date.astimezone(timezone.utc)
+        day = upload_date.date()
+        file_type = (file_type or '').lower()
+        clauses = {
+            (day, file_type, category, level): count
+            for category, levels in (risk_breakdown or {}).items()
+            for level, count in levels.items()
+            if count
+        }
+        return (day, file_type, self.scorer.get_risk_level_from_score(risk_score)), risk_score, clauses
+
+    def contribution_of(self, contract) -> Optional[Contribution]:
+        """Contribution of a Contract or of a row with the same attributes"""
+        return self.contribution(contract.upload_date, contract.file_type, contract.risk_score,
+                                 contract.risk_breakdown)
+
+    def locked_contribution_of(self, db, contract) -> Optional[Contribution]:
+        """Contribution of a Contract as currently stored, its row locked until the caller commits
+
+        A change's delta must start from the row it replaces; a stale copy would let a
+        concurrent writer's change be counted twice or lost.
+        """
+        db.refresh(contract, attribute_names=CONTRIBUTION_ATTRIBUTES, with_for_update=True)
+        return self.contribution_of(contract)
+
+    def record(self, db, before: Optional[Contribution], after: Optional[Contribution]):
+        """Apply one contract's change"""
+        delta = RollupDelta()
+        delta.change(before, after)
+        self.apply(db, delta)
+
+    def apply(self, db, delta: RollupDelta):
+        """Add a delta to the rollup tables in the caller's transaction"""
+        contract_rows = [
+            {'day': day, 'file_type': file_type, 'risk_level': level, 'contracts': contracts,
+             'risk_score_sum': score_sum}
+            for (day, file_type, level), (contracts, score_sum) in delta.contracts.items()
+            if contracts or abs(score_sum) > 1e-9
+        ]
+        clause_rows = [
+            {'day': day, 'file_type': file_type, 'category': category, 'risk_level': level, 'clauses': clauses}
+            for (day, file_type, category, level), clauses in delta.clauses.items()
+            if clauses
+        ]
+        self._upsert(db, AnalyticsContractRollup, ('day', 'file_type', 'risk_level'),
+                     ('contracts', 'risk_score_sum'), contract_rows)
+        self._upsert(db, AnalyticsClauseRollup, ('day', 'file_type', 'category', 'risk_level'),
+                     ('clauses',), clause_rows)
+
+    def _upsert(self, db, model, keys: Tuple[str, ...], measures: Tuple[str, ...], rows: List[Dict[str, Any]]):
+        """Insert rows, or add their measures to the rows already stored under their keys"""
+        dialect = db.get_bind().dialect.name
+        if dialect not in ('postgresql', 'sqlite'):
+            for row in rows:
+                existing = db.get(model, tuple(row[key] for key in keys))
+                if existing is None:
+                    db.add(model(**row))
+                else:
+                    for measure in measures:
+                        setattr(existing, measure, getattr(existing, measure) + row[measure])
+            db.flush()
+            return
+
+        insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        for start in range(0, len(rows), UPSERT_BATCH):
+            statement = insert(model).values(rows[start:start + UPSERT_BATCH])
+            db.execute(statement.on_conflict_do_update(
+                index_elements=list(keys),
+                set_={measure: getattr(model, measure) + statement.excluded[measure] for measure in measures}
+            ))
+
+    def summary(self, db, since: Optional[date] = None, until: Optional[date] = None,
+                file_type: Optional[str] = None) -> Dict[str, Any]:
+        """Risk distribution by category, high-risk counts per day and average score per file type"""
+        def scoped(statement, model):
+            if since is not None:
+                statement = statement.where(model.day >= since)
+            if until is not None:
+                statement = statement.where(model.day < until)
+            if file_type:
+                statement = statement.where(model.file_type == file_type.lower())
+            return statement
+
+        contracts = AnalyticsContractRollup
+        clauses = AnalyticsClauseRollup
+        by_file_type = db.execute(scoped(
+            select(contracts.file_type, contracts.risk_level, func.sum(contracts.contracts),
+                   func.sum(contracts.risk_score_sum))
+            .group_by(contracts.file_type, contracts.risk_level), contracts
+        )).all()
+        by_day = db.execute(scoped(
+            select(contracts.day, contracts.risk_level, func.sum(contracts.contracts))
+            .group_by(contracts.day, contracts.risk_level), contracts
+        )).all()
+        by_category = db.execute(scoped(
+            select(clauses.category, clauses.risk_level, func.sum(clauses.clauses))
+            .group_by(clauses.category, clauses.risk_level), clauses
+        )).all()
+        high_clauses_by_day = db.execute(scoped(
+            select(clauses.day, func.sum(clauses.clauses))
+            .where(clauses.risk_level == 'high')
+            .group_by(clauses.day), clauses
+        )).all()
+
+        risk_levels = {level: 0 for level in RISK_LEVELS}
+        file_types = defaultdict(lambda: [0, 0.0])
+        for kind, level, count, score_sum in by_file_type:
+            risk_levels[level] = risk_levels.get(level, 0) + count
+            file_types[kind][0] += count
+            file_types[kind][1] += score_sum
+
+        days = defaultdict(lambda: {'contracts': 0, 'high_risk_contracts': 0, 'high_risk_clauses': 0})
+        for day, level, count in by_day:
+            days[day]['contracts'] += count
+            if level == 'high':
+                days[day]['high_risk_contracts'] += count
+        for day, count in high_clauses_by_day:
+            days[day]['high_risk_clauses'] += count
+
+        categories = defaultdict(lambda: {level: 0 for level in RISK_LEVELS})
+        for category, level, count in by_category:
+            if count:
+                categories[category][level] = count
+
+        total = sum(count for count, _ in file_types.values())
+        score_sum = sum(score for _, score in file_types.values())
+        return {
+            'contracts': total,
+            'average_risk_score': round(score_sum / total, 1) if total else None,
+            'risk_levels': risk_levels,
+            'categories': dict(categories),
+            'daily': [
+                {'day': day, **counts}
+                for day, counts in sorted(days.items())
+                if counts['contracts'] or counts['high_risk_clauses']
+            ],
+            'file_types': [
+                {'file_type': kind, 'contracts': count, 'average_risk_score': round(score / count, 1)}
+                for kind, (count, score) in sorted(file_types.items())
+                if count
+            ],
+        }
+
+    def rebuild(self, db, batch_size: int = 5000) -> int:
+        """Recompute both tables from the contracts in one transaction; returns contracts counted"""
+        delta = RollupDelta()
+        counted = 0
+        result = db.execute(
+            select(Contract.upload_date, Contract.file_type, Contract.risk_score, Contract.risk_breakdown)
+            .where(Contract.risk_score.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        # The delta grows with the number of rollup rows, not with the number of contracts
+        for partition in result.partitions():
+            for row in partition:
+                delta.add(self.contribution_of(row))
+            counted += len(partition)
+
+        db.query(AnalyticsContractRollup).delete()
+        db.query(AnalyticsClauseRollup).delete()
+        self.apply(db, delta)
+        db.commit()
+        return counted
+
+
+def main(argv=None):
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the portfolio analytics rollups")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="Recompute the rollup tables from all analyzed contracts")
+    rebuild.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        counted = PortfolioAnalytics().rebuild(db, batch_size=args.batch_size)
+        print(f"Rebuilt analytics from {counted} contracts in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Offline batch analysis with a process pool, checkpointing and resume.
+
+Runs the TextExtractor -> NLPAnalyzer -> RiskScorer pipeline outside the API, either over
+the documents of a directory (results written as JSON lines) or over contracts selected
+from the database (results stored exactly as ``POST /analyze`` stores them):
+
+    python -m app.services.batch directory ../sample-contracts --output results.jsonl --workers 4
+    python -m app.services.batch contracts --status completed --since 2024-01-01 --workers 4
+
+Each worker process loads its own models once, in the pool initializer, with
+``TORCH_THREADS_PER_WORKER`` intra-op threads (default 1), so ``--workers`` should be
+about the number of cores. Workers never touch the database; the parent process stores
+results as they arrive and appends every finished document to the checkpoint file.
+An interrupted run started again with the same checkpoint skips what is already done
+(``--restart`` discards the checkpoint); a run that gets through all its documents deletes
+the checkpoint, so the next run (e.g. after a model upgrade) analyzes everything again.
+A document whose result cannot be stored is reported as failed and the run goes on. The
+run ends with documents per second and the time spent in each stage.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from sqlalchemy import select
+
+from ..models import Contract
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('extraction', 'classification', 'risk_patterns', 'summarization', 'embedding', 'scoring', 'persistence')
+FILE_TYPES = {'.pdf': 'pdf', '.docx': 'docx', '.txt': 'txt', '.md': 'md'}
+
+# Per-process pipeline, built once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def _init_worker(load_models: bool):
+    from .text_extractor import TextExtractor
+    from .nlp_analyzer import NLPAnalyzer
+    from .risk_scorer import RiskScorer
+    from .clause_cache import ClauseCache
+    from .similarity_index import SimilarityIndex
+    from .storage import BlobStore
+
+    try:
+        import torch
+        torch.set_num_threads(int(os.getenv("TORCH_THREADS_PER_WORKER", "1")))
+    except ImportError:
+        pass
+
+    _worker.update(
+        extractor=TextExtractor.from_env(),
+        analyzer=NLPAnalyzer(clause_cache=ClauseCache.from_env(), load_models=load_models),
+        scorer=RiskScorer.from_env(),
+        similarity=SimilarityIndex(),
+        blob_store=BlobStore.from_env()
+    )
+
+
+def analyze_job(job: Dict[str, Any], mode: str = 'abstractive', embed: bool = False) -> Dict[str, Any]:
+    """Run the pipeline over one document in a worker; errors are returned, not raised"""
+    from .pipeline import extract_stored
+    from .document import ContractDocument
+
+    timings = {}
+    outcome = {'key': job['key'], 'timings': timings}
+    analyzer, scorer = _worker['analyzer'], _worker['scorer']
+    try:
+        with _timed(timings, 'extraction'):
+            if 'path' in job:
+                document = ContractDocument(*_worker['extractor'].extract_document(job['path'], job['file_type']))
+            else:
+                document = extract_stored(_worker['extractor'], _worker['blob_store'], Contract(
+                    file_path=job['file_path'], file_type=job['file_type'], content_hash=job['content_hash']
+                ))
+        with _timed(timings, 'classification'):
+            clauses = analyzer.classify_clauses(document)
+        with _timed(timings, 'risk_patterns'):
+            risky_clauses = analyzer.detect_risky_clauses(document)
+        with _timed(timings, 'summarization'):
+            summary, summary_mode = analyzer.summarize(document, mode=mode, risky_clauses=risky_clauses)
+        clause_vectors = None
+        if embed:
+            with _timed(timings, 'embedding'):
+                clause_vectors = analyzer.encode_clauses([clause['text'] for clause in clauses])
+        with _timed(timings, 'scoring'):
+            risk_score = scorer.calculate_risk_score(clauses, risky_clauses)
+            result = {
+                'text': document.text,
+                'page_count': document.page_count,
+                'summary': summary,
+                'summary_mode': summary_mode,
+                'risk_score': risk_score,
+                'risk_breakdown': scorer.get_risk_breakdown(clauses),
+                'risky_pattern_counts': scorer.get_risky_pattern_counts(risky_clauses),
+                'clauses': clauses,
+                'risky_clauses': risky_clauses,
+                'signature': _worker['similarity'].signature([clause['text'] for clause in clauses] or [document.text])
+            }
+        outcome.update(ok=True, result=result, clause_vectors=clause_vectors)
+    except Exception as e:
+        outcome.update(ok=False, error=f"{type(e).__name__}: {e}")
+    return outcome
+
+
+class Checkpoint:
+    """Append-only JSON lines of finished document keys; keys recorded as done are skipped"""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.done = set()
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line torn by the interruption
+                    if entry.get('status') == 'done':
+                        self.done.add(entry['key'])
+        self._file = open(path, 'a')
+
+    def mark(self, key: str, status: str, error: Optional[str] = None):
+        self._file.write(json.dumps({'key': key, 'status': status, 'error': error}) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if status == 'done':
+            self.done.add(key)
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        """Delete the checkpoint of a finished run"""
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def directory_jobs(directory: str) -> Iterator[Dict[str, Any]]:
+    """Supported documents under a directory; a modified file gets a new key and is redone"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            file_type = FILE_TYPES.get(os.path.splitext(name)[1].lower())
+            if not file_type:
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            yield {
+                'key': f"{os.path.relpath(path, directory)}:{stat.st_size}:{stat.st_mtime_ns}",
+                'path': path,
+                'file_type': file_type
+            }
+
+
+def contract_jobs(db, status: Optional[List[str]] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Stored contracts matching the filters; contracts being analyzed right now are left alone"""
+    statement = select(Contract.id, Contract.file_path, Contract.file_type, Contract.content_hash).where(
+        Contract.status != "analyzing"
+    )
+    if status:
+        statement = statement.where(Contract.status.in_(status))
+    if since is not None:
+        statement = statement.where(Contract.upload_date >= since)
+    if until is not None:
+        statement = statement.where(Contract.upload_date < until)
+    if ids:
+        statement = statement.where(Contract.id.in_(ids))
+    for row in db.execute(statement.order_by(Contract.id)).all():
+        yield {'key': row.id, 'file_path': row.file_path, 'file_type': row.file_type, 'content_hash': row.content_hash}
+
+
+class ContractWriter:
+    """Stores results in the database like POST /analyze does"""
+
+    def __init__(self, db):
+        from ..database import engine
+        from .search_index import SearchIndex
+        from .similarity_index import SimilarityIndex
+        from .embedding_store import EmbeddingStore
+        from .analytics import PortfolioAnalytics
+
+        self.db = db
+        self.search_index = SearchIndex(engine)
+        self.similarity_index = SimilarityIndex()
+        self.embedding_store = EmbeddingStore.from_env()
+        self.analytics = PortfolioAnalytics()
+
+    def write(self, outcome: Dict[str, Any]):
+        from .pipeline import store_analysis
+
+        try:
+            contract = self.db.get(Contract, outcome['key'])
+            if contract is None:
+                raise LookupError("contract was deleted during the run")
+            if outcome['ok']:
+                store_analysis(self.db, contract, outcome['result'], self.search_index, self.similarity_index,
+                               self.embedding_store, self.analytics, outcome['clause_vectors'])
+            else:
+                contract.status = "error"
+                contract.error_message = outcome['error']
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def close(self):
+        pass
+
+
+class JsonLinesWriter:
+    """Writes one JSON object per analyzed document
+
+    A fresh run truncates the output. A resumed run keeps the records of the documents in
+    ``resume`` (the checkpoint's done keys), one per key, and appends; records of documents
+    that failed or were not checkpointed are dropped, as those documents run again.
+    """
+
+    def __init__(self, path: str, include_text: bool = False, resume: Optional[set] = None):
+        self.include_text = include_text
+        if resume and os.path.exists(path):
+            self._keep_records(path, resume)
+            self._file = open(path, 'a')
+        else:
+            self._file = open(path, 'w')
+
+    @staticmethod
+    def _keep_records(path: str, keys: set):
+        kept = set()
+        temporary = path + ".tmp"
+        with open(path) as source, open(temporary, 'w') as target:
+            for line in source:
+                try:
+                    key = json.loads(line)['key']
+                except (ValueError, KeyError, TypeError):
+                    continue  # a line torn by the interruption
+                if key in keys and key not in kept:
+                    kept.add(key)
+                    target.write(line)
+        os.replace(temporary, path)
+
+    def write(self, outcome: Dict[str, Any]):
+        record = {'key': outcome['key'], 'ok': outcome['ok']}
+        if outcome['ok']:
+            result = dict(outcome['result'])
+            result.pop('signature')
+            if not self.include_text:
+                result.pop('text')
+            record.update(result)
+        else:
+            record['error'] = outcome['error']
+        record['timings'] = outcome['timings']
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(jobs: Iterator[Dict[str, Any]], writer, checkpoint: Checkpoint, workers: int, load_models: bool,
+              mode: str, embed: bool, progress_every: int = 50) -> Dict[str, Any]:
+    """Analyze every job not yet in the checkpoint; returns throughput and per-stage timings"""
+    pending = [job for job in jobs if job['key'] not in checkpoint.done]
+    skipped_note = f" ({len(checkpoint.done)} already done)" if checkpoint.done else ""
+    print(f"Analyzing {len(pending)} documents with {workers} worker(s){skipped_note}", flush=True)
+
+    stage_totals = {stage: 0.0 for stage in STAGES}
+    counts = {'done': 0, 'error': 0, 'pages': 0}
+    started = time.perf_counter()
+
+    def handle(outcome):
+        try:
+            with _timed(outcome['timings'], 'persistence'):
+                writer.write(outcome)
+        except Exception as e:
+            outcome = dict(outcome, ok=False, error=f"Storing the result failed: {e}")
+        status = 'done' if outcome['ok'] else 'error'
+        checkpoint.mark(outcome['key'], status, outcome.get('error'))
+        counts[status] += 1
+        if outcome['ok']:
+            counts['pages'] += outcome['result']['page_count']
+        else:
+            logger.warning(f"{outcome['key']}: {outcome['error']}")
+        for stage, seconds in outcome['timings'].items():
+            stage_totals[stage] += seconds
+        finished = counts['done'] + counts['error']
+        if finished % progress_every == 0:
+            print(f"  {finished}/{len(pending)} documents, "
+                  f"{finished / (time.perf_counter() - started):.2f} docs/s", flush=True)
+
+    interrupted = False
+    try:
+        if workers <= 1:
+            # In-process, which keeps tracebacks and debuggers simple
+            _init_worker(load_models)
+            for job in pending:
+                handle(analyze_job(job, mode, embed))
+        else:
+            # Spawned rather than forked: each worker loads its models into a clean interpreter
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(workers, initializer=_init_worker, initargs=(load_models,)) as pool:
+                for outcome in pool.imap_unordered(_AnalyzeJob(mode, embed), pending, chunksize=1):
+                    handle(outcome)
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        writer.close()
+        checkpoint.close()
+    if not interrupted:
+        checkpoint.discard()
+
+    elapsed = time.perf_counter() - started
+    finished = counts['done'] + counts['error']
+    return {
+        'documents': finished,
+        'failed': counts['error'],
+        'remaining': len(pending) - finished,
+        'interrupted': interrupted,
+        'pages': counts['pages'],
+        'seconds': elapsed,
+        'docs_per_second': finished / elapsed if elapsed else 0.0,
+        'pages_per_second': counts['pages'] / elapsed if elapsed else 0.0,
+        'stages': stage_totals
+    }
+
+
+class _AnalyzeJob:
+    """Picklable analyze_job with the run's options bound"""
+
+    def __init__(self, mode: str, embed: bool):
+        self.mode = mode
+        self.embed = embed
+
+    def __call__(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return analyze_job(job, self.mode, self.embed)
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['documents']} documents ({report['failed']} failed, {report['pages']} pages) "
+          f"in {report['seconds']:.1f}s: {report['docs_per_second']:.2f} docs/s, "
+          f"{report['pages_per_second']:.2f} pages/s")
+    total = sum(report['stages'].values())
+    if report['documents'] and total:
+        print(f"\n{'stage':<15} {'total s':>9} {'ms/doc':>9} {'share':>7}")
+        for stage, seconds in report['stages'].items():
+            if seconds:
+                print(f"{stage:<15} {seconds:>9.2f} {seconds * 1000 / report['documents']:>9.1f} "
+                      f"{seconds / total:>7.1%}")
+        print("(stage times are summed over workers)")
+    if report['interrupted']:
+        print(f"\nInterrupted with {report['remaining']} documents left; run again to resume")
+
+
+def main(argv=None) -> int:
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Analyze many contracts offline with a process pool")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    directory_parser = commands.add_parser("directory", help="Analyze the PDF, DOCX, TXT and MD files of a directory")
+    directory_parser.add_argument("path")
+    directory_parser.add_argument("--output", default="batch_results.jsonl",
+                                  help="JSON lines; overwritten by a new run, appended to on resume")
+    directory_parser.add_argument("--include-text", action="store_true", help="Include extracted text in the output")
+
+    contracts_parser = commands.add_parser("contracts", help="Re-analyze stored contracts and update them in place")
+    contracts_parser.add_argument("--status", nargs="+", help="Only contracts with these statuses (default: all)")
+    contracts_parser.add_argument("--since", type=datetime.fromisoformat, help="Uploaded on or after (ISO 8601)")
+    contracts_parser.add_argument("--until", type=datetime.fromisoformat, help="Uploaded before (ISO 8601)")
+    contracts_parser.add_argument("--ids", nargs="+", help="Only these contract ids")
+    contracts_parser.add_argument("--skip-embeddings", action="store_true", help="Do not compute clause embeddings")
+
+    for subparser in (directory_parser, contracts_parser):
+        subparser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        subparser.add_argument("--summary-mode", choices=["fast", "abstractive"], default="abstractive")
+        subparser.add_argument("--no-models", action="store_true",
+                               help="Rule-based classification and fast summaries only; no transformer models")
+        subparser.add_argument("--checkpoint", default="batch_checkpoint.jsonl")
+        subparser.add_argument("--restart", action="store_true", help="Discard the checkpoint and start over")
+        subparser.add_argument("--report", help="Also write the final report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    checkpoint = Checkpoint(args.checkpoint, restart=args.restart)
+    db = SessionLocal()
+    try:
+        if args.command == "directory":
+            jobs = directory_jobs(args.path)
+            writer = JsonLinesWriter(args.output, include_text=args.include_text, resume=checkpoint.done)
+            embed = False
+        else:
+            jobs = contract_jobs(db, args.status, args.since, args.until, args.ids)
+            writer = ContractWriter(db)
+            embed = not args.skip_embeddings
+        report = run_batch(jobs, writer, checkpoint, args.workers, not args.no_models, args.summary_mode, embed)
+    finally:
+        db.close()
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['interrupted'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
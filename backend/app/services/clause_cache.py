@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import logging
+
+try:
+    import redis
+except ImportError:  # redis is optional; the cache stays process-local without it
+    redis = None
+
+from ..metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+_HITS = CACHE_LOOKUPS.labels("clause", "hit")
+_SHARED_HITS = CACHE_LOOKUPS.labels("clause", "shared_hit")
+_MISSES = CACHE_LOOKUPS.labels("clause", "miss")
+
+# Leading clause numbering such as "1.", "4.2.1", "(a)", "A.", "iv)", "Section 12:" or markdown "##".
+# A bare number ("30 days") is clause text, not numbering, and is kept; so are words that merely
+# consist of numeral letters ("civil:", "ill."), as roman numerals must be well-formed (i to xxxix).
+_ROMAN_NUMERAL = r'(?=[ivx])x{0,3}(?:ix|iv|v?i{0,3})'
+_NUMBER_TOKEN = r'(?:\(?(?:\d+(?:\.\d+)*|[a-z]|' + _ROMAN_NUMERAL + r')[.):](?!\d)|\d+(?:\.\d+)+)'
+_NUMBERING_RE = re.compile(
+    r'^(?:#+\s*)?(?:(?:section|article|clause)\s+)?(?:' + _NUMBER_TOKEN + r'\s*)+',
+    re.IGNORECASE
+)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_clause(text: str, lowered: bool = False) -> str:
+    """Normalize case, whitespace and leading numbering so boilerplate clauses compare equal"""
+    normalized = _WHITESPACE_RE.sub(' ', text if lowered else text.lower()).strip()
+    return _NUMBERING_RE.sub('', normalized, count=1).lstrip()
+
+
+def clause_key(normalized: str, version: str = "") -> str:
+    """Content hash of a clause normalized by ``normalize_clause``, namespaced by the analysis rules version
+
+    Clauses sharing a key share one cached result, so that result must be computed from
+    the normalized text itself.
+    """
+    digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return f"{version}:{digest}" if version else digest
+
+
+class ClauseCache:
+    """Bounded LRU cache of per-clause analysis results, optionally shared through Redis
+
+    The in-process LRU answers repeated clauses without a network round trip. When a Redis
+    URL is configured it acts as a second level shared by every worker; entries there
+    expire after ``ttl`` seconds and Redis should run with an ``allkeys-lru`` policy.
+    """
+
+    def __init__(self, max_entries: int = 10000, redis_url: Optional[str] = None,
+                 ttl: int = 7 * 24 * 3600, prefix: str = "clause-cache"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = prefix
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'errors': 0}
+
+        self._redis = None
+        self._shared_retry_at = 0.0
+        if redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.5)
+        elif redis_url:
+            logger.warning("redis package not installed; clause cache is local to this process")
+
+    @classmethod
+    def from_env(cls) -> "ClauseCache":
+        return cls(
+            max_entries=int(os.getenv("CLAUSE_CACHE_SIZE", "10000")),
+            redis_url=os.getenv("CLAUSE_CACHE_REDIS_URL", os.getenv("REDIS_URL")),
+            ttl=int(os.getenv("CLAUSE_CACHE_TTL", str(7 * 24 * 3600)))
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+                self._stats['hits'] += 1
+                _HITS.inc()
+                return value
+
+        value = self._get_shared(key)
+        with self._lock:
+            if value is not None:
+                self._stats['shared_hits'] += 1
+                self._put_local(key, value)
+            else:
+                self._stats['misses'] += 1
+        (_SHARED_HITS if value is not None else _MISSES).inc()
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._put_local(key, value)
+        if self._shared_available():
+            try:
+                self._redis.setex(f"{self.prefix}:{key}", self.ttl, json.dumps(value))
+            except Exception as e:
+                self._record_error(e)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._local)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['max_entries'] = self.max_entries
+        stats['shared'] = self._redis is not None
+        stats['hit_rate'] = round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _put_local(self, key: str, value: Dict[str, Any]):
+        self._local[key] = value
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _shared_available(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._shared_retry_at
+
+    def _get_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self._shared_available():
+            return None
+        try:
+            raw = self._redis.get(f"{self.prefix}:{key}")
+        except Exception as e:
+            self._record_error(e)
+            return None
+        return json.loads(raw) if raw else None
+
+    def _record_error(self, error: Exception):
+        # Back off so an unreachable Redis does not add a timeout to every clause
+        self._shared_retry_at = time.monotonic() + 30
+        with self._lock:
+            self._stats['errors'] += 1
+            first_error = self._stats['errors'] == 1
+        if first_error:
+            logger.warning(f"Shared clause cache unavailable, continuing with local cache: {error}")
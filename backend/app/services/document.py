@@ -0,0 +1,143 @@
+"""
+Single-pass representation of an extracted contract, shared by every analysis stage.
+
+``ContractDocument`` is built once after extraction. It keeps the normalized text and
+compact int32 offset arrays into it instead of copies of its pieces:
+
+- ``line_spans``: stripped, non-empty lines
+- ``sentence_spans``: sentences (ending at ``.``, ``!``, ``?`` before whitespace, or at a line break)
+- ``clause_lines``: clauses as runs of lines, split at clause numbering and capitalized headers
+
+Derived views (the lowercased text, clause texts, normalized sentences and their word
+counts) are computed on first use and cached, so classification, risk pattern detection,
+summary chunking and TextRank no longer each lowercase, split or re-chunk the text on
+their own. Clauses delimited from the PDF layout are passed in as ``segments`` and replace
+the text-based clause split.
+"""
+
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Union
+import re
+import numpy as np
+
+# A clause starts at a line opening with "1.", "A.", "(a)" or an upper-case header ending in ":"
+_CLAUSE_START_RE = re.compile(r'\d+\.|[A-Z]\.|\([a-z]\)|[A-Z][A-Z\s]+:')
+
+# A sentence ends at . ! or ? followed by whitespace (so "2.1" and "$5.00" do not split) or at a line break
+_SENTENCE_RE = re.compile(r'\S.*?(?:[.!?]+(?=\s|$)|(?=\n)|\Z)', re.S)
+_LINE_RE = re.compile(r'[^\n]+')
+
+# Clauses of this many characters or fewer are dropped as headings and fragments
+MIN_CLAUSE_CHARS = 50
+
+
+def _spans(matches) -> np.ndarray:
+    spans = np.array([match.span() for match in matches], dtype=np.int32)
+    return spans.reshape(-1, 2)
+
+
+class ContractDocument:
+    """Extracted text with offset arrays and cached views, built once per analysis"""
+
+    def __init__(self, text: str, page_count: int = 0, segments: Optional[List[Dict[str, Any]]] = None):
+        self.text = text.replace('\r\n', '\n')
+        self.page_count = page_count
+        self._segments = segments
+
+    @classmethod
+    def of(cls, document: Union[str, "ContractDocument"]) -> "ContractDocument":
+        """A document as is, or a new one around plain text"""
+        return document if isinstance(document, ContractDocument) else cls(document)
+
+    @cached_property
+    def lower(self) -> str:
+        return self.text.lower()
+
+    @cached_property
+    def _lower_aligned(self) -> bool:
+        # A few characters (e.g. "İ") lowercase to two; offsets into the text then miss the lowercase view
+        return len(self.lower) == len(self.text)
+
+    @cached_property
+    def line_spans(self) -> np.ndarray:
+        """(start, end) of every non-empty line, without surrounding whitespace"""
+        spans = []
+        for match in _LINE_RE.finditer(self.text):
+            line = match.group()
+            stripped = line.strip()
+            if stripped:
+                start = match.start() + len(line) - len(line.lstrip())
+                spans.append((start, start + len(stripped)))
+        return np.array(spans, dtype=np.int32).reshape(-1, 2)
+
+    @cached_property
+    def clause_lines(self) -> np.ndarray:
+        """(first line, end line) of each text-split clause longer than MIN_CLAUSE_CHARS"""
+        lines = self.line_spans
+        if not len(lines):
+            return np.zeros((0, 2), dtype=np.int32)
+        starts = [0] + [
+            index for index in range(1, len(lines))
+            if _CLAUSE_START_RE.match(self.text, lines[index, 0], lines[index, 1])
+        ]
+        bounds = np.array(starts + [len(lines)], dtype=np.int32)
+        clauses = np.stack([bounds[:-1], bounds[1:]], axis=1)
+        # Length of the lines joined by single spaces, without building the string
+        line_chars = np.concatenate(([0], np.cumsum(lines[:, 1] - lines[:, 0])))
+        chars = line_chars[clauses[:, 1]] - line_chars[clauses[:, 0]] + (clauses[:, 1] - clauses[:, 0] - 1)
+        return clauses[chars > MIN_CLAUSE_CHARS]
+
+    def _join_lines(self, source: str, first: int, end: int) -> str:
+        return ' '.join(source[start:stop] for start, stop in self.line_spans[first:end].tolist())
+
+    @cached_property
+    def segments(self) -> List[Dict[str, Any]]:
+        """Clauses to classify: layout segments when given, else the text split"""
+        if self._segments is not None:
+            return self._segments
+        return [{'text': text} for text in self.clause_texts]
+
+    @cached_property
+    def clause_texts(self) -> List[str]:
+        if self._segments is not None:
+            return [segment['text'] for segment in self._segments]
+        return [self._join_lines(self.text, first, end) for first, end in self.clause_lines.tolist()]
+
+    @cached_property
+    def clause_lowers(self) -> List[str]:
+        """Lowercased clause texts, cut from the lowercase view where offsets allow"""
+        if self._segments is not None or not self._lower_aligned:
+            return [text.lower() for text in self.clause_texts]
+        return [self._join_lines(self.lower, first, end) for first, end in self.clause_lines.tolist()]
+
+    @cached_property
+    def sentence_spans(self) -> np.ndarray:
+        return _spans(_SENTENCE_RE.finditer(self.text))
+
+    @cached_property
+    def sentences(self) -> List[str]:
+        """Sentences with runs of whitespace collapsed"""
+        return [' '.join(words) for words in self._sentence_words]
+
+    @cached_property
+    def sentence_word_counts(self) -> np.ndarray:
+        return np.array([len(words) for words in self._sentence_words], dtype=np.int32)
+
+    @cached_property
+    def _sentence_words(self) -> List[List[str]]:
+        return [self.text[start:end].split() for start, end in self.sentence_spans.tolist()]
+
+    def chunk_spans(self, max_chars: int, max_chunks: int) -> List[tuple]:
+        """Leading (start, end) chunks of at most ``max_chars``, ending on a sentence end when one is in reach"""
+        # Chunks never reach past max_chunks * max_chars, so only that prefix is split
+        ends = _spans(_SENTENCE_RE.finditer(self.text, 0, max_chars * max_chunks))[:, 1]
+        chunks = []
+        start = 0
+        while start < len(self.text) and len(chunks) < max_chunks:
+            limit = min(start + max_chars, len(self.text))
+            # Last sentence end inside the window; a window without one is cut hard
+            index = np.searchsorted(ends, limit, side='right') - 1
+            end = int(ends[index]) if index >= 0 and ends[index] > start else limit
+            chunks.append((start, end))
+            start = end
+        return chunks
@@ -0,0 +1,380 @@
+"""
+Clause embedding store.
+
+Clause vectors from the legal-domain encoder are appended to one float16 matrix file
+(``EMBEDDING_DIR/vectors.f16``, row-major, ``dim`` values per row). The file is only ever
+appended to, under an exclusive file lock, so any number of workers can write to it. Readers
+memory-map it read-only: the matrix lives in the OS page cache once per node instead of in
+every worker's heap, and a query streams over it in fixed-size chunks.
+
+Which clause a row belongs to is recorded in the ``clause_embeddings`` table. Rows of
+re-analyzed or deleted clauses lose their mapping and are skipped by queries until
+``compact`` rewrites the file. Every transaction that changes the row mappings holds a
+shared lock until it ends, and ``compact`` takes that lock exclusively, so it waits for
+analyses in flight instead of dropping rows they appended but have not committed yet.
+
+An optional inverted-file (IVF) index groups rows by their nearest k-means centroid so
+approximate queries only score the lists closest to the query:
+
+    python -m app.services.embedding_store build-ivf --lists 1024
+    python -m app.services.embedding_store compact
+    python -m app.services.embedding_store backfill
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import argparse
+import fcntl
+import json
+import logging
+import os
+import numpy as np
+
+from sqlalchemy import event
+
+from ..models import Contract, ContractClause, ClauseEmbedding
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f16"
+META_FILE = "meta.json"
+LOCK_FILE = "vectors.lock"
+WRITERS_LOCK_FILE = "writers.lock"
+IVF_FILE = "ivf.npz"
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped float16 clause vectors with exact and IVF top-k search"""
+
+    def __init__(self, directory: str, chunk_rows: int = 65536, nprobe: int = 16):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.nprobe = nprobe
+        os.makedirs(directory, exist_ok=True)
+        self.dim = self._read_meta().get("dim")
+        self._matrix = None
+        self._ivf = None
+        self._ivf_mtime = None
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingStore":
+        """Configure from EMBEDDING_DIR, EMBEDDING_CHUNK_ROWS and EMBEDDING_NPROBE"""
+        return cls(
+            directory=os.getenv("EMBEDDING_DIR", "embeddings"),
+            chunk_rows=int(os.getenv("EMBEDDING_CHUNK_ROWS", "65536")),
+            nprobe=int(os.getenv("EMBEDDING_NPROBE", "16"))
+        )
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self._path(META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _lock(self, name: str = LOCK_FILE, mode: int = fcntl.LOCK_EX):
+        lock = open(self._path(name), "a")
+        fcntl.flock(lock, mode)
+        return lock
+
+    def _join_writers(self, db):
+        """Hold the shared writers lock until the session's transaction ends"""
+        if db.info.get('embedding_writers_lock') is not None:
+            return
+        if 'embedding_writers_lock' not in db.info:
+            event.listen(db, 'after_transaction_end', self._leave_writers)
+        db.info['embedding_writers_lock'] = self._lock(WRITERS_LOCK_FILE, fcntl.LOCK_SH)
+
+    def _leave_writers(self, session, transaction):
+        lock = session.info.get('embedding_writers_lock')
+        if lock is not None and transaction.parent is None:
+            session.info['embedding_writers_lock'] = None
+            lock.close()
+
+    @property
+    def row_count(self) -> int:
+        if not self.dim:
+            return 0
+        try:
+            return os.path.getsize(self._path(VECTORS_FILE)) // (self.dim * 2)
+        except FileNotFoundError:
+            return 0
+
+    def matrix(self) -> np.ndarray:
+        """Read-only memory map of all rows, re-opened when other workers have appended"""
+        rows = self.row_count
+        if self._matrix is None or len(self._matrix) != rows:
+            self._matrix = (
+                np.memmap(self._path(VECTORS_FILE), dtype=np.float16, mode="r", shape=(rows, self.dim))
+                if rows else np.zeros((0, self.dim or 0), dtype=np.float16)
+            )
+        return self._matrix
+
+    def add(self, db, contract_id: str, clause_ids: List[str], vectors: np.ndarray):
+        """Append vectors for a contract's clauses and map them in the caller's transaction
+
+        Mappings of the contract's earlier clauses are removed; their rows become garbage.
+        """
+        self.remove_contract(db, contract_id)
+        if not len(clause_ids):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float16)
+
+        lock = self._lock()
+        try:
+            if not self.dim:
+                self.dim = self._read_meta().get("dim")
+            if not self.dim:
+                self.dim = int(vectors.shape[1])
+                with open(self._path(META_FILE), "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+            with open(self._path(VECTORS_FILE), "ab") as f:
+                first_row = f.tell() // (self.dim * 2)
+                f.write(vectors.tobytes())
+        finally:
+            lock.close()
+
+        db.add_all([
+            ClauseEmbedding(row=first_row + i, clause_id=clause_id, contract_id=contract_id)
+            for i, clause_id in enumerate(clause_ids)
+        ])
+
+    def remove_contract(self, db, contract_id: str):
+        self._join_writers(db)
+        db.query(ClauseEmbedding).filter(ClauseEmbedding.contract_id == contract_id).delete()
+
+    def get_vector(self, db, clause_id: str) -> Optional[np.ndarray]:
+        row = db.query(ClauseEmbedding.row).filter(ClauseEmbedding.clause_id == clause_id).scalar()
+        if row is None or row >= self.row_count:
+            return None
+        return np.asarray(self.matrix()[row], dtype=np.float32)
+
+    def _top_k(self, query: np.ndarray, rows: Optional[np.ndarray], k: int,
+               start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best k rows by dot product, over ``rows`` or the range [start, stop), chunk by chunk"""
+        matrix = self.matrix()
+        stop = len(matrix) if stop is None else stop
+        total = len(rows) if rows is not None else stop - start
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+
+        for offset in range(0, total, self.chunk_rows):
+            if rows is not None:
+                chunk_rows = rows[offset:offset + self.chunk_rows]
+                chunk = matrix[chunk_rows]
+            else:
+                chunk_rows = np.arange(start + offset, min(stop, start + offset + self.chunk_rows))
+                chunk = matrix[chunk_rows[0]:chunk_rows[-1] + 1]
+            scores = chunk.astype(np.float32) @ query
+            if len(scores) > k:
+                keep = np.argpartition(scores, -k)[-k:]
+                scores, chunk_rows = scores[keep], chunk_rows[keep]
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, chunk_rows])
+            if len(best_scores) > k:
+                keep = np.argpartition(best_scores, -k)[-k:]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+
+        order = np.argsort(-best_scores)
+        return best_rows[order], best_scores[order]
+
+    def _load_ivf(self):
+        path = self._path(IVF_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            self._ivf = None
+            return None
+        if self._ivf is None or mtime != self._ivf_mtime:
+            with np.load(path) as data:
+                self._ivf = {name: data[name] for name in data.files}
+            self._ivf_mtime = mtime
+        return self._ivf
+
+    def search(self, query: np.ndarray, k: int = 10, approximate: bool = False) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) of the k nearest rows; vectors are stored unit-length
+
+        With ``approximate`` and a built IVF index only the ``nprobe`` nearest lists are
+        scored, plus rows appended after the index was built. Without an index the search
+        is exact.
+        """
+        if not self.dim or not self.row_count:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        ivf = self._load_ivf() if approximate else None
+        if ivf is None:
+            rows, scores = self._top_k(query, None, k)
+        else:
+            centroid_scores = ivf["centroids"] @ query
+            probe = np.argsort(-centroid_scores)[:self.nprobe]
+            offsets = ivf["offsets"]
+            candidates = np.sort(np.concatenate(
+                [ivf["rows"][offsets[i]:offsets[i + 1]] for i in probe]
+            ))
+            rows, scores = self._top_k(query, candidates, k)
+            indexed = int(ivf["indexed_rows"])
+            if indexed < self.row_count:
+                tail_rows, tail_scores = self._top_k(query, None, k, start=indexed)
+                rows, scores = np.concatenate([rows, tail_rows]), np.concatenate([scores, tail_scores])
+                order = np.argsort(-scores)[:k]
+                rows, scores = rows[order], scores[order]
+        return [(int(row), float(score)) for row, score in zip(rows, scores)]
+
+    def find_similar(self, db, query: np.ndarray, top_k: int = 10, approximate: bool = False,
+                     exclude_clause: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Nearest stored clauses to a query vector, with their contracts"""
+        # Over-fetch so unmapped rows (superseded analyses) and the query clause can be dropped
+        rows = self.search(query, k=top_k * 2 + 10, approximate=approximate)
+        if not rows:
+            return []
+        similarity = dict(rows)
+        matches = (
+            db.query(ClauseEmbedding.row, ContractClause.id, ContractClause.contract_id, ContractClause.category,
+                     ContractClause.risk_level, ContractClause.content, Contract.filename)
+            .join(ContractClause, ContractClause.id == ClauseEmbedding.clause_id)
+            .join(Contract, Contract.id == ContractClause.contract_id)
+            .filter(ClauseEmbedding.row.in_(list(similarity)))
+            .all()
+        )
+        results = [
+            {
+                'clause_id': clause_id,
+                'contract_id': contract_id,
+                'filename': filename,
+                'category': category,
+                'risk_level': risk_level,
+                'content': content[:200] + "..." if len(content) > 200 else content,
+                'similarity': round(min(similarity[row], 1.0), 4)
+            }
+            for row, clause_id, contract_id, category, risk_level, content, filename in matches
+            if clause_id != exclude_clause
+        ]
+        results.sort(key=lambda match: match['similarity'], reverse=True)
+        return results[:top_k]
+
+    def build_ivf(self, db, lists: int = 1024, iterations: int = 10, sample: int = 100000, seed: int = 0) -> int:
+        """Cluster the mapped rows with spherical k-means and write the IVF index file"""
+        live = np.array(sorted(row for (row,) in db.query(ClauseEmbedding.row)), dtype=np.int64)
+        live = live[live < self.row_count]
+        if not len(live):
+            return 0
+        lists = min(lists, len(live))
+        rng = np.random.RandomState(seed)
+        training = self.matrix()[np.sort(rng.choice(live, min(sample, len(live)), replace=False))].astype(np.float32)
+
+        centroids = training[rng.choice(len(training), lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(training @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, training)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        assignment = np.concatenate([
+            np.argmax(self.matrix()[live[start:start + self.chunk_rows]].astype(np.float32) @ centroids.T, axis=1)
+            for start in range(0, len(live), self.chunk_rows)
+        ])
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(lists + 1))
+
+        temporary = self._path("ivf.tmp.npz")
+        np.savez(temporary, centroids=centroids.astype(np.float32), rows=live[order], offsets=offsets,
+                 indexed_rows=np.int64(self.row_count))
+        os.replace(temporary, self._path(IVF_FILE))
+        return lists
+
+    def compact(self, db) -> int:
+        """Rewrite the matrix with mapped rows only and renumber the id map; drops the IVF index
+
+        Waits for transactions writing embeddings to end, and holds off new ones meanwhile.
+        """
+        writers = self._lock(WRITERS_LOCK_FILE, fcntl.LOCK_EX)
+        lock = self._lock()
+        try:
+            mappings = db.query(ClauseEmbedding).order_by(ClauseEmbedding.row).all()
+            mappings = [mapping for mapping in mappings if mapping.row < self.row_count]
+            temporary = self._path(VECTORS_FILE + ".tmp")
+            with open(temporary, "wb") as f:
+                for start in range(0, len(mappings), self.chunk_rows):
+                    batch = [mapping.row for mapping in mappings[start:start + self.chunk_rows]]
+                    f.write(np.ascontiguousarray(self.matrix()[batch]).tobytes())
+
+            renumbered = [
+                {'row': row, 'clause_id': mapping.clause_id, 'contract_id': mapping.contract_id}
+                for row, mapping in enumerate(mappings)
+            ]
+            db.query(ClauseEmbedding).delete()
+            db.bulk_insert_mappings(ClauseEmbedding, renumbered)
+            db.commit()
+
+            self._matrix = None
+            os.replace(temporary, self._path(VECTORS_FILE))
+            if os.path.exists(self._path(IVF_FILE)):
+                os.remove(self._path(IVF_FILE))
+        finally:
+            lock.close()
+            writers.close()
+        return len(renumbered)
+
+
+def backfill(db, store: EmbeddingStore, analyzer, batch_size: int = 1000) -> int:
+    """Embed stored clauses of completed contracts that have no vectors yet"""
+    embedded = 0
+    contract_ids = [
+        contract_id for (contract_id,) in db.query(Contract.id)
+        .filter(Contract.status == "completed",
+                ~Contract.id.in_(db.query(ClauseEmbedding.contract_id).distinct()))
+        .order_by(Contract.id)
+    ]
+    for contract_id in contract_ids:
+        clauses = (
+            db.query(ContractClause.id, ContractClause.content)
+            .filter(ContractClause.contract_id == contract_id)
+            .order_by(ContractClause.position)
+            .all()
+        )
+        vectors = analyzer.encode_clauses([content for _, content in clauses])
+        if vectors is None:
+            raise RuntimeError("No clause encoder is loaded")
+        store.add(db, contract_id, [clause_id for clause_id, _ in clauses], vectors)
+        db.commit()
+        embedded += len(clauses)
+    return embedded
+
+
+def main(argv=None):
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the clause embedding store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build-ivf", help="Build the approximate (IVF) index")
+    build.add_argument("--lists", type=int, default=1024)
+    build.add_argument("--iterations", type=int, default=10)
+    commands.add_parser("compact", help="Drop rows of superseded analyses")
+    commands.add_parser("backfill", help="Embed clauses of contracts analyzed before embeddings existed")
+    args = parser.parse_args(argv)
+
+    store = EmbeddingStore.from_env()
+    db = SessionLocal()
+    try:
+        if args.command == "build-ivf":
+            lists = store.build_ivf(db, lists=args.lists, iterations=args.iterations)
+            print(f"Built IVF index with {lists} lists over {store.row_count} rows")
+        elif args.command == "compact":
+            print(f"Compacted embedding store to {store.compact(db)} rows")
+        else:
+            from .model_serving import create_nlp_analyzer
+            print(f"Embedded {backfill(db, store, create_nlp_analyzer())} clauses")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
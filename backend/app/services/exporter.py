@@ -0,0 +1,333 @@
+"""
+Streaming export of analysis results as Parquet or CSV.
+
+Each table is read with a server-side cursor (``yield_per``) in fixed-size batches and
+every batch is written out as soon as it is fetched (one Parquet row group, or a run of
+CSV lines), so memory use depends on the batch size, not on the table size. Extracted
+contract text is left out unless asked for.
+
+    python -m app.services.exporter --output exports/ --since 2024-01-01
+    python -m app.services.exporter --tables clauses risky_matches --status completed --format csv
+
+Tables:
+
+- ``contracts``: one row per contract (metadata, status, summary, risk score)
+- ``clauses``: classified clauses, in document order
+- ``risky_matches``: risky pattern matches with their surrounding context
+- ``scores``: risk score and its stored inputs (clause counts per risk level, risky pattern matches)
+"""
+
+from datetime import datetime
+from sqlalchemy import select
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence
+import argparse
+import csv
+import io
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only needed for Parquet output
+    pa = None
+    pq = None
+
+from ..models import Contract, ContractClause, ContractRiskyMatch
+
+PARQUET_AVAILABLE = pa is not None
+
+EXPORT_TABLES = ('contracts', 'clauses', 'risky_matches', 'scores')
+EXPORT_FORMATS = ('parquet', 'csv')
+MEDIA_TYPES = {'parquet': 'application/vnd.apache.parquet', 'csv': 'text/csv'}
+
+# Output columns of each table: name -> (column type, source column)
+COLUMNS = {
+    'contracts': {
+        'id': ('string', Contract.id),
+        'filename': ('string', Contract.filename),
+        'file_type': ('string', Contract.file_type),
+        'file_size': ('int', Contract.file_size),
+        'content_hash': ('string', Contract.content_hash),
+        'status': ('string', Contract.status),
+        'upload_date': ('timestamp', Contract.upload_date),
+        'summary_mode': ('string', Contract.summary_mode),
+        'summary': ('string', Contract.summary),
+        'risk_score': ('float', Contract.risk_score),
+        'error_message': ('string', Contract.error_message),
+    },
+    'clauses': {
+        'id': ('string', ContractClause.id),
+        'contract_id': ('string', ContractClause.contract_id),
+        'position': ('int', ContractClause.position),
+        'category': ('string', ContractClause.category),
+        'risk_level': ('string', ContractClause.risk_level),
+        'content': ('string', ContractClause.content),
+        'explanation': ('string', ContractClause.explanation),
+        'suggestion': ('string', ContractClause.suggestion),
+        'page': ('int', ContractClause.page),
+    },
+    'risky_matches': {
+        'contract_id': ('string', ContractRiskyMatch.contract_id),
+        'position': ('int', ContractRiskyMatch.position),
+        'type': ('string', ContractRiskyMatch.type),
+        'risk_level': ('string', ContractRiskyMatch.risk_level),
+        'matched_text': ('string', ContractRiskyMatch.matched_text),
+        'context': ('string', ContractRiskyMatch.context),
+    },
+    'scores': {
+        'contract_id': ('string', Contract.id),
+        'risk_score': ('float', Contract.risk_score),
+        'clauses_low': ('int', None),
+        'clauses_medium': ('int', None),
+        'clauses_high': ('int', None),
+        'risky_patterns': ('int', None),
+    },
+}
+
+
+class ChunkBuffer(io.RawIOBase):
+    """Write-only stream whose contents are taken out in pieces as they are produced"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ParquetSink:
+    """Writes each batch as one row group"""
+
+    def __init__(self, columns: Dict[str, str], stream: BinaryIO):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for Parquet export")
+        types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64(),
+                 'timestamp': pa.timestamp('us', tz='UTC')}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns.items()])
+        self._writer = pq.ParquetWriter(stream, self.schema, compression='zstd')
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class CsvSink:
+    """UTF-8 CSV with a header row; timestamps as ISO 8601"""
+
+    def __init__(self, columns: Dict[str, str], stream: BinaryIO):
+        self.columns = list(columns)
+        self._stream = stream
+        self._text = io.StringIO()
+        self._writer = csv.DictWriter(self._text, fieldnames=self.columns)
+        self._writer.writeheader()
+        self._flush()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows(
+            {name: value.isoformat() if isinstance(value, datetime) else value for name, value in row.items()}
+            for row in rows
+        )
+        self._flush()
+
+    def close(self):
+        self._flush()
+
+    def _flush(self):
+        self._stream.write(self._text.getvalue().encode('utf-8'))
+        self._text.seek(0)
+        self._text.truncate()
+
+
+SINKS = {'parquet': ParquetSink, 'csv': CsvSink}
+
+
+class ResultExporter:
+    """Streams one table of analysis results, filtered by upload date and contract status"""
+
+    def __init__(self, batch_size: int = 5000, include_text: bool = False):
+        self.batch_size = batch_size
+        self.include_text = include_text
+
+    def columns(self, table: str) -> Dict[str, tuple]:
+        if table not in COLUMNS:
+            raise ValueError(f"Unknown export table: {table}")
+        columns = dict(COLUMNS[table])
+        if table == 'contracts' and self.include_text:
+            columns['extracted_text'] = ('string', Contract.extracted_text)
+        return columns
+
+    def _statement(self, table: str, since: Optional[datetime], until: Optional[datetime],
+                   status: Optional[Sequence[str]]):
+        columns = self.columns(table)
+        if table == 'scores':
+            statement = select(Contract.id, Contract.risk_score, Contract.risk_breakdown,
+                               Contract.risky_pattern_counts).order_by(Contract.id)
+        else:
+            statement = select(*[column.label(name) for name, (_, column) in columns.items()])
+            if table == 'contracts':
+                statement = statement.order_by(Contract.id)
+            else:
+                model = ContractClause if table == 'clauses' else ContractRiskyMatch
+                statement = (
+                    statement.join(Contract, Contract.id == model.contract_id)
+                    .order_by(model.contract_id, model.position)
+                )
+
+        if since is not None:
+            statement = statement.where(Contract.upload_date >= since)
+        if until is not None:
+            statement = statement.where(Contract.upload_date < until)
+        if status:
+            statement = statement.where(Contract.status.in_(list(status)))
+        # yield_per streams rows through a server-side cursor where the driver has one (psycopg2)
+        return statement.execution_options(yield_per=self.batch_size)
+
+    @staticmethod
+    def _score_row(row) -> Dict[str, Any]:
+        levels = {'low': 0, 'medium': 0, 'high': 0}
+        for counts in (row.risk_breakdown or {}).values():
+            for level, count in counts.items():
+                levels[level] = levels.get(level, 0) + count
+        return {
+            'contract_id': row.id,
+            'risk_score': row.risk_score,
+            'clauses_low': levels['low'],
+            'clauses_medium': levels['medium'],
+            'clauses_high': levels['high'],
+            'risky_patterns': sum(row.risky_pattern_counts.values()) if row.risky_pattern_counts is not None else None,
+        }
+
+    def batches(self, db, table: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                status: Optional[Sequence[str]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Rows of a table as lists of dicts, at most ``batch_size`` at a time"""
+        result = db.execute(self._statement(table, since, until, status))
+        for partition in result.partitions():
+            if table == 'scores':
+                yield [self._score_row(row) for row in partition]
+            else:
+                yield [dict(row._mapping) for row in partition]
+
+    def write(self, db, table: str, fmt: str, stream: BinaryIO, **filters) -> int:
+        """Write a whole table to a binary stream; returns the number of rows"""
+        rows = 0
+        for chunk in self._write_chunks(db, table, fmt, stream, **filters):
+            rows = chunk
+        return rows
+
+    def stream(self, db, table: str, fmt: str, **filters) -> Iterator[bytes]:
+        """Encoded output of a table, piece by piece, for a streaming HTTP response"""
+        buffer = ChunkBuffer()
+        for _ in self._write_chunks(db, table, fmt, buffer, **filters):
+            data = buffer.drain()
+            if data:
+                yield data
+
+    def _write_chunks(self, db, table: str, fmt: str, stream: BinaryIO, **filters) -> Iterator[int]:
+        """Write batch by batch, yielding the running row count after each write"""
+        if fmt not in SINKS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        sink = SINKS[fmt]({name: kind for name, (kind, _) in self.columns(table).items()}, stream)
+        rows = 0
+        yield rows
+        for batch in self.batches(db, table, **filters):
+            sink.write(batch)
+            rows += len(batch)
+            yield rows
+        sink.close()
+        yield rows
+
+
+def backfill_risky_matches(db, analyzer, batch_size: int = 1000) -> int:
+    """Store risky pattern matches of completed contracts analyzed before matches were persisted
+
+    Matches are re-detected with the rule-based matcher on the stored text; no model is needed.
+    """
+    filled = 0
+    last_id = ""
+    while True:
+        contracts = db.execute(
+            select(Contract)
+            .where(
+                Contract.status == "completed",
+                Contract.id > last_id,
+                ~select(ContractRiskyMatch.id).where(ContractRiskyMatch.contract_id == Contract.id).exists()
+            )
+            .order_by(Contract.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not contracts:
+            break
+        last_id = contracts[-1].id
+
+        for contract in contracts:
+            for position, risky_clause in enumerate(analyzer.detect_risky_clauses(contract.extracted_text or "")):
+                db.add(ContractRiskyMatch(
+                    contract_id=contract.id,
+                    position=position,
+                    type=risky_clause['type'],
+                    risk_level=risky_clause['risk_level'],
+                    matched_text=risky_clause['matched_text'],
+                    context=risky_clause['context']
+                ))
+        db.commit()
+        filled += len(contracts)
+    return filled
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None):
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export analysis results as Parquet or CSV files")
+    parser.add_argument("--output", default="exports", help="Directory receiving one file per table")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    parser.add_argument("--tables", nargs="+", choices=EXPORT_TABLES, default=list(EXPORT_TABLES))
+    parser.add_argument("--since", type=_parse_date, help="Contracts uploaded on or after this date (ISO 8601)")
+    parser.add_argument("--until", type=_parse_date, help="Contracts uploaded before this date (ISO 8601)")
+    parser.add_argument("--status", nargs="+", help="Contract statuses to include (default: all)")
+    parser.add_argument("--include-text", action="store_true", help="Add extracted text to the contracts table")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--backfill", action="store_true",
+                        help="First store risky matches of contracts analyzed before they were persisted")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    exporter = ResultExporter(batch_size=args.batch_size, include_text=args.include_text)
+    db = SessionLocal()
+    try:
+        if args.backfill:
+            from .nlp_analyzer import NLPAnalyzer
+            filled = backfill_risky_matches(db, NLPAnalyzer(load_models=False))
+            print(f"Backfilled risky matches for {filled} contracts")
+        for table in args.tables:
+            started = time.perf_counter()
+            path = os.path.join(args.output, f"{table}.{args.format}")
+            with open(path, "wb") as f:
+                rows = exporter.write(db, table, args.format, f, since=args.since, until=args.until, status=args.status)
+            print(f"Exported {rows} rows to {path} in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
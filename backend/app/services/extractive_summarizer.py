@@ -0,0 +1,150 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
+from typing import List, Dict, Any, Optional, Union
+import re
+import numpy as np
+
+from .document import ContractDocument
+
+# Personalization weight added to sentences containing a risky pattern match, by risk level
+RISK_WEIGHTS = {'high': 3.0, 'medium': 1.5, 'low': 0.5}
+
+
+class TextRankSummarizer:
+    """Extractive summaries ranked by TextRank over a TF-IDF sentence similarity graph
+
+    Distinct sentences are TF-IDF vectors; each keeps edges to its ``neighbors`` most similar
+    sentences, so the graph stays sparse however long the contract is. Ranking is a
+    personalized PageRank power iteration on the sparse transition matrix, with the restart
+    distribution biased towards sentences that contain risky patterns.
+    """
+
+    LONG_DOCUMENT_SENTENCES = 500
+
+    def __init__(self, max_sentences: int = 5, damping: float = 0.85, neighbors: int = 20,
+                 min_similarity: float = 0.05, redundancy: float = 0.7, min_words: int = 5,
+                 max_df: float = 0.2, max_iter: int = 100, tol: float = 1e-6, block_rows: int = 2048):
+        self.max_sentences = max_sentences
+        self.damping = damping
+        self.neighbors = neighbors
+        self.min_similarity = min_similarity
+        self.redundancy = redundancy
+        self.min_words = min_words
+        self.max_df = max_df
+        self.max_iter = max_iter
+        self.tol = tol
+        self.block_rows = block_rows
+
+    def split_sentences(self, document: Union[str, ContractDocument]) -> np.ndarray:
+        """Indices of the document's candidate sentences; headings and fragments are skipped"""
+        document = ContractDocument.of(document)
+        return np.flatnonzero(document.sentence_word_counts >= self.min_words)
+
+    def risk_weights(self, document: ContractDocument, spans: np.ndarray,
+                     risky_clauses: Optional[List[Dict[str, Any]]]) -> np.ndarray:
+        """Summed risk weight of the risky pattern matches inside each sentence"""
+        weights = np.zeros(len(spans))
+        if not risky_clauses or not len(spans):
+            return weights
+        # detect_risky_clauses reports every match of every pattern, so the same phrase
+        # shows up many times; look each distinct phrase up once
+        phrase_weights = {}
+        for risky_clause in risky_clauses:
+            key = (risky_clause['type'], risky_clause['matched_text'])
+            phrase_weights[key] = RISK_WEIGHTS.get(risky_clause.get('risk_level', 'high'), 0.0)
+        per_phrase = {}
+        for (_, phrase), weight in phrase_weights.items():
+            per_phrase[phrase] = per_phrase.get(phrase, 0.0) + weight
+
+        starts = spans[:, 0]
+        ends = spans[:, 1]
+        text_lower = document.lower
+        for phrase, weight in per_phrase.items():
+            positions = np.array([match.start() for match in re.finditer(re.escape(phrase), text_lower)], dtype=np.int64)
+            sentence = np.searchsorted(starts, positions, side='right') - 1
+            inside = (sentence >= 0) & (positions < ends[np.maximum(sentence, 0)])
+            np.add.at(weights, sentence[inside], weight)
+        return weights
+
+    def similarity_graph(self, vectors: sparse.csr_matrix) -> sparse.csr_matrix:
+        """Symmetric k-nearest-neighbour cosine similarity graph without self loops"""
+        n = vectors.shape[0]
+        rows, cols, values = [], [], []
+        transposed = vectors.T.tocsc()
+        # Row blocks bound the size of the intermediate similarity products
+        for start in range(0, n, self.block_rows):
+            similarity = (vectors[start:start + self.block_rows] @ transposed).tocoo()
+            block_rows = similarity.row + start
+            keep = (similarity.data >= self.min_similarity) & (block_rows != similarity.col)
+            block_rows, block_cols, block_values = block_rows[keep], similarity.col[keep], similarity.data[keep]
+
+            # Rank the entries of each row by similarity and keep the first ``neighbors``
+            # Similarities lie in (0, 1], so row + (1 - similarity) sorts by row, then similarity descending
+            order = np.argsort(block_rows + (1.0 - block_values))
+            block_rows, block_cols, block_values = block_rows[order], block_cols[order], block_values[order]
+            row_start = np.searchsorted(block_rows, block_rows, side='left')
+            nearest = np.arange(len(block_rows)) - row_start < self.neighbors
+            rows.append(block_rows[nearest])
+            cols.append(block_cols[nearest])
+            values.append(block_values[nearest])
+
+        graph = sparse.csr_matrix(
+            (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n)
+        )
+        return graph.maximum(graph.T)
+
+    def rank(self, graph: sparse.csr_matrix, personalization: np.ndarray) -> np.ndarray:
+        """Personalized PageRank scores by power iteration"""
+        restart = personalization / personalization.sum()
+        out_weight = np.asarray(graph.sum(axis=1)).ravel()
+        dangling = out_weight == 0
+        inverse = np.divide(1.0, out_weight, out=np.zeros_like(out_weight), where=~dangling)
+        # Column-stochastic transition matrix, so one step is a single sparse mat-vec
+        transition = (sparse.diags(inverse) @ graph).T.tocsr()
+
+        scores = restart.copy()
+        for _ in range(self.max_iter):
+            updated = self.damping * (transition @ scores + scores[dangling].sum() * restart) \
+                + (1 - self.damping) * restart
+            converged = np.abs(updated - scores).sum() < self.tol
+            scores = updated
+            if converged:
+                break
+        return scores
+
+    def summarize(self, document: Union[str, ContractDocument],
+                  risky_clauses: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Top-ranked sentences in document order, skipping near-repeats of chosen ones"""
+        document = ContractDocument.of(document)
+        candidates = self.split_sentences(document)
+        if not len(candidates):
+            return ''
+        # Rank each distinct sentence once; repeated boilerplate weighs in by its repetitions
+        index_of = {}
+        normalized = document.sentences
+        inverse = np.array([index_of.setdefault(normalized[index], len(index_of)) for index in candidates.tolist()])
+        sentences = list(index_of)
+        if len(sentences) <= self.max_sentences:
+            return ' '.join(sentences)
+
+        try:
+            # Terms in over a fifth of a long document's sentences ("agreement", "party") only
+            # add dense, uninformative edges; short documents keep them
+            max_df = self.max_df if len(sentences) > self.LONG_DOCUMENT_SENTENCES else 1.0
+            vectors = TfidfVectorizer(stop_words='english', sublinear_tf=True, max_df=max_df, dtype=np.float32).fit_transform(sentences)
+        except ValueError:
+            # Only stop words in the document
+            return ' '.join(sentences[:self.max_sentences])
+
+        risk = np.zeros(len(sentences))
+        np.maximum.at(risk, inverse, self.risk_weights(document, document.sentence_spans[candidates], risky_clauses))
+        scores = self.rank(self.similarity_graph(vectors), np.bincount(inverse) * (1.0 + risk))
+
+        chosen = []
+        for index in np.argsort(-scores, kind='stable'):
+            if len(chosen) == self.max_sentences:
+                break
+            if chosen and (vectors[chosen] @ vectors[index].T).max() > self.redundancy:
+                continue
+            chosen.append(int(index))
+        return ' '.join(sentences[index] for index in sorted(chosen))
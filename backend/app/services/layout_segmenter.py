@@ -0,0 +1,257 @@
+"""
+Layout-aware clause segmentation for PDFs.
+
+``extract_text()`` flattens a page into lines of text, which loses what a reader uses to see
+where a clause starts: a larger or bold heading, a number hanging in the margin, a change of
+indentation, a column gutter. ``LayoutSegmenter`` works on pdfplumber's characters instead.
+The geometry and font of every character on a page goes into NumPy arrays; columns, lines,
+reading order and per-line features (size, weight, indentation, spacing) come out of one
+vectorized pass, and numbering and capitalization are read with one multiline regex pass
+over the page's lines. Clauses carry the page regions they cover.
+
+    segmenter = LayoutSegmenter()
+    with pdfplumber.open(path) as pdf:
+        lines = [segmenter.page_lines(page.chars, page.width, page.page_number) for page in pdf.pages]
+    text, clauses = segmenter.segment(lines)
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import re
+import numpy as np
+
+# Clause numbering at the start of a line: "1.", "4.2.1.", "12)", "(a)", "(iv)", "A.", "Section 3.", "ARTICLE IV".
+# Wrapped body lines can start much the same way ("30 days ...", "a. ...", "Section 12 hereof ..."), so a
+# number needs its "." or ")", letters are case-sensitive and a heading ends in punctuation or the line.
+_NUMBERING_RE = re.compile(
+    r'^(?:\d+(?:\.\d+)*[.)]\s|\(?[a-z]\)\s|\((?:[ivxlc]+|[IVXLC]+)\)\s|[A-Z]\.\s'
+    r'|(?:Section|SECTION|Article|ARTICLE)\s+(?:\d+(?:\.\d+)*|[IVXLC]+)(?:[.:)](?!\d)|[ \t]*$))',
+    re.MULTILINE
+)
+# A line in capitals (at least three letters, no lower case), a typical plain-font heading
+_CAPITALS_RE = re.compile(r'^(?=[^a-z\n]*[A-Z]{3})[^a-z\n]+$', re.MULTILINE)
+_BOLD_FONTS = ('bold', 'black', 'heavy', 'semibold', 'demi')
+
+
+class PageLines:
+    """Lines of one page in reading order, as parallel arrays plus their texts"""
+
+    __slots__ = ('page', 'texts', 'x0', 'x1', 'top', 'bottom', 'size', 'bold', 'column', 'column_x0', 'column_x1')
+
+    def __init__(self, page: int, texts: List[str], **arrays: np.ndarray):
+        self.page = page
+        self.texts = texts
+        for name, values in arrays.items():
+            setattr(self, name, values)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+class LayoutSegmenter:
+    """Splits PDF text into clauses at headings, numbering and indentation or spacing changes"""
+
+    def __init__(self, heading_size_ratio: float = 1.15, heading_max_chars: int = 100,
+                 paragraph_spacing: float = 1.5, min_gutter: float = 12.0, gutter_density: float = 0.05,
+                 min_clause_chars: int = 50):
+        self.heading_size_ratio = heading_size_ratio
+        self.heading_max_chars = heading_max_chars
+        self.paragraph_spacing = paragraph_spacing
+        self.min_gutter = min_gutter
+        self.gutter_density = gutter_density
+        self.min_clause_chars = min_clause_chars
+
+    def _gutter(self, x0: np.ndarray, x1: np.ndarray, width: float) -> Optional[Tuple[float, float]]:
+        """The widest nearly empty vertical band in the middle of the page, if there is one"""
+        bins = int(np.ceil(width)) + 2
+        edges = np.zeros(bins + 1)
+        np.add.at(edges, np.clip(np.floor(x0).astype(int), 0, bins), 1)
+        np.add.at(edges, np.clip(np.ceil(x1).astype(int), 0, bins), -1)
+        coverage = np.cumsum(edges)[:bins]
+        occupied = coverage[coverage > 0]
+        if not len(occupied):
+            return None
+        # Full-width titles cross the gutter a line or two deep; columns of body text are many lines deep
+        empty = coverage <= max(2, self.gutter_density * np.median(occupied))
+        left, right = int(x0.min()), int(np.ceil(x1.max()))
+        middle = np.zeros(bins, dtype=bool)
+        middle[left + (right - left) // 4:right - (right - left) // 4] = True
+        candidates = empty & middle
+        if not candidates.any():
+            return None
+        # Longest run of empty bins
+        padded = np.concatenate(([False], candidates, [False]))
+        changes = np.flatnonzero(padded[1:] != padded[:-1])
+        starts, stops = changes[::2], changes[1::2]
+        longest = np.argmax(stops - starts)
+        if stops[longest] - starts[longest] < self.min_gutter:
+            return None
+        # Both columns must hold a real share of the text, not a stray page number or margin note
+        split = (starts[longest] + stops[longest]) / 2
+        left_share = np.mean((x0 + x1) / 2 < split)
+        if not 0.2 <= left_share <= 0.8:
+            return None
+        return float(starts[longest]), float(stops[longest])
+
+    def page_lines(self, chars: List[Dict[str, Any]], width: float, page: int) -> PageLines:
+        """Group a page's characters into lines in reading order (columns left to right)"""
+        chars = [char for char in chars if char.get('upright', True) and not char['text'].isspace()]
+        if not chars:
+            empty = np.zeros(0)
+            return PageLines(page, [], x0=empty, x1=empty, top=empty, bottom=empty, size=empty,
+                             bold=empty, column=empty.astype(int), column_x0=empty, column_x1=empty)
+
+        x0 = np.fromiter((char['x0'] for char in chars), float, len(chars))
+        x1 = np.fromiter((char['x1'] for char in chars), float, len(chars))
+        top = np.fromiter((char['top'] for char in chars), float, len(chars))
+        bottom = np.fromiter((char['bottom'] for char in chars), float, len(chars))
+        size = np.fromiter((char['size'] for char in chars), float, len(chars))
+        bold = np.fromiter((any(weight in char['fontname'].lower() for weight in _BOLD_FONTS) for char in chars),
+                           bool, len(chars))
+        text = np.array([char['text'] for char in chars], dtype=object)
+
+        # Rows: characters whose tops lie within a fraction of the font size of the previous one
+        order = np.argsort(top, kind='stable')
+        row_break = np.diff(top[order]) > 0.5 * np.minimum(size[order][1:], size[order][:-1])
+        row = np.empty(len(chars), dtype=int)
+        row[order] = np.concatenate(([0], np.cumsum(row_break)))
+
+        # Columns: split at a gutter; rows crossing it (titles) span the page and start a new band
+        side = np.zeros(len(chars), dtype=int)
+        spanning = np.zeros(row.max() + 1, dtype=bool)
+        gutter = self._gutter(x0, x1, width)
+        if gutter is not None:
+            side = ((x0 + x1) / 2 >= (gutter[0] + gutter[1]) / 2).astype(int)
+            np.logical_or.at(spanning, row, (x1 > gutter[0]) & (x0 < gutter[1]))
+        column = np.where(spanning[row], -1, side)
+        band = np.cumsum(spanning)[row]
+
+        # Reading order: band, then column, then row, then left to right
+        order = np.lexsort((x0, row, column, band))
+        x0, x1, top, bottom, size, bold, text = (a[order] for a in (x0, x1, top, bottom, size, bold, text))
+        row, column = row[order], column[order]
+        new_line = np.concatenate(([True], (row[1:] != row[:-1]) | (column[1:] != column[:-1])))
+        starts = np.flatnonzero(new_line)
+
+        # Words: a space wherever the gap to the previous character exceeds a fraction of the size
+        gap = np.concatenate(([0.0], x0[1:] - x1[:-1]))
+        separator = np.where(gap > 0.2 * size, ' ', '').astype(object)
+        separator[starts] = '\n'
+        joined = ''.join((separator + text).tolist())
+
+        line_x0 = np.minimum.reduceat(x0, starts)
+        line_column = column[starts]
+        # Column edges for indentation and short-line tests: the extent of all its lines
+        column_x0 = np.empty(len(starts))
+        column_x1 = np.empty(len(starts))
+        line_x1 = np.maximum.reduceat(x1, starts)
+        for value in np.unique(line_column):
+            members = line_column == value
+            column_x0[members] = line_x0[members].min()
+            column_x1[members] = line_x1[members].max()
+
+        return PageLines(
+            page,
+            joined[1:].split('\n'),
+            x0=line_x0,
+            x1=line_x1,
+            top=np.minimum.reduceat(top, starts),
+            bottom=np.maximum.reduceat(bottom, starts),
+            size=np.maximum.reduceat(size, starts),
+            bold=np.add.reduceat(bold.astype(float), starts) / np.diff(np.append(starts, len(text))),
+            column=line_column,
+            column_x0=column_x0,
+            column_x1=column_x1
+        )
+
+    def boundaries(self, lines: List[PageLines]) -> Tuple[np.ndarray, np.ndarray]:
+        """Which lines start a clause, and which are headings, over the whole document"""
+        texts = [text for page in lines for text in page.texts]
+        if not texts:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+        stack = {name: np.concatenate([getattr(page, name) for page in lines])
+                 for name in ('x0', 'x1', 'top', 'bottom', 'size', 'bold', 'column', 'column_x0', 'column_x1')}
+        page = np.concatenate([np.full(len(page_lines), page_lines.page) for page_lines in lines])
+        lengths = np.fromiter((len(text) for text in texts), int, len(texts))
+
+        # Numbering and capitals: one regex pass over the document, mapped back to lines
+        joined = '\n'.join(texts)
+        line_starts = np.concatenate(([0], np.cumsum(lengths[:-1] + 1)))
+        numbered = np.zeros(len(texts), dtype=bool)
+        numbered[np.searchsorted(line_starts, [m.start() for m in _NUMBERING_RE.finditer(joined)])] = True
+        capitals = np.zeros(len(texts), dtype=bool)
+        capitals[np.searchsorted(line_starts, [m.start() for m in _CAPITALS_RE.finditer(joined)])] = True
+
+        # Body text size: the size covering the most characters
+        sizes, inverse = np.unique(np.round(stack['size'] * 2) / 2, return_inverse=True)
+        body_size = sizes[np.argmax(np.bincount(inverse, weights=lengths))]
+        short = lengths <= self.heading_max_chars
+        heading = short & (
+            (stack['size'] >= body_size * self.heading_size_ratio) | (stack['bold'] >= 0.9) | capitals
+        )
+
+        # Neighbouring lines of the same page and column
+        same_block = np.concatenate(([False], (page[1:] == page[:-1]) & (stack['column'][1:] == stack['column'][:-1])))
+        pitch = np.concatenate(([np.nan], stack['top'][1:] - stack['top'][:-1]))
+        pitch[~same_block] = np.nan
+        typical_pitch = np.nanmedian(pitch) if np.isfinite(pitch).any() else np.inf
+        spaced = same_block & (pitch > self.paragraph_spacing * typical_pitch)
+
+        indent = stack['x0'] - stack['column_x0']
+        indent_changed = same_block & (np.abs(np.diff(indent, prepend=0.0)) > 0.5 * body_size)
+        # A paragraph ended on the previous line if it stopped well short of the column edge
+        previous_short = np.concatenate(([False], stack['x1'][:-1] < stack['column_x1'][:-1] - 2 * body_size))
+
+        boundary = heading | numbered | ((spaced | indent_changed) & previous_short)
+        # A heading belongs to the clause it introduces, unless a numbered clause follows it
+        boundary[1:] &= ~heading[:-1] | numbered[1:]
+        boundary[0] = True
+        return boundary, heading
+
+    def segment(self, lines: List[PageLines]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Document text in reading order, and clauses with the page regions they cover"""
+        texts = [text for page in lines for text in page.texts]
+        boundary, _ = self.boundaries(lines)
+        if not texts:
+            return '', []
+
+        page = np.concatenate([np.full(len(page_lines), page_lines.page) for page_lines in lines])
+        column = np.concatenate([page_lines.column for page_lines in lines])
+        box = {name: np.concatenate([getattr(page_lines, name) for page_lines in lines])
+               for name in ('x0', 'x1', 'top', 'bottom')}
+
+        clause = np.cumsum(boundary) - 1
+        # Regions: runs of lines of one clause on the same page and column
+        region_start = np.flatnonzero(np.concatenate(([True], (clause[1:] != clause[:-1]) | (page[1:] != page[:-1])
+                                                      | (column[1:] != column[:-1]))))
+        regions = {
+            'x0': np.minimum.reduceat(box['x0'], region_start),
+            'x1': np.maximum.reduceat(box['x1'], region_start),
+            'top': np.minimum.reduceat(box['top'], region_start),
+            'bottom': np.maximum.reduceat(box['bottom'], region_start),
+        }
+
+        clause_start = np.flatnonzero(boundary)
+        clause_end = np.append(clause_start[1:], len(texts))
+        region_clause = clause[region_start]
+        first_region = np.searchsorted(region_clause, np.arange(len(clause_start)), side='left')
+        last_region = np.searchsorted(region_clause, np.arange(len(clause_start)), side='right')
+        clauses = []
+        for index, (start, end) in enumerate(zip(clause_start, clause_end)):
+            content = ' '.join(texts[start:end])
+            if len(content) <= self.min_clause_chars:
+                continue
+            clauses.append({
+                'text': content,
+                'page': int(page[start]),
+                'regions': [
+                    {
+                        'page': int(page[region_start[r]]),
+                        'x0': round(float(regions['x0'][r]), 1),
+                        'top': round(float(regions['top'][r]), 1),
+                        'x1': round(float(regions['x1'][r]), 1),
+                        'bottom': round(float(regions['bottom'][r]), 1)
+                    }
+                    for r in range(first_region[index], last_region[index])
+                ]
+            })
+        return '\n'.join(texts), clauses
@@ -0,0 +1,168 @@
+"""
+Model serving modes.
+
+``MODEL_SERVING=local`` (default) loads the models in the process that imports the app.
+Combined with ``gunicorn -c gunicorn.conf.py`` the app is preloaded in the master and the
+workers share the weights copy-on-write.
+
+``MODEL_SERVING=remote`` loads no models in the HTTP workers. They call one dedicated
+inference process on the same node over a Unix socket instead:
+
+    python -m app.services.model_serving
+
+Connections are authenticated with ``INFERENCE_AUTHKEY``. Without it the inference process
+generates a random key and writes it to ``INFERENCE_AUTHKEY_FILE`` (owner-only), where the
+HTTP workers, running as the same user, read it. The socket itself is created owner-only.
+
+Either way the model weights exist once per node, whatever the number of HTTP workers.
+"""
+
+from multiprocessing.connection import Client, Listener
+from typing import Any, Optional
+import os
+import secrets
+import threading
+import logging
+
+from .nlp_analyzer import NLPAnalyzer
+from .clause_cache import ClauseCache
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/tmp/contract-inference.sock")
+INFERENCE_AUTHKEY_FILE = os.getenv("INFERENCE_AUTHKEY_FILE", INFERENCE_SOCKET + ".key")
+
+# Model attributes of NLPAnalyzer that may be called remotely
+REMOTE_MODELS = ("summarizer", "classifier", "encode_clauses")
+
+
+def client_authkey() -> bytes:
+    """``INFERENCE_AUTHKEY``, or the key the running inference process wrote to its key file"""
+    key = os.getenv("INFERENCE_AUTHKEY")
+    if key:
+        return key.encode()
+    with open(INFERENCE_AUTHKEY_FILE, "rb") as f:
+        return f.read().strip()
+
+
+def server_authkey() -> bytes:
+    """``INFERENCE_AUTHKEY``, or a new random key written owner-only to the key file"""
+    key = os.getenv("INFERENCE_AUTHKEY")
+    if key:
+        return key.encode()
+    key = secrets.token_hex(32).encode()
+    if os.path.exists(INFERENCE_AUTHKEY_FILE):
+        os.remove(INFERENCE_AUTHKEY_FILE)
+    descriptor = os.open(INFERENCE_AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, "wb") as f:
+        f.write(key)
+    return key
+
+
+class InferenceClient:
+    """Calls models in the inference process; one connection per calling thread"""
+
+    def __init__(self, address: str = INFERENCE_SOCKET, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = authkey  # None reads the key on every (re)connect, as a restart renews it
+        self._local = threading.local()
+
+    def call(self, model: str, *args, **kwargs) -> Any:
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.send((model, args, kwargs))
+                ok, result = connection.recv()
+                break
+            except (EOFError, OSError):
+                # The inference process restarted; reconnect once before giving up
+                self._local.connection = None
+                if attempt:
+                    raise
+        if not ok:
+            raise RuntimeError(f"Remote {model} failed: {result}")
+        return result
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = Client(self.address, family="AF_UNIX", authkey=self.authkey or client_authkey())
+            self._local.connection = connection
+        return connection
+
+
+class RemoteModel:
+    """Callable stand-in for a transformers pipeline that lives in the inference process"""
+
+    def __init__(self, client: InferenceClient, name: str):
+        self.client = client
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        return self.client.call(self.name, *args, **kwargs)
+
+
+def create_nlp_analyzer(clause_cache: Optional[ClauseCache] = None) -> NLPAnalyzer:
+    """Build the analyzer for the configured MODEL_SERVING mode"""
+    mode = os.getenv("MODEL_SERVING", "local")
+    if mode == "local":
+        # NLP_LOAD_MODELS=false runs rule-based analysis only (load tests, lightweight dev setups)
+        load_models = os.getenv("NLP_LOAD_MODELS", "true").lower() != "false"
+        return NLPAnalyzer(clause_cache=clause_cache, load_models=load_models)
+    if mode != "remote":
+        raise ValueError(f"Unsupported MODEL_SERVING mode: {mode}")
+
+    analyzer = NLPAnalyzer(clause_cache=clause_cache, load_models=False)
+    client = InferenceClient()
+    for name in REMOTE_MODELS:
+        setattr(analyzer, name, RemoteModel(client, name))
+    logger.info(f"Using remote inference process at {client.address}")
+    return analyzer
+
+
+def serve(address: str = INFERENCE_SOCKET, authkey: Optional[bytes] = None):
+    """Load the models once and answer model calls from HTTP workers"""
+    authkey = authkey or server_authkey()
+    analyzer = NLPAnalyzer()
+    models = {name: getattr(analyzer, name) for name in REMOTE_MODELS if getattr(analyzer, name) is not None}
+    logger.info(f"Inference process serving {sorted(models)} on {address}")
+
+    # Inference runs one call at a time; torch already parallelizes inside a call
+    inference_lock = threading.Lock()
+
+    def handle(connection):
+        with connection:
+            while True:
+                try:
+                    model, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if model not in models:
+                        raise ValueError(f"Model not loaded: {model}")
+                    with inference_lock:
+                        result = (True, models[model](*args, **kwargs))
+                except Exception as e:
+                    result = (False, str(e))
+                connection.send(result)
+
+    if os.path.exists(address):
+        os.remove(address)
+    # Bind with an owner-only umask so the socket is never connectable by other users
+    umask = os.umask(0o177)
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(umask)
+    with listener:
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                logger.warning(f"Rejected inference connection: {e}")
+                continue
+            threading.Thread(target=handle, args=(connection,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,15 +1,38 @@
 from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
 import re
 import spacy
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
+import numpy as np
+
+from .clause_cache import ClauseCache, clause_key, normalize_clause
+from .document import ContractDocument
+from .extractive_summarizer import TextRankSummarizer
+from ..metrics import model_timer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class NLPAnalyzer:
-    def __init__(self):
+    # Bump whenever clause classification, risk rules or explanations change so cached
+    # clause results from older rules are no longer served
+    CLAUSE_RULES_VERSION = "2"
+    
+    # fast: extractive TextRank in milliseconds; abstractive: BART, falling back to extractive
+    SUMMARY_MODES = ('fast', 'abstractive')
+    
+    def __init__(self, clause_cache: Optional[ClauseCache] = None, load_models: bool = True):
+        self.clause_cache = clause_cache
+        self.extractive_summarizer = TextRankSummarizer()
+        
+        if not load_models:
+            # Rule-based analysis only; callers may attach their own summarizer
+            self.summarizer = None
+            self.classifier = None
+            self.nlp = None
+            return
+        
         try:
             # Initialize summarization pipeline
             self.summarizer = pipeline(
@@ -41,27 +64,48 @@ class NLPAnalyzer:
             self.classifier = None
             self.nlp = None
     
-    def classify_clauses(self, text: str) -> List[Dict[str, Any]]:
-        """Classify contract clauses into categories"""
-        clauses = self._split_into_clauses(text)
+    def classify_clauses(self, document: Union[str, ContractDocument]) -> List[Dict[str, Any]]:
+        """Classify contract clauses into categories
+        
+        Clauses are the document's layout segments (with their page regions) when it has
+        them, else split from the text.
+        """
+        document = ContractDocument.of(document)
         classified_clauses = []
         
-        for clause in clauses:
-            category = self._classify_clause_category(clause)
-            risk_level = self._assess_clause_risk(clause, category)
+        for segment, clause_lower in zip(document.segments, document.clause_lowers):
+            clause = segment['text']
+            # The rules run on the normalized text the cache key is made from, so clauses
+            # sharing a key also share a result
+            normalized = normalize_clause(clause_lower, lowered=True)
+            key = clause_key(normalized, self.CLAUSE_RULES_VERSION) if self.clause_cache else None
+            result = self.clause_cache.get(key) if key else None
+            
+            if result is None:
+                result = self._analyze_clause(clause, normalized)
+                if key:
+                    self.clause_cache.put(key, result)
             
-            classified_clauses.append({
-                'text': clause,
-                'category': category,
-                'risk_level': risk_level,
-                'explanation': self._generate_explanation(clause, category, risk_level),
-                'suggestion': self._generate_suggestion(clause, category, risk_level) if risk_level in ['medium', 'high'] else None
-            })
+            classified_clauses.append({**segment, **result})
         
         return classified_clauses
     
-    def detect_risky_clauses(self, text: str) -> List[Dict[str, Any]]:
+    def _analyze_clause(self, clause: str, clause_lower: Optional[str] = None) -> Dict[str, Any]:
+        """Classify and risk-assess a single clause; the result is cacheable by clause content"""
+        clause_lower = clause.lower() if clause_lower is None else clause_lower
+        category = self._classify_clause_category(clause, clause_lower)
+        risk_level = self._assess_clause_risk(clause, category, clause_lower)
+        
+        return {
+            'category': category,
+            'risk_level': risk_level,
+            'explanation': self._generate_explanation(clause, category, risk_level),
+            'suggestion': self._generate_suggestion(clause, category, risk_level) if risk_level in ['medium', 'high'] else None
+        }
+    
+    def detect_risky_clauses(self, document: Union[str, ContractDocument]) -> List[Dict[str, Any]]:
         """Detect risky clauses using rule-based patterns"""
+        document = ContractDocument.of(document)
         risky_patterns = {
             'termination_without_notice': [
                 r'terminate.*immediately.*without.*notice',
@@ -91,11 +135,13 @@ class NLPAnalyzer:
         }
         
         risky_clauses = []
-        text_lower = text.lower()
+        text = document.text
+        text_lower = document.lower
         
         for risk_type, patterns in risky_patterns.items():
             for pattern in patterns:
-                matches = re.finditer(pattern, text_lower, re.IGNORECASE)
+                # Patterns are lowercase and so is the text; case-insensitive matching would only slow them down
+                matches = re.finditer(pattern, text_lower)
                 for match in matches:
                     # Extract surrounding context
                     start = max(0, match.start() - 100)
@@ -112,65 +158,79 @@ class NLPAnalyzer:
         
         return risky_clauses
     
-    def generate_summary(self, text: str) -> str:
-        """Generate abstractive summary of the contract"""
-        if not self.summarizer:
-            return self._generate_extractive_summary(text)
+    def summary_chunks(self, document: Union[str, ContractDocument], max_chunks: int = 3) -> List[str]:
+        """Leading chunks of the text the abstractive summary is made from"""
+        document = ContractDocument.of(document)
+        # Chunks of up to 1024 characters ending on a sentence; limit to first 3 chunks to avoid timeout
+        chunks = [document.text[start:end] for start, end in document.chunk_spans(1024, max_chunks)]
+        
+        # Only summarize substantial chunks
+        return [chunk for chunk in chunks if len(chunk.strip()) > 50]
+    
+    def generate_summary(self, document: Union[str, ContractDocument], mode: str = 'abstractive',
+                         risky_clauses: Optional[List[Dict[str, Any]]] = None, max_chunks: int = 3) -> str:
+        """Generate a summary of the contract in the given mode (see SUMMARY_MODES)"""
+        return self.summarize(document, mode, risky_clauses, max_chunks)[0]
+    
+    def summarize(self, document: Union[str, ContractDocument], mode: str = 'abstractive',
+                  risky_clauses: Optional[List[Dict[str, Any]]] = None, max_chunks: int = 3) -> Tuple[str, str]:
+        """Summary and the mode it was made in: 'fast' when BART is not loaded or failed"""
+        if mode not in self.SUMMARY_MODES:
+            raise ValueError(f"Unsupported summary mode: {mode}")
+        document = ContractDocument.of(document)
+        if mode == 'fast' or not self.summarizer:
+            return self._generate_extractive_summary(document, risky_clauses), 'fast'
         
         try:
-            # Split text into chunks if too long
-            max_chunk_length = 1024
-            chunks = [text[i:i+max_chunk_length] for i in range(0, len(text), max_chunk_length)]
+            batch = self.summary_chunks(document, max_chunks)
+            if not batch:
+                return '', 'abstractive'
             
-            summaries = []
-            for chunk in chunks[:3]:  # Limit to first 3 chunks to avoid timeout
-                if len(chunk.strip()) > 50:  # Only summarize substantial chunks
-                    summary = self.summarizer(chunk, max_length=100, min_length=30, do_sample=False)
-                    summaries.append(summary[0]['summary_text'])
+            # One batched pipeline call instead of one call per chunk
+            with model_timer('summarizer', len(batch)):
+                outputs = self.summarizer(batch, max_length=100, min_length=30, do_sample=False)
             
-            return ' '.join(summaries)
+            return ' '.join(output['summary_text'] for output in outputs), 'abstractive'
             
         except Exception as e:
             logger.error(f"Error in summarization: {e}")
-            return self._generate_extractive_summary(text)
+            return self._generate_extractive_summary(document, risky_clauses), 'fast'
     
-    def _split_into_clauses(self, text: str) -> List[str]:
-        """Split contract text into individual clauses"""
-        # Simple clause splitting based on common patterns
-        clause_patterns = [
-            r'\n\d+\.',  # Numbered clauses
-            r'\n[A-Z]\.',  # Lettered clauses
-            r'\n\([a-z]\)',  # Parenthetical clauses
-            r'\n[A-Z][A-Z\s]+:',  # Section headers
-        ]
+    def encode_clauses(self, clauses: List[str], batch_size: int = 32) -> Optional[np.ndarray]:
+        """Embed clauses with the legal-BERT encoder (mean-pooled, unit length)
         
-        clauses = []
-        current_clause = ""
+        Returns a float32 array of shape (len(clauses), hidden size), or None when the
+        legal-domain model is not loaded.
+        """
+        if not self.classifier or not hasattr(self.classifier, 'model'):
+            return None
         
-        lines = text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check if this line starts a new clause
-            is_new_clause = any(re.match(pattern, '\n' + line) for pattern in clause_patterns)
-            
-            if is_new_clause and current_clause:
-                clauses.append(current_clause.strip())
-                current_clause = line
-            else:
-                current_clause += ' ' + line
+        import torch
         
-        if current_clause:
-            clauses.append(current_clause.strip())
+        tokenizer = self.classifier.tokenizer
+        encoder = self.classifier.model.base_model
+        vectors = []
+        with torch.no_grad():
+            for start in range(0, len(clauses), batch_size):
+                batch = clauses[start:start + batch_size]
+                inputs = tokenizer(batch, padding=True, truncation=True, max_length=256, return_tensors='pt')
+                with model_timer('encoder', len(batch)):
+                    hidden = encoder(**inputs).last_hidden_state
+                mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                vectors.append(torch.nn.functional.normalize(pooled, dim=1).cpu().numpy())
         
-        # Filter out very short clauses
-        return [clause for clause in clauses if len(clause) > 50]
+        if not vectors:
+            return np.zeros((0, encoder.config.hidden_size), dtype=np.float32)
+        return np.concatenate(vectors).astype(np.float32)
+    
+    def _split_into_clauses(self, text: str) -> List[str]:
+        """Split contract text into individual clauses (see ContractDocument.clause_lines)"""
+        return ContractDocument(text).clause_texts
     
-    def _classify_clause_category(self, clause: str) -> str:
+    def _classify_clause_category(self, clause: str, clause_lower: Optional[str] = None) -> str:
         """Classify a clause into a category"""
-        clause_lower = clause.lower()
+        clause_lower = clause.lower() if clause_lower is None else clause_lower
         
         categories = {
             'termination': ['terminate', 'termination', 'end', 'expire', 'dissolution'],
@@ -191,9 +251,9 @@ class NLPAnalyzer:
         
         return 'general'
     
-    def _assess_clause_risk(self, clause: str, category: str) -> str:
+    def _assess_clause_risk(self, clause: str, category: str, clause_lower: Optional[str] = None) -> str:
         """Assess the risk level of a clause"""
-        clause_lower = clause.lower()
+        clause_lower = clause.lower() if clause_lower is None else clause_lower
         
         high_risk_indicators = [
             'immediately', 'without notice', 'unlimited', 'all damages',
@@ -243,7 +303,7 @@ class NLPAnalyzer:
         """Generate suggestions for risky clauses"""
         if risk_level == 'low':
             return None
-            
+        
         suggestions = {
             'termination': 'Consider requiring 30-60 days written notice for termination to allow for proper transition planning.',
             'payment': 'Negotiate for more reasonable payment terms and consider adding caps on penalties.',
@@ -266,9 +326,7 @@ class NLPAnalyzer:
         
         return explanations.get(risk_type, 'This clause pattern has been identified as potentially risky.')
     
-    def _generate_extractive_summary(self, text: str) -> str:
-        """Generate extractive summary as fallback"""
-        sentences = re.split(r'[.!?]+', text)
-        # Take first few sentences as a basic summary
-        summary_sentences = [s.strip() for s in sentences[:3] if len(s.strip()) > 20]
-        return '. '.join(summary_sentences) + '.'
\ No newline at end of file
+    def _generate_extractive_summary(self, document: ContractDocument,
+                                     risky_clauses: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Generate extractive summary, favouring sentences with risky patterns"""
+        return self.extractive_summarizer.summarize(document, risky_clauses)
\ No newline at end of file
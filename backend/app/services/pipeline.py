@@ -0,0 +1,102 @@
+"""
+Steps of the analysis pipeline shared by the API and the offline batch runner.
+
+Both read stored uploads the same way and persist results the same way, so a contract
+analyzed by ``python -m app.services.batch`` is indistinguishable from one analyzed
+through ``POST /analyze``.
+"""
+
+from typing import Any, Dict, Optional
+import os
+import uuid
+
+from ..models import Contract, ContractClause, ContractRiskyMatch
+from .document import ContractDocument
+
+
+def extract_stored(extractor, blob_store, contract: Contract, fast: bool = False) -> ContractDocument:
+    """Document of a stored upload: text, page count and layout clause segments, if any
+
+    Local blobs are read through a memory map. ``fast`` takes the quick PDF text path.
+    """
+    if not contract.content_hash:
+        # Uploaded before content-addressed storage
+        if not os.path.exists(contract.file_path):
+            raise FileNotFoundError(f"File not found: {contract.file_path}")
+        return ContractDocument(*extractor.extract_document(contract.file_path, contract.file_type, fast=fast))
+    with blob_store.open(contract.content_hash) as stream:
+        return ContractDocument(*extractor.extract_document(stream, contract.file_type, fast=fast))
+
+
+def store_analysis(db, contract: Contract, result: Dict[str, Any], search_index, similarity_index,
+                   embedding_store, analytics, clause_vectors: Optional[Any] = None):
+    """Write an analysis to the contract, its clause and risky match rows, the indexes and the rollups
+
+    ``result`` holds text, summary, summary_mode, risk_score, risk_breakdown,
+    risky_pattern_counts, clauses, risky_clauses and signature, and optionally the
+    degraded_stages of a budgeted analysis. Rows of an earlier analysis
+    are replaced, so re-analysis is idempotent. Clause dicts get their new ``id``. The caller
+    commits.
+    """
+    contract_id = contract.id
+    before = analytics.locked_contribution_of(db, contract)
+    contract.extracted_text = result['text']
+    contract.summary = result['summary']
+    contract.summary_mode = result['summary_mode']
+    contract.risk_score = result['risk_score']
+    contract.risk_breakdown = result['risk_breakdown']
+    contract.risky_pattern_counts = result['risky_pattern_counts']
+    contract.degraded_stages = result.get('degraded_stages') or None
+    contract.error_message = None
+    contract.status = "completed"
+    analytics.record(db, before, analytics.contribution_of(contract))
+
+    embedding_store.remove_contract(db, contract_id)
+    db.query(ContractClause).filter(ContractClause.contract_id == contract_id).delete()
+    db.query(ContractRiskyMatch).filter(ContractRiskyMatch.contract_id == contract_id).delete()
+    clauses = result['clauses']
+    for position, clause in enumerate(clauses):
+        clause['id'] = str(uuid.uuid4())
+        db.add(ContractClause(
+            id=clause['id'],
+            contract_id=contract_id,
+            position=position,
+            category=clause['category'],
+            risk_level=clause.get('risk_level', 'low'),
+            content=clause['text'],
+            explanation=clause.get('explanation', ''),
+            suggestion=clause.get('suggestion'),
+            page=clause.get('page'),
+            regions=clause.get('regions')
+        ))
+    for position, risky_clause in enumerate(result['risky_clauses']):
+        db.add(ContractRiskyMatch(
+            contract_id=contract_id,
+            position=position,
+            type=risky_clause['type'],
+            risk_level=risky_clause['risk_level'],
+            matched_text=risky_clause['matched_text'],
+            context=risky_clause['context']
+        ))
+
+    # Keep the full-text and similarity indexes in step with the analysis
+    search_index.index_contract(db, contract_id, result['text'], clauses)
+    similarity_index.index_contract(db, contract_id, result['signature'])
+    if clause_vectors is not None:
+        embedding_store.add(db, contract_id, [clause['id'] for clause in clauses], clause_vectors)
+
+
+def remove_contract(db, contract: Contract, search_index, similarity_index, embedding_store, analytics):
+    """Delete a contract with its analysis rows, index entries and rollup contribution
+
+    The upload itself is left to the caller, as other contracts may share its blob. The
+    caller commits.
+    """
+    contract_id = contract.id
+    analytics.record(db, analytics.locked_contribution_of(db, contract), None)
+    embedding_store.remove_contract(db, contract_id)
+    search_index.remove_contract(db, contract_id)
+    similarity_index.remove_contract(db, contract_id)
+    db.query(ContractClause).filter(ContractClause.contract_id == contract_id).delete()
+    db.query(ContractRiskyMatch).filter(ContractRiskyMatch.contract_id == contract_id).delete()
+    db.delete(contract)
@@ -0,0 +1,165 @@
+"""
+Bulk re-scoring of the whole portfolio from stored scoring inputs.
+
+Every completed analysis stores its category x risk-level clause counts and its risky
+pattern counts. Re-scoring loads them in keyset-paginated batches, computes all scores of
+a batch with one NumPy expression (RiskScorer.score_matrix) and writes back only the
+scores that changed, one executemany UPDATE per batch, together with their net change to
+the analytics rollups. A batch's rows stay locked from the read to the commit, so an analysis
+stored meanwhile waits instead of being overwritten with a score of its old inputs. No model
+is called.
+
+    python -m app.services.rescoring --weights weights.json   # merged into RISK_WEIGHTS_FILE
+    python -m app.services.rescoring --backfill   # contracts analyzed before inputs were stored
+"""
+
+from sqlalchemy import select, update, func
+from typing import Dict, Any, List, Optional
+import argparse
+import json
+import time
+import numpy as np
+
+from ..models import Contract, ContractClause
+from .risk_scorer import RiskScorer, RISK_LEVELS
+from .analytics import PortfolioAnalytics, RollupDelta
+
+
+def _count_matrix(breakdowns: List[Dict[str, Dict[str, int]]]):
+    """Stack per-contract breakdowns into a (contracts, categories, levels) array"""
+    categories = sorted({category for breakdown in breakdowns for category in breakdown})
+    category_index = {category: i for i, category in enumerate(categories)}
+    counts = np.zeros((len(breakdowns), len(categories), len(RISK_LEVELS)))
+    for row, breakdown in enumerate(breakdowns):
+        for category, levels in breakdown.items():
+            counts[row, category_index[category]] = [levels.get(level, 0) for level in RISK_LEVELS]
+    return counts, categories
+
+
+def bulk_rescore(db, scorer: RiskScorer, batch_size: int = 10000,
+                 analytics: Optional[PortfolioAnalytics] = None) -> Dict[str, Any]:
+    """Recompute the risk score of every completed contract that has stored scoring inputs"""
+    analytics = analytics or PortfolioAnalytics()
+    started = time.perf_counter()
+    scanned = 0
+    updated = 0
+    last_id = ""
+
+    while True:
+        rows = db.execute(
+            select(Contract.id, Contract.upload_date, Contract.file_type, Contract.risk_score,
+                   Contract.risk_breakdown, Contract.risky_pattern_counts)
+            .where(Contract.status == "completed", Contract.risk_breakdown.isnot(None), Contract.id > last_id)
+            .order_by(Contract.id)
+            .limit(batch_size)
+            .with_for_update()
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+
+        counts, categories = _count_matrix([row.risk_breakdown or {} for row in rows])
+        risky_counts = np.array([sum((row.risky_pattern_counts or {}).values()) for row in rows], dtype=float)
+        scores = scorer.score_matrix(counts, risky_counts, categories)
+
+        changes = []
+        delta = RollupDelta()
+        for row, score in zip(rows, scores):
+            if row.risk_score is None or abs(row.risk_score - score) > 1e-9:
+                changes.append({"id": row.id, "risk_score": float(score)})
+                delta.change(analytics.contribution_of(row),
+                             analytics.contribution(row.upload_date, row.file_type, float(score), row.risk_breakdown))
+        if changes:
+            db.execute(update(Contract), changes)
+            analytics.apply(db, delta)
+            updated += len(changes)
+        db.commit()
+
+    return {
+        "scanned": scanned,
+        "updated": updated,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def backfill_scoring_inputs(db, analyzer, scorer: RiskScorer, batch_size: int = 1000,
+                            analytics: Optional[PortfolioAnalytics] = None) -> int:
+    """Store scoring inputs for completed contracts analyzed before they were persisted
+
+    Clause counts come from the stored clauses; risky patterns are re-detected with the
+    rule-based matcher on the stored text, so no model is needed.
+    """
+    analytics = analytics or PortfolioAnalytics()
+    filled = 0
+    last_id = ""
+    while True:
+        contracts = db.execute(
+            select(Contract)
+            .where(Contract.status == "completed", Contract.risk_breakdown.is_(None), Contract.id > last_id)
+            .order_by(Contract.id)
+            .limit(batch_size)
+            .with_for_update()
+        ).scalars().all()
+        if not contracts:
+            break
+        last_id = contracts[-1].id
+
+        breakdowns = {contract.id: {} for contract in contracts}
+        grouped = db.execute(
+            select(ContractClause.contract_id, ContractClause.category, ContractClause.risk_level, func.count())
+            .where(ContractClause.contract_id.in_(list(breakdowns)))
+            .group_by(ContractClause.contract_id, ContractClause.category, ContractClause.risk_level)
+        ).all()
+        for contract_id, category, risk_level, count in grouped:
+            levels = breakdowns[contract_id].setdefault(category, {'low': 0, 'medium': 0, 'high': 0})
+            levels[risk_level] = count
+
+        delta = RollupDelta()
+        for contract in contracts:
+            before = analytics.contribution_of(contract)
+            contract.risk_breakdown = breakdowns[contract.id]
+            delta.change(before, analytics.contribution_of(contract))
+            contract.risky_pattern_counts = scorer.get_risky_pattern_counts(
+                analyzer.detect_risky_clauses(contract.extracted_text or "")
+            )
+        analytics.apply(db, delta)
+        db.commit()
+        filled += len(contracts)
+    return filled
+
+
+def main(argv=None):
+    from ..database import SessionLocal
+    from .nlp_analyzer import NLPAnalyzer
+
+    parser = argparse.ArgumentParser(description="Re-score every analyzed contract from stored inputs")
+    parser.add_argument("--weights", help="JSON file with category_weights, risk_scores, risky_pattern_penalty; "
+                                          "merged into RISK_WEIGHTS_FILE")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--backfill", action="store_true",
+                        help="First store scoring inputs for contracts analyzed before they were persisted")
+    args = parser.parse_args(argv)
+
+    # Weights given here are saved to RISK_WEIGHTS_FILE, so the API scores new analyses alike
+    scorer = RiskScorer.from_env()
+    if args.weights:
+        with open(args.weights) as f:
+            try:
+                scorer.update(json.load(f))
+            except ValueError as e:
+                parser.error(str(e))
+
+    db = SessionLocal()
+    try:
+        if args.backfill:
+            filled = backfill_scoring_inputs(db, NLPAnalyzer(load_models=False), scorer)
+            print(f"Backfilled scoring inputs for {filled} contracts")
+        result = bulk_rescore(db, scorer, batch_size=args.batch_size)
+        print(f"Re-scored {result['scanned']} contracts, {result['updated']} changed, in {result['seconds']}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
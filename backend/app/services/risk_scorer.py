@@ -1,46 +1,156 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import json
+import math
+import os
+import tempfile
+import numpy as np
+
+# Order of the risk-level axis in count matrices
+RISK_LEVELS = ('low', 'medium', 'high')
+
+# Risk weights for different categories (every category clauses are classified into)
+CATEGORY_WEIGHTS = {
+    'termination': 0.2,
+    'liability': 0.25,
+    'payment': 0.15,
+    'confidentiality': 0.1,
+    'jurisdiction': 0.1,
+    'indemnification': 0.15,
+    'general': 0.05
+}
+
+# Risk level scores
+LEVEL_SCORES = {
+    'low': 10,
+    'medium': 50,
+    'high': 90
+}
 
 class RiskScorer:
-    def __init__(self):
-        # Risk weights for different categories
-        self.category_weights = {
-            'termination': 0.2,
-            'liability': 0.25,
-            'payment': 0.15,
-            'confidentiality': 0.1,
-            'jurisdiction': 0.1,
-            'indemnification': 0.15,
-            'general': 0.05
-        }
+    def __init__(self, category_weights: Optional[Dict[str, float]] = None,
+                 risk_scores: Optional[Dict[str, float]] = None,
+                 risky_pattern_penalty: float = 5, default_weight: float = 0.05,
+                 path: Optional[str] = None):
+        self._configure(category_weights, risk_scores, risky_pattern_penalty, default_weight)
+        # JSON file the weights are loaded from and saved to, and its mtime when last read
+        self.path = path
+        self._loaded_mtime = None
+    
+    def _configure(self, category_weights: Optional[Dict[str, float]], risk_scores: Optional[Dict[str, float]],
+                   risky_pattern_penalty: float, default_weight: float):
+        # Partial maps override only the categories and levels they name
+        self.category_weights = {**CATEGORY_WEIGHTS, **(category_weights or {})}
+        self.risk_scores = {**LEVEL_SCORES, **(risk_scores or {})}
         
-        # Risk level scores
-        self.risk_scores = {
-            'low': 10,
-            'medium': 50,
-            'high': 90
+        # Points added per detected risky pattern, and weight of categories without one
+        self.risky_pattern_penalty = risky_pattern_penalty
+        self.default_weight = default_weight
+    
+    @classmethod
+    def from_env(cls) -> "RiskScorer":
+        """Load weights from the JSON file named by RISK_WEIGHTS_FILE, if set
+
+        The file need not exist yet: weight overrides are saved to it (see ``update``).
+        """
+        scorer = cls(path=os.getenv("RISK_WEIGHTS_FILE"))
+        scorer.refresh()
+        return scorer
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RiskScorer":
+        """Build a scorer from a dict with any of the constructor's keyword arguments"""
+        return cls(
+            category_weights=config.get('category_weights'),
+            risk_scores=config.get('risk_scores'),
+            risky_pattern_penalty=config.get('risky_pattern_penalty', 5),
+            default_weight=config.get('default_weight', 0.05)
+        )
+    
+    def config(self) -> Dict[str, Any]:
+        return {
+            'category_weights': dict(self.category_weights),
+            'risk_scores': dict(self.risk_scores),
+            'risky_pattern_penalty': self.risky_pattern_penalty,
+            'default_weight': self.default_weight
         }
     
+    def refresh(self):
+        """Reload the weights file if it changed since it was read, e.g. saved by another worker"""
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        with open(self.path) as f:
+            config = json.load(f)
+        self._configure(config.get('category_weights'), config.get('risk_scores'),
+                        config.get('risky_pattern_penalty', 5), config.get('default_weight', 0.05))
+        self._loaded_mtime = mtime
+    
+    def update(self, overrides: Dict[str, Any]):
+        """Merge overrides into the weights and save them, so every later analysis scores alike
+        
+        Raises ValueError for empty maps, unknown categories or levels, or when no weights
+        file is configured.
+        """
+        for key, known in (('category_weights', CATEGORY_WEIGHTS), ('risk_scores', LEVEL_SCORES)):
+            if key not in overrides:
+                continue
+            if not overrides[key]:
+                raise ValueError(f"{key} must name at least one entry")
+            unknown = sorted(set(overrides[key]) - set(known))
+            if unknown:
+                raise ValueError(f"Unknown {key} entries: {', '.join(unknown)}")
+        if not self.path:
+            raise ValueError("Set RISK_WEIGHTS_FILE to change scoring weights")
+        
+        self.refresh()
+        config = self.config()
+        for key in ('category_weights', 'risk_scores'):
+            config[key].update(overrides.get(key, {}))
+        for key in ('risky_pattern_penalty', 'default_weight'):
+            config[key] = overrides.get(key, config[key])
+        
+        # Written aside and renamed, so no worker reads a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._configure(**config)
+        self._loaded_mtime = os.stat(self.path).st_mtime_ns
+    
     def calculate_risk_score(self, clauses: List[Dict[str, Any]], risky_clauses: List[Dict[str, Any]]) -> float:
         """Calculate overall contract risk score (0-100)"""
         if not clauses:
             return 0.0
         
-        total_weighted_score = 0.0
-        total_weight = 0.0
+        weighted_scores = []
+        weights = []
         
         # Calculate weighted score from classified clauses
         for clause in clauses:
             category = clause.get('category', 'general')
             risk_level = clause.get('risk_level', 'low')
             
-            weight = self.category_weights.get(category, 0.05)
+            weight = self.category_weights.get(category, self.default_weight)
             score = self.risk_scores.get(risk_level, 10)
             
-            total_weighted_score += weight * score
-            total_weight += weight
+            weighted_scores.append(weight * score)
+            weights.append(weight)
+        
+        return self._final_score(weighted_scores, weights, len(risky_clauses))
+    
+    def _final_score(self, weighted_scores: List[float], weights: List[float], risky_count: int) -> float:
+        # Exactly rounded sums do not depend on clause order, so score_matrix can reproduce
+        # the score from stored clause counts
+        total_weighted_score = math.fsum(weighted_scores)
+        total_weight = math.fsum(weights)
         
         # Add penalty for detected risky patterns
-        risky_penalty = len(risky_clauses) * 5  # 5 points per risky pattern
+        risky_penalty = risky_count * self.risky_pattern_penalty
         
         # Calculate base score
         if total_weight > 0:
@@ -53,6 +163,40 @@ class RiskScorer:
         
         return round(final_score, 1)
     
+    def score_matrix(self, counts: np.ndarray, risky_counts: np.ndarray, categories: List[str]) -> np.ndarray:
+        """Vectorized calculate_risk_score over many contracts at once
+        
+        ``counts`` has shape (contracts, len(categories), len(RISK_LEVELS)) and holds what
+        get_risk_breakdown returns per contract; ``risky_counts`` holds the number of risky
+        pattern matches per contract. Results equal calculate_risk_score: scores whose vectorized
+        value lies on a rounding tie are recomputed with its exactly rounded sums.
+        """
+        weights = np.array([self.category_weights.get(category, self.default_weight) for category in categories])
+        level_scores = np.array([self.risk_scores.get(level, 10) for level in RISK_LEVELS], dtype=float)
+        
+        weight_per_contract = np.einsum('ncl,c->n', counts, weights)
+        weighted_score = np.einsum('ncl,c,l->n', counts, weights, level_scores)
+        
+        base_score = np.full(len(counts), 10.0)
+        np.divide(weighted_score, weight_per_contract, out=base_score, where=weight_per_contract > 0)
+        
+        final_score = np.minimum(100, base_score + risky_counts * self.risky_pattern_penalty)
+        # Contracts without clauses score 0, as in calculate_risk_score
+        final_score[counts.sum(axis=(1, 2)) == 0] = 0.0
+        
+        # Summation order only matters within float error of a .x5 tie
+        scaled = final_score * 10
+        ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+        rounded = np.round(final_score, 1)
+        for row in ties.tolist():
+            weighted_scores = []
+            clause_weights = []
+            for (category, level), count in np.ndenumerate(counts[row]):
+                weighted_scores += [float(weights[category] * level_scores[level])] * int(count)
+                clause_weights += [float(weights[category])] * int(count)
+            rounded[row] = self._final_score(weighted_scores, clause_weights, int(risky_counts[row]))
+        return rounded
+    
     def get_risk_level_from_score(self, score: float) -> str:
         """Convert numeric score to risk level"""
         if score >= 70:
@@ -75,4 +219,11 @@ class RiskScorer:
             
             breakdown[category][risk_level] += 1
         
-        return breakdown
\ No newline at end of file
+        return breakdown
+    
+    def get_risky_pattern_counts(self, risky_clauses: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Count detected risky pattern matches by type"""
+        counts = {}
+        for risky_clause in risky_clauses:
+            counts[risky_clause['type']] = counts.get(risky_clause['type'], 0) + 1
+        return counts
@@ -0,0 +1,379 @@
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+import math
+import os
+import re
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Index entry kinds: one "document" entry per contract, one "clause" entry per classified clause
+KIND_DOCUMENT = "document"
+KIND_CLAUSE = "clause"
+
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r'\w+')
+
+
+def parse_query(query: str) -> List[List[str]]:
+    """Parse a user query into phrases; quoted text is a phrase, bare words are single-term phrases"""
+    phrases = []
+    for quoted, bare in _QUERY_TOKEN_RE.findall(query):
+        terms = _WORD_RE.findall((quoted or bare).lower())
+        if terms:
+            phrases.append(terms)
+    return phrases
+
+
+def build_entries(contract_id: str, text_content: str, clauses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build index entries for a contract's extracted text and its classified clauses"""
+    entries = [{
+        'contract_id': contract_id,
+        'clause_id': None,
+        'kind': KIND_DOCUMENT,
+        'category': None,
+        'content': text_content or ''
+    }]
+    for clause in clauses:
+        entries.append({
+            'contract_id': contract_id,
+            'clause_id': clause['id'],
+            'kind': KIND_CLAUSE,
+            'category': clause['category'],
+            'content': clause['text']
+        })
+    return entries
+
+
+class SQLiteFTSBackend:
+    """SQLite FTS5 virtual table with bm25 ranking (development)"""
+    name = "sqlite_fts5"
+
+    def setup(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS contract_search USING fts5("
+                "content, contract_id UNINDEXED, clause_id UNINDEXED, kind UNINDEXED, category UNINDEXED, "
+                "tokenize = 'porter unicode61')"
+            ))
+
+    def index_contract(self, db, contract_id: str, entries: List[Dict[str, Any]]):
+        self.remove_contract(db, contract_id)
+        if entries:
+            db.execute(text(
+                "INSERT INTO contract_search (content, contract_id, clause_id, kind, category) "
+                "VALUES (:content, :contract_id, :clause_id, :kind, :category)"
+            ), entries)
+
+    def remove_contract(self, db, contract_id: str):
+        db.execute(text("DELETE FROM contract_search WHERE contract_id = :contract_id"),
+                   {'contract_id': contract_id})
+
+    def search(self, db, query: str, kind: str, category: Optional[str],
+               limit: int, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
+        phrases = parse_query(query)
+        if not phrases:
+            return 0, []
+        # Quote every phrase so user input can never be parsed as FTS5 operators
+        match = ' '.join('"' + ' '.join(terms) + '"' for terms in phrases)
+        where = "contract_search MATCH :match AND kind = :kind"
+        params = {'match': match, 'kind': kind, 'limit': limit, 'offset': offset}
+        if category:
+            where += " AND category = :category"
+            params['category'] = category
+
+        total = db.execute(text(f"SELECT count(*) FROM contract_search WHERE {where}"), params).scalar()
+        rows = db.execute(text(
+            "SELECT contract_id, clause_id, category, "
+            "snippet(contract_search, 0, '<b>', '</b>', '...', 24) AS snippet, "
+            "bm25(contract_search) AS rank "
+            f"FROM contract_search WHERE {where} ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), params).mappings().all()
+        # bm25() is lower-is-better; flip the sign so higher scores mean better matches
+        return total, [
+            {'contract_id': row['contract_id'], 'clause_id': row['clause_id'], 'category': row['category'],
+             'snippet': row['snippet'], 'score': -row['rank']}
+            for row in rows
+        ]
+
+
+class PostgresFTSBackend:
+    """Postgres tsvector column with a GIN index, ranked with ts_rank_cd (production)"""
+    name = "postgres_tsvector"
+
+    def setup(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS contract_search ("
+                "id BIGSERIAL PRIMARY KEY, "
+                "contract_id VARCHAR NOT NULL, "
+                "clause_id VARCHAR, "
+                "kind VARCHAR NOT NULL, "
+                "category VARCHAR, "
+                "content TEXT NOT NULL, "
+                "tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', content)) STORED)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_contract_search_tsv ON contract_search USING GIN (tsv)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_contract_search_contract_id ON contract_search (contract_id)"
+            ))
+
+    def index_contract(self, db, contract_id: str, entries: List[Dict[str, Any]]):
+        self.remove_contract(db, contract_id)
+        if entries:
+            db.execute(text(
+                "INSERT INTO contract_search (contract_id, clause_id, kind, category, content) "
+                "VALUES (:contract_id, :clause_id, :kind, :category, :content)"
+            ), entries)
+
+    def remove_contract(self, db, contract_id: str):
+        db.execute(text("DELETE FROM contract_search WHERE contract_id = :contract_id"),
+                   {'contract_id': contract_id})
+
+    def search(self, db, query: str, kind: str, category: Optional[str],
+               limit: int, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
+        if not parse_query(query):
+            return 0, []
+        # websearch_to_tsquery understands quoted phrases and never raises on user input
+        where = "tsv @@ q AND kind = :kind"
+        params = {'query': query, 'kind': kind, 'limit': limit, 'offset': offset}
+        if category:
+            where += " AND category = :category"
+            params['category'] = category
+
+        total = db.execute(text(
+            "SELECT count(*) FROM contract_search, websearch_to_tsquery('english', :query) q "
+            f"WHERE {where}"
+        ), params).scalar()
+        rows = db.execute(text(
+            "SELECT contract_id, clause_id, category, score, "
+            "ts_headline('english', content, q, 'MaxFragments=1, MaxWords=24, MinWords=8') AS snippet "
+            "FROM (SELECT contract_id, clause_id, category, content, q, ts_rank_cd(tsv, q) AS score "
+            "FROM contract_search, websearch_to_tsquery('english', :query) q "
+            f"WHERE {where} ORDER BY score DESC LIMIT :limit OFFSET :offset) page "
+            "ORDER BY score DESC"
+        ), params).mappings().all()
+        return total, [dict(row) for row in rows]
+
+
+class InvertedIndexBackend:
+    """In-process positional inverted index with BM25 ranking, rebuilt from the database on startup
+
+    The index lives in one process: with several workers each holds its own copy and only
+    sees the analyses that worker stored, so use it with a single worker. Changes are held
+    back until the session commits and dropped if it rolls back.
+    """
+    name = "memory"
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Separate postings per entry kind keep document frequencies (and BM25 idf) per kind
+        self._postings = {KIND_DOCUMENT: defaultdict(dict), KIND_CLAUSE: defaultdict(dict)}  # term -> {doc_key: [positions]}
+        self._docs = {}  # doc_key -> entry with token length
+        self._contract_docs = defaultdict(list)  # contract_id -> [doc_key]
+        self._next_key = 0
+        self._total_length = {KIND_DOCUMENT: 0, KIND_CLAUSE: 0}
+        self._doc_count = {KIND_DOCUMENT: 0, KIND_CLAUSE: 0}
+
+    def setup(self, engine):
+        pass
+
+    def rebuild(self, db):
+        """Load every completed contract and its stored clauses into memory"""
+        rows = db.execute(text(
+            "SELECT c.id, c.extracted_text, cl.id AS clause_id, cl.category, cl.content "
+            "FROM contracts c LEFT JOIN contract_clauses cl ON cl.contract_id = c.id "
+            "WHERE c.status = 'completed' ORDER BY c.id, cl.position"
+        )).mappings()
+
+        grouped = {}
+        for row in rows:
+            entry = grouped.setdefault(row['id'], {'text': row['extracted_text'], 'clauses': []})
+            if row['clause_id']:
+                entry['clauses'].append({'id': row['clause_id'], 'category': row['category'],
+                                         'text': row['content']})
+
+        for contract_id, entry in grouped.items():
+            self._index(contract_id, build_entries(contract_id, entry['text'], entry['clauses']))
+        logger.info(f"In-memory search index rebuilt with {len(grouped)} contracts")
+
+    def index_contract(self, db, contract_id: str, entries: List[Dict[str, Any]]):
+        self._defer(db, lambda: self._index(contract_id, entries))
+
+    def remove_contract(self, db, contract_id: str):
+        self._defer(db, lambda: self._remove(contract_id))
+
+    def _defer(self, db, change):
+        """Queue a change until the session's transaction commits"""
+        pending = db.info.get('search_index_pending')
+        if pending is None:
+            pending = db.info['search_index_pending'] = []
+            event.listen(db, 'after_commit', self._apply_pending)
+            event.listen(db, 'after_soft_rollback', self._discard_pending)
+        pending.append(change)
+
+    def _apply_pending(self, session):
+        pending = session.info.get('search_index_pending') or []
+        session.info['search_index_pending'] = []
+        for change in pending:
+            change()
+
+    def _discard_pending(self, session, previous_transaction):
+        if not previous_transaction.nested:
+            session.info['search_index_pending'] = []
+
+    def _index(self, contract_id: str, entries: List[Dict[str, Any]]):
+        with self._lock:
+            self._remove(contract_id)
+            for entry in entries:
+                terms = [term.lower() for term in _WORD_RE.findall(entry['content'])]
+                key = self._next_key
+                self._next_key += 1
+
+                positions = defaultdict(list)
+                for position, term in enumerate(terms):
+                    positions[term].append(position)
+                postings = self._postings[entry['kind']]
+                for term, term_positions in positions.items():
+                    postings[term][key] = term_positions
+
+                self._docs[key] = dict(entry, length=len(terms))
+                self._contract_docs[contract_id].append(key)
+                self._total_length[entry['kind']] += len(terms)
+                self._doc_count[entry['kind']] += 1
+
+    def _remove(self, contract_id: str):
+        with self._lock:
+            for key in self._contract_docs.pop(contract_id, []):
+                doc = self._docs.pop(key)
+                self._total_length[doc['kind']] -= doc['length']
+                self._doc_count[doc['kind']] -= 1
+                kind_postings = self._postings[doc['kind']]
+                for term in set(t.lower() for t in _WORD_RE.findall(doc['content'])):
+                    postings = kind_postings.get(term)
+                    if postings is not None:
+                        postings.pop(key, None)
+                        if not postings:
+                            del kind_postings[term]
+
+    def search(self, db, query: str, kind: str, category: Optional[str],
+               limit: int, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
+        phrases = parse_query(query)
+        if not phrases:
+            return 0, []
+
+        with self._lock:
+            postings = self._postings[kind]
+            # Intersect the posting lists, starting from the rarest term
+            terms = sorted({term for phrase in phrases for term in phrase},
+                           key=lambda term: len(postings.get(term, ())))
+            candidates = set(postings.get(terms[0], ()))
+            for term in terms[1:]:
+                candidates &= postings.get(term, {}).keys()
+                if not candidates:
+                    return 0, []
+
+            matches = []
+            for key in candidates:
+                if category and self._docs[key]['category'] != category:
+                    continue
+                if all(self._contains_phrase(postings, key, phrase) for phrase in phrases if len(phrase) > 1):
+                    matches.append(key)
+
+            scored = sorted(((self._bm25(key, terms, kind), key) for key in matches), reverse=True)
+            page = scored[offset:offset + limit]
+            hits = [{
+                'contract_id': self._docs[key]['contract_id'],
+                'clause_id': self._docs[key]['clause_id'],
+                'category': self._docs[key]['category'],
+                'snippet': self._snippet(self._docs[key]['content'], terms),
+                'score': score
+            } for score, key in page]
+            return len(matches), hits
+
+    def _contains_phrase(self, postings: Dict[str, Dict[int, List[int]]], key: int, phrase: List[str]) -> bool:
+        """Check that the phrase terms appear at consecutive positions"""
+        starts = set(postings[phrase[0]][key])
+        for offset, term in enumerate(phrase[1:], start=1):
+            starts &= {position - offset for position in postings[term][key]}
+            if not starts:
+                return False
+        return True
+
+    def _bm25(self, key: int, terms: List[str], kind: str) -> float:
+        doc_count = max(self._doc_count[kind], 1)
+        avg_length = self._total_length[kind] / doc_count or 1
+        length = self._docs[key]['length']
+        score = 0.0
+        for term in terms:
+            postings = self._postings[kind][term]
+            tf = len(postings[key])
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+        return score
+
+    def _snippet(self, content: str, terms: List[str], width: int = 120) -> str:
+        """Return a window of text around the first matched term"""
+        term_set = set(terms)
+        for match in _WORD_RE.finditer(content):
+            if match.group().lower() in term_set:
+                start = max(0, match.start() - width // 2)
+                end = min(len(content), match.end() + width // 2)
+                prefix = '...' if start > 0 else ''
+                suffix = '...' if end < len(content) else ''
+                return prefix + content[start:end].strip() + suffix
+        return content[:width]
+
+
+class SearchIndex:
+    """Full-text search over analyzed contracts, backed by FTS5, Postgres or an in-process index"""
+
+    def __init__(self, engine, backend: Optional[str] = None):
+        backend = backend or os.getenv("SEARCH_BACKEND", "auto")
+        if backend == "auto":
+            backend = "postgres" if engine.dialect.name == "postgresql" else "sqlite"
+
+        if backend == "memory":
+            self.backend = InvertedIndexBackend()
+        elif backend == "postgres":
+            self.backend = PostgresFTSBackend()
+        elif backend == "sqlite":
+            self.backend = SQLiteFTSBackend()
+        else:
+            raise ValueError(f"Unsupported search backend: {backend}")
+
+        try:
+            self.backend.setup(engine)
+        except OperationalError as e:
+            logger.warning(f"Search backend {self.backend.name} unavailable ({e}), using in-memory index")
+            self.backend = InvertedIndexBackend()
+
+    @property
+    def requires_rebuild(self) -> bool:
+        """In-memory indexes start empty and must be loaded from the database"""
+        return isinstance(self.backend, InvertedIndexBackend)
+
+    def rebuild(self, db):
+        if self.requires_rebuild:
+            self.backend.rebuild(db)
+
+    def index_contract(self, db, contract_id: str, text_content: str, clauses: List[Dict[str, Any]]):
+        """Replace the index entries of a contract; runs inside the caller's transaction"""
+        self.backend.index_contract(db, contract_id, build_entries(contract_id, text_content, clauses))
+
+    def remove_contract(self, db, contract_id: str):
+        self.backend.remove_contract(db, contract_id)
+
+    def search(self, db, query: str, scope: str = "clauses", category: Optional[str] = None,
+               page: int = 1, page_size: int = 20) -> Tuple[int, List[Dict[str, Any]]]:
+        """Run a ranked search and return the total hit count with one page of hits"""
+        kind = KIND_DOCUMENT if scope == "contracts" else KIND_CLAUSE
+        return self.backend.search(db, query, kind, category, page_size, (page - 1) * page_size)
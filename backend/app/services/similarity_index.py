@@ -0,0 +1,145 @@
+from sqlalchemy import tuple_
+from typing import List, Dict, Any, Optional
+import hashlib
+import math
+import os
+import re
+import numpy as np
+
+from ..models import Contract, ContractSignature, ContractLSHBucket
+from .clause_cache import normalize_clause
+
+_WORD_RE = re.compile(r'\w+')
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_SHINGLE_BASE = np.uint64(0x100000001B3)
+
+
+class SimilarityIndex:
+    """MinHash signatures over clause shingles with a banded LSH index stored in the database
+
+    Each contract gets ``num_perm`` MinHash values computed over word shingles of its
+    normalized clauses. The signature is cut into ``bands`` bands whose hashes are stored as
+    indexed (band, bucket) rows, so a lookup only touches contracts that share at least one
+    bucket instead of scanning the portfolio. Pairs less similar than ``min_threshold`` rarely
+    share a bucket, so lookups do not go below it; with 16 bands of 8 rows it is 0.75, where
+    a pair is found with 80% probability (95% at 0.8).
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        # Similarity at which a pair shares at least one bucket with 80% probability
+        self.min_threshold = math.ceil((1 - 0.2 ** (1 / bands)) ** (1 / self.rows_per_band) * 100) / 100
+        self.reuse_threshold = max(float(os.getenv("SIMILARITY_REUSE_THRESHOLD", "0.9")), self.min_threshold)
+
+        # Multiply-shift hash family: h(x) = ((a * x + b) mod 2^64) >> 32 with odd a
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 62, size=num_perm, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 62, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def shingles(self, clauses: List[str]) -> np.ndarray:
+        """Hash word shingles of every normalized clause to distinct 32-bit integers"""
+        word_hashes = {}
+        parts = []
+        k = self.shingle_size
+        for clause in clauses:
+            words = _WORD_RE.findall(normalize_clause(clause))
+            if not words:
+                continue
+            for word in words:
+                if word not in word_hashes:
+                    word_hashes[word] = int.from_bytes(
+                        hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+            hashes = np.fromiter((word_hashes[word] for word in words), dtype=np.uint64, count=len(words))
+            # Polynomial rolling combination of k consecutive word hashes (wrapping uint64)
+            count = max(1, len(words) - k + 1)
+            combined = np.zeros(count, dtype=np.uint64)
+            for offset in range(min(k, len(words))):
+                combined = combined * _SHINGLE_BASE + hashes[offset:offset + count]
+            parts.append(combined >> np.uint64(32))
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.uint64)
+
+    def signature(self, clauses: List[str]) -> np.ndarray:
+        """MinHash signature (uint32 per permutation) of a contract's clauses"""
+        shingles = self.shingles(clauses)
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # Process shingles in chunks so a 1,000-page contract does not allocate shingles x perms at once
+        for start in range(0, len(shingles), 4096):
+            chunk = shingles[start:start + 4096, None]
+            hashed = (chunk * self._a + self._b) >> np.uint64(32)
+            np.minimum(signature, hashed.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+    def band_buckets(self, signature: np.ndarray) -> List[int]:
+        """One signed 64-bit bucket hash per band"""
+        bands = signature.reshape(self.bands, self.rows_per_band)
+        return [
+            int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'little', signed=True)
+            for band in bands
+        ]
+
+    @staticmethod
+    def jaccard(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity: share of equal MinHash values"""
+        return float(np.count_nonzero(first == second)) / len(first)
+
+    def index_contract(self, db, contract_id: str, signature: np.ndarray):
+        """Replace the stored signature and LSH buckets of a contract in the caller's transaction"""
+        self.remove_contract(db, contract_id)
+        db.add(ContractSignature(contract_id=contract_id, signature=signature.astype(np.uint32).tobytes()))
+        db.add_all([
+            ContractLSHBucket(band=band, bucket=bucket, contract_id=contract_id)
+            for band, bucket in enumerate(self.band_buckets(signature))
+        ])
+
+    def remove_contract(self, db, contract_id: str):
+        db.query(ContractLSHBucket).filter(ContractLSHBucket.contract_id == contract_id).delete()
+        db.query(ContractSignature).filter(ContractSignature.contract_id == contract_id).delete()
+
+    def get_signature(self, db, contract_id: str) -> Optional[np.ndarray]:
+        row = db.query(ContractSignature).filter(ContractSignature.contract_id == contract_id).first()
+        return np.frombuffer(row.signature, dtype=np.uint32) if row else None
+
+    def find_similar(self, db, signature: np.ndarray, threshold: Optional[float] = None, limit: int = 10,
+                     exclude: Optional[str] = None, completed_only: bool = True) -> List[Dict[str, Any]]:
+        """Contracts sharing an LSH bucket with the signature, ranked by estimated Jaccard
+
+        ``threshold`` defaults to, and should not be below, ``min_threshold``.
+        """
+        threshold = self.min_threshold if threshold is None else threshold
+        keys = list(enumerate(self.band_buckets(signature)))
+        candidates = (
+            db.query(ContractLSHBucket.contract_id)
+            .filter(tuple_(ContractLSHBucket.band, ContractLSHBucket.bucket).in_(keys))
+            .distinct()
+        )
+        if exclude:
+            candidates = candidates.filter(ContractLSHBucket.contract_id != exclude)
+
+        rows = (
+            db.query(ContractSignature.contract_id, ContractSignature.signature,
+                     Contract.filename, Contract.risk_score, Contract.status)
+            .join(Contract, Contract.id == ContractSignature.contract_id)
+            .filter(ContractSignature.contract_id.in_(candidates.scalar_subquery()))
+            .all()
+        )
+
+        matches = []
+        for contract_id, raw_signature, filename, risk_score, status in rows:
+            if completed_only and status != "completed":
+                continue
+            similarity = self.jaccard(signature, np.frombuffer(raw_signature, dtype=np.uint32))
+            if similarity >= threshold:
+                matches.append({
+                    'contract_id': contract_id,
+                    'filename': filename,
+                    'similarity': round(similarity, 4),
+                    'risk_score': risk_score
+                })
+
+        matches.sort(key=lambda match: match['similarity'], reverse=True)
+        return matches[:limit]
@@ -0,0 +1,373 @@
+"""
+Content-addressed storage for uploaded contracts.
+
+Blobs are keyed by the SHA-256 of their bytes, so identical uploads are stored once.
+Backends only move opaque blobs around:
+
+- ``LocalShardedBackend`` keeps ``{root}/ab/cd/abcd...`` so no directory grows past a
+  few hundred entries, writes through a temporary file and an atomic rename, and serves
+  reads as read-only memory maps.
+- ``S3Backend`` targets any S3-compatible object store (boto3 is optional).
+
+Contracts uploaded before content addressing keep their flat ``uploads/{uuid}.ext`` path
+until migrated:
+
+    python -m app.services.storage migrate
+"""
+
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
+import argparse
+import gzip
+import hashlib
+import io
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+
+from sqlalchemy import text
+
+try:
+    import boto3
+except ImportError:  # boto3 is optional; only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+COMPRESSIONS = ('none', 'gzip')
+REFERENCE_LOCK_STRIPES = 64
+
+
+class MappedFile(io.RawIOBase):
+    """Read-only file interface over a memory map (mmap objects lack seekable() and friends)"""
+
+    def __init__(self, mapped: mmap.mmap):
+        self._mapped = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        return self._mapped.read(-1 if size is None else size)
+
+    def readinto(self, buffer) -> int:
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self) -> int:
+        return self._mapped.tell()
+
+
+class StorageBackend:
+    """Stores opaque blobs under string keys"""
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put_file(self, key: str, path: str):
+        """Store the local file at ``path`` under ``key``; the file may be moved or removed"""
+        raise NotImplementedError
+
+    def open(self, key: str):
+        """Context manager yielding a readable, seekable binary stream of a blob"""
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def locator(self, key: str) -> str:
+        """Human-readable location of a blob, recorded as the contract's file path"""
+        raise NotImplementedError
+
+
+class LocalShardedBackend(StorageBackend):
+    """Blobs on the local filesystem, sharded by the leading hex digits of their key"""
+
+    def __init__(self, root: str, levels: int = 2, width: int = 2):
+        self.root = root
+        self.levels = levels
+        self.width = width
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        shards = [key[i * self.width:(i + 1) * self.width] for i in range(self.levels)]
+        return os.path.join(self.root, *shards, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def put_file(self, key: str, path: str):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Same filesystem as tmp_dir, so this is an atomic rename; a concurrent upload of the
+        # same bytes simply replaces the blob with identical content
+        os.replace(path, target)
+
+    @contextmanager
+    def open(self, key: str) -> Iterator[BinaryIO]:
+        with open(self.path(key), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield io.BytesIO()
+                return
+            # Pages are read lazily from the page cache instead of being copied into the heap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield MappedFile(mapped)
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def locator(self, key: str) -> str:
+        return self.path(key)
+
+
+class S3Backend(StorageBackend):
+    """Blobs in an S3-compatible bucket (AWS S3, MinIO, Ceph RGW, ...)"""
+
+    def __init__(self, bucket: str, prefix: str = "contracts/", endpoint_url: Optional[str] = None,
+                 tmp_dir: Optional[str] = None):
+        if boto3 is None:
+            raise RuntimeError("boto3 is required for STORAGE_BACKEND=s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.tmp_dir = tmp_dir or tempfile.gettempdir()
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key[:2]}/{key}"
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, key: str, path: str):
+        try:
+            self.client.upload_file(path, self.bucket, self._key(key))
+        finally:
+            os.remove(path)
+
+    @contextmanager
+    def open(self, key: str) -> Iterator[BinaryIO]:
+        # Spill large objects to disk rather than holding them in memory
+        with tempfile.SpooledTemporaryFile(max_size=16 * CHUNK_SIZE, dir=self.tmp_dir) as buffer:
+            self.client.download_fileobj(self.bucket, self._key(key), buffer)
+            buffer.seek(0)
+            yield buffer
+
+    def size(self, key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def locator(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._key(key)}"
+
+
+class BlobStore:
+    """Deduplicating, optionally compressing store of uploads keyed by content hash
+
+    Compressed blobs carry a ``.gz`` suffix in their key, so changing the compression
+    setting does not orphan earlier uploads. Compression saves little on PDF and DOCX, which
+    are already compressed internally, and gives up memory-mapped reads; it is off by default.
+    """
+
+    def __init__(self, backend: StorageBackend, compression: str = 'none', tmp_dir: Optional[str] = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.backend = backend
+        self.compression = compression
+        self.tmp_dir = tmp_dir or getattr(backend, "tmp_dir", None) or tempfile.gettempdir()
+        self._reference_locks = [threading.Lock() for _ in range(REFERENCE_LOCK_STRIPES)]
+
+    @classmethod
+    def from_env(cls) -> "BlobStore":
+        """Configure from STORAGE_BACKEND (local|s3), UPLOAD_DIR, STORAGE_COMPRESSION and S3_*"""
+        kind = os.getenv("STORAGE_BACKEND", "local")
+        if kind == "local":
+            backend = LocalShardedBackend(os.getenv("UPLOAD_DIR", "uploads"))
+        elif kind == "s3":
+            backend = S3Backend(
+                bucket=os.environ["S3_BUCKET"],
+                prefix=os.getenv("S3_PREFIX", "contracts/"),
+                endpoint_url=os.getenv("S3_ENDPOINT_URL")
+            )
+        else:
+            raise ValueError(f"Unsupported STORAGE_BACKEND: {kind}")
+        return cls(backend, compression=os.getenv("STORAGE_COMPRESSION", "none"))
+
+    def _keys(self, content_hash: str) -> Tuple[str, str]:
+        return content_hash, f"{content_hash}.gz"
+
+    def find(self, content_hash: str) -> Optional[str]:
+        """Key under which a blob is stored, if it is"""
+        return next((key for key in self._keys(content_hash) if self.backend.exists(key)), None)
+
+    def put(self, source: BinaryIO) -> Tuple[str, int, bool]:
+        """Store a stream; returns (content hash, size in bytes, whether it was already stored)
+
+        The stream is hashed and spooled to a temporary file in one pass, so memory use does
+        not depend on the upload size.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                target = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) if self.compression == 'gzip' else raw
+                with target:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        size += len(chunk)
+                        target.write(chunk)
+
+            content_hash = digest.hexdigest()
+            if self.find(content_hash):
+                os.remove(tmp_path)
+                return content_hash, size, True
+            key = f"{content_hash}.gz" if self.compression == 'gzip' else content_hash
+            self.backend.put_file(key, tmp_path)
+            return content_hash, size, False
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def open(self, content_hash: str) -> Iterator[BinaryIO]:
+        """Seekable stream of a blob's original bytes (a memory map for uncompressed local blobs)"""
+        key = self.find(content_hash)
+        if key is None:
+            raise FileNotFoundError(f"Blob not found: {content_hash}")
+        with self.backend.open(key) as stream:
+            if not key.endswith(".gz"):
+                yield stream
+                return
+            # Parsers seek back and forth, which gzip streams do badly; inflate once
+            with tempfile.SpooledTemporaryFile(max_size=16 * CHUNK_SIZE, dir=self.tmp_dir) as inflated:
+                with gzip.GzipFile(fileobj=stream, mode='rb') as compressed:
+                    shutil.copyfileobj(compressed, inflated, CHUNK_SIZE)
+                inflated.seek(0)
+                yield inflated
+
+    def locator(self, content_hash: str) -> str:
+        return self.backend.locator(self.find(content_hash) or content_hash)
+
+    def delete(self, content_hash: str):
+        for key in self._keys(content_hash):
+            if self.backend.exists(key):
+                self.backend.delete(key)
+
+    def release(self, db, content_hash: str):
+        """Delete a blob unless a committed contract references it; call holding ``references``"""
+        from ..models import Contract
+
+        if not db.query(Contract.id).filter(Contract.content_hash == content_hash).first():
+            self.delete(content_hash)
+
+    @contextmanager
+    def references(self, db, content_hash: str) -> Iterator[None]:
+        """Serialize adding and dropping contract references to one blob
+
+        A deduplicated upload finds the blob already stored and only then commits its
+        contract row; a delete of the last other contract in between would remove the blob
+        from under it. Both hold this lock from their check to their commit (and the delete
+        until the blob is gone). On PostgreSQL it is an advisory lock, so it holds across
+        workers; otherwise it is local to this process.
+        """
+        with self._reference_locks[int(content_hash[:8], 16) % REFERENCE_LOCK_STRIPES]:
+            if db.get_bind().dialect.name != 'postgresql':
+                yield
+                return
+            # Held on a connection of its own, as the session's connection goes back to the
+            # pool when it commits
+            lock_id = int(content_hash[:16], 16) - (1 << 63)
+            with db.get_bind().connect() as connection:
+                connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": lock_id})
+                try:
+                    yield
+                finally:
+                    connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+
+
+def migrate(db, store: BlobStore) -> Tuple[int, int]:
+    """Move flat legacy uploads into the store; returns (contracts migrated, blobs deduplicated)"""
+    from ..models import Contract
+
+    migrated = 0
+    deduplicated = 0
+    contracts = db.query(Contract).filter(Contract.content_hash.is_(None)).all()
+    for contract in contracts:
+        if not os.path.exists(contract.file_path):
+            logger.warning(f"Upload of contract {contract.id} is missing: {contract.file_path}")
+            continue
+        with open(contract.file_path, 'rb') as f:
+            content_hash, size, existed = store.put(f)
+            with store.references(db, content_hash):
+                if not store.find(content_hash):
+                    # The last other contract with these bytes was deleted along with the blob meanwhile
+                    f.seek(0)
+                    store.put(f)
+                legacy_path = contract.file_path
+                contract.content_hash = content_hash
+                contract.file_size = size
+                contract.file_path = store.locator(content_hash)
+                try:
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    store.release(db, content_hash)
+                    raise
+        os.remove(legacy_path)
+        migrated += 1
+        deduplicated += existed
+    return migrated, deduplicated
+
+
+def main(argv=None):
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain content-addressed upload storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Move flat uploads/{uuid}.ext files into the store")
+    parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        migrated, deduplicated = migrate(db, BlobStore.from_env())
+        print(f"Migrated {migrated} uploads ({deduplicated} were duplicates of stored blobs)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
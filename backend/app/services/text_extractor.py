@@ -1,42 +1,148 @@
 import pdfplumber
 from docx import Document
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
 import os
 
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # installed with pdfplumber; only needed for the fast PDF path
+    pdfium = None
+
+from .layout_segmenter import LayoutSegmenter
+
+# Used to estimate page counts for formats without fixed pagination
+WORDS_PER_PAGE = 500
+
+# text: clauses are split from flattened text; layout: PDF clauses come from character geometry
+SEGMENTATION_MODES = ('text', 'layout')
+
+# A fast path skips pdfplumber's character parsing for PDFs (see extract_document)
+FAST_PDF_AVAILABLE = pdfium is not None
+
 class TextExtractor:
+    def __init__(self, segmentation: str = 'text'):
+        if segmentation not in SEGMENTATION_MODES:
+            raise ValueError(f"Unsupported segmentation mode: {segmentation}")
+        self.segmentation = segmentation
+        self.layout_segmenter = LayoutSegmenter()
+    
+    @classmethod
+    def from_env(cls) -> "TextExtractor":
+        return cls(segmentation=os.getenv("CLAUSE_SEGMENTATION", "text"))
+    
     def extract_text(self, file_path: str, file_type: str) -> str:
-        """Extract text from PDF or DOCX files"""
+        """Extract text from PDF, DOCX or plain text files"""
+        return self.extract_text_and_pages(file_path, file_type)[0]
+    
+    def extract_text_and_pages(self, file_path: str, file_type: str) -> Tuple[str, int]:
+        """Extract text together with the page count (estimated for DOCX and plain text)"""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         
+        return self.extract_from_stream(file_path, file_type)
+    
+    def extract_from_stream(self, source: Union[str, BinaryIO], file_type: str) -> Tuple[str, int]:
+        """Extract text and page count from a path or a seekable binary stream (e.g. an mmap)"""
         if file_type.lower() == 'pdf':
-            return self._extract_from_pdf(file_path)
+            return self._extract_from_pdf(source)
         elif file_type.lower() == 'docx':
-            return self._extract_from_docx(file_path)
+            return self._extract_from_docx(source)
+        elif file_type.lower() in ('txt', 'md'):
+            return self._extract_from_text(source)
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
     
-    def _extract_from_pdf(self, file_path: str) -> str:
+    def extract_document(self, source: Union[str, BinaryIO], file_type: str,
+                         fast: bool = False) -> Tuple[str, int, Optional[List[Dict[str, Any]]]]:
+        """Text, page count and, for PDFs in layout mode, clause segments with page regions
+        
+        ``fast`` reads the text layer of PDFs with pdfium, an order of magnitude quicker than
+        pdfplumber but without character geometry, so no layout segments are returned.
+        """
+        if fast and FAST_PDF_AVAILABLE and file_type.lower() == 'pdf':
+            text, page_count = self._extract_fast_from_pdf(source)
+            return text, page_count, None
+        if self.segmentation == 'layout' and file_type.lower() == 'pdf':
+            return self._extract_layout_from_pdf(source)
+        text, page_count = self.extract_from_stream(source, file_type)
+        return text, page_count, None
+    
+    def _extract_layout_from_pdf(self, source: Union[str, BinaryIO]) -> Tuple[str, int, List[Dict[str, Any]]]:
+        """Text in reading order and clauses segmented from pdfplumber's character geometry"""
+        try:
+            with pdfplumber.open(source) as pdf:
+                page_count = len(pdf.pages)
+                lines = []
+                for page in pdf.pages:
+                    lines.append(self.layout_segmenter.page_lines(page.chars, page.width, page.page_number))
+                    page.flush_cache()  # keep one page of character objects in memory at a time
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        
+        text, segments = self.layout_segmenter.segment(lines)
+        return text, page_count, segments
+    
+    def _extract_fast_from_pdf(self, source: Union[str, BinaryIO]) -> Tuple[str, int]:
+        """Text layer of a PDF read with pdfium"""
+        parts = []
+        try:
+            # pdfium takes paths and bytes, not memory maps
+            pdf = pdfium.PdfDocument(source if isinstance(source, str) else source.read())
+            try:
+                page_count = len(pdf)
+                for index in range(page_count):
+                    page = pdf[index]
+                    textpage = page.get_textpage()
+                    page_text = textpage.get_text_range().replace('\r\n', '\n').strip()
+                    textpage.close()
+                    page.close()
+                    if page_text:
+                        parts.append(page_text)
+            finally:
+                pdf.close()
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        
+        return "\n".join(parts).strip(), page_count
+    
+    def _extract_from_pdf(self, source: Union[str, BinaryIO]) -> Tuple[str, int]:
         """Extract text from PDF using pdfplumber"""
-        text = ""
+        parts = []
         try:
-            with pdfplumber.open(file_path) as pdf:
+            with pdfplumber.open(source) as pdf:
+                page_count = len(pdf.pages)
                 for page in pdf.pages:
                     page_text = page.extract_text()
                     if page_text:
-                        text += page_text + "\n"
+                        parts.append(page_text)
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
         
-        return text.strip()
+        return "\n".join(parts).strip(), page_count
     
-    def _extract_from_docx(self, file_path: str) -> str:
+    def _extract_from_docx(self, source: Union[str, BinaryIO]) -> Tuple[str, int]:
         """Extract text from DOCX using python-docx"""
-        text = ""
         try:
-            doc = Document(file_path)
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            doc = Document(source)
+            text = "\n".join(paragraph.text for paragraph in doc.paragraphs).strip()
         except Exception as e:
             raise Exception(f"Error extracting text from DOCX: {str(e)}")
         
-        return text.strip()
\ No newline at end of file
+        return text, self._estimate_pages(text)
+    
+    def _extract_from_text(self, source: Union[str, BinaryIO]) -> Tuple[str, int]:
+        """Read a plain text or markdown file"""
+        try:
+            if isinstance(source, str):
+                with open(source, 'r', encoding='utf-8', errors='replace') as f:
+                    text = f.read()
+            else:
+                text = source.read().decode('utf-8', errors='replace')
+        except Exception as e:
+            raise Exception(f"Error reading text file: {str(e)}")
+        
+        text = text.strip()
+        return text, self._estimate_pages(text)
+    
+    def _estimate_pages(self, text: str) -> int:
+        return max(1, -(-len(text.split()) // WORDS_PER_PAGE))
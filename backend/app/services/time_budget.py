@@ -0,0 +1,133 @@
+"""
+Per-request time budgets for analyses.
+
+A request may give ``/analyze`` a budget in seconds (``ANALYSIS_TIME_BUDGET`` is the default;
+unset means unlimited). The clock starts when the request arrives, so time spent waiting for
+admission counts against it. Before each stage that has a cheaper path the pipeline asks
+whether the full stage still fits into what is left, keeping a reserve for the stages after
+it. Expected costs are per-worker moving averages of seconds per unit of work, learned from
+stages that ran in full:
+
+- ``extraction`` (PDF bytes): degrades to the PDF text layer read by pypdfium2, without
+  pdfplumber's character layout (and so without layout segmentation)
+- ``summarization`` (abstractive chunks): degrades to fewer chunks, or to the extractive
+  summary when not even one chunk fits
+- ``embedding`` (clauses): skipped; the clauses are not searchable by similarity until the
+  analysis is upgraded
+
+A degraded result is complete and stored along with the stages that were degraded, and can
+be upgraded by re-running the analysis without a budget in the background.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import math
+import os
+import threading
+import time
+
+# Seconds per unit before a stage has been observed in this worker (CPU inference)
+DEFAULT_COSTS = {
+    'extraction': 5e-5,  # per PDF byte; about 0.1s per text-heavy page
+    'summarization': 4.0,  # per BART chunk
+    'embedding': 0.02,  # per clause
+}
+
+
+class BudgetPlanner:
+    """Stage cost estimates of a worker and the budget of requests that bring none"""
+
+    def __init__(self, default_seconds: Optional[float] = None, reserve: float = 0.1, alpha: float = 0.2):
+        self.default_seconds = default_seconds
+        self.reserve = reserve  # share of the budget kept for the stages after a degradable one
+        self.alpha = alpha
+        self._costs = dict(DEFAULT_COSTS)
+        self._observed = {stage: 0 for stage in DEFAULT_COSTS}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "BudgetPlanner":
+        default_seconds = float(os.getenv("ANALYSIS_TIME_BUDGET", "0")) or None
+        return cls(default_seconds=default_seconds, reserve=float(os.getenv("ANALYSIS_BUDGET_RESERVE", "0.1")))
+
+    def start(self, seconds: Optional[float] = None) -> "TimeBudget":
+        """Budget of a request starting now; ``None`` takes the default"""
+        return TimeBudget(self, seconds if seconds is not None else self.default_seconds)
+
+    def unlimited(self) -> "TimeBudget":
+        return TimeBudget(self, None)
+
+    def unit_cost(self, stage: str) -> float:
+        return self._costs[stage]
+
+    def observe(self, stage: str, units: float, seconds: float):
+        if units <= 0:
+            return
+        with self._lock:
+            per_unit = seconds / units
+            if self._observed[stage]:
+                per_unit = (1 - self.alpha) * self._costs[stage] + self.alpha * per_unit
+            self._costs[stage] = per_unit
+            self._observed[stage] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'default_seconds': self.default_seconds,
+            'reserve': self.reserve,
+            'stages': {
+                stage: {'seconds_per_unit': self._costs[stage], 'observations': self._observed[stage]}
+                for stage in self._costs
+            }
+        }
+
+
+class TimeBudget:
+    """Deadline of one analysis and the stages it degraded to meet it"""
+
+    def __init__(self, planner: BudgetPlanner, seconds: Optional[float]):
+        self.planner = planner
+        self.seconds = seconds
+        self.started = time.perf_counter()
+        self.degraded: Dict[str, str] = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def remaining(self) -> float:
+        if self.seconds is None:
+            return math.inf
+        return self.seconds - self.elapsed()
+
+    def affordable_units(self, stage: str) -> float:
+        """Units of work of a stage that still fit, leaving the reserve"""
+        if self.seconds is None:
+            return math.inf
+        available = self.remaining() - self.seconds * self.planner.reserve
+        return max(0.0, available / self.planner.unit_cost(stage))
+
+    def fits(self, stage: str, units: float) -> bool:
+        return self.affordable_units(stage) >= units
+
+    def degrade(self, stage: str, how: str):
+        self.degraded[stage] = how
+
+    @contextmanager
+    def measure(self, stage: str, units: float):
+        """Time a stage that ran in full and update its cost estimate
+
+        Yields the measurement, whose ``units`` can still be corrected, e.g. to 0 when the
+        stage fell back to a cheaper path and its time says nothing about the full one.
+        """
+        measurement = Measurement(units)
+        started = time.perf_counter()
+        yield measurement
+        self.planner.observe(stage, measurement.units, time.perf_counter() - started)
+
+
+class Measurement:
+    """Units of work a measured stage is credited with"""
+
+    __slots__ = ('units',)
+
+    def __init__(self, units: float):
+        self.units = units
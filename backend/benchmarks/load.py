@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for the HTTP API.
+
+Replays a weighted mix of upload / analyze / result / download / list requests and reports
+throughput plus p50/p95/p99 latency per endpoint:
+
+    # In-process app (temporary database and storage), stubbed models, 8 concurrent clients
+    python -m benchmarks.load run --concurrency 8 --duration 30 --output load.json
+
+    # Open-loop arrivals at 20 requests/s against a running server
+    python -m benchmarks.load run --url http://localhost:8000 --rate 20 --mix browse
+
+    python -m benchmarks.load compare baseline_load.json load.json --threshold 0.15
+
+``--concurrency`` runs a closed loop (each client sends its next request when the previous
+one returns); ``--rate`` sends requests on a Poisson schedule regardless of how fast the
+server answers, which is what exposes queueing and admission control. Requests refused
+with 429/503 are counted separately from errors. Random choices are seeded, so a mix
+replays the same request sequence across commits.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.run_benchmarks import StubSummarizer, git_commit  # noqa: E402
+from benchmarks.synthetic import SyntheticContractGenerator  # noqa: E402
+
+OPERATIONS = ('upload', 'analyze', 'result', 'download', 'list')
+
+MIXES = {
+    # Mostly new documents going through the full pipeline
+    'triage': {'upload': 3, 'analyze': 3, 'result': 2, 'download': 1, 'list': 1},
+    # Users browsing existing analyses
+    'browse': {'upload': 1, 'analyze': 1, 'result': 8, 'download': 2, 'list': 6},
+    'balanced': {'upload': 2, 'analyze': 2, 'result': 3, 'download': 1, 'list': 2},
+}
+
+REJECTED_STATUSES = (429, 503)
+
+
+class SlowStubSummarizer(StubSummarizer):
+    """Stub summarizer that also holds the caller for a fixed time, like a model would"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def __call__(self, texts, **kwargs):
+        time.sleep(self.latency)
+        return super().__call__(texts, **kwargs)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """A named mix or ``op=weight,...`` such as ``upload=1,result=4,list=2``"""
+    if value in MIXES:
+        return MIXES[value]
+    weights = {}
+    for part in value.split(','):
+        operation, _, weight = part.partition('=')
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation in mix: {operation}")
+        weights[operation] = float(weight or 1)
+    return weights
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(values.max()),
+    }
+
+
+class LoadGenerator:
+    """Issues requests of a mix and records their outcome per operation"""
+
+    def __init__(self, client: httpx.AsyncClient, documents: List[str], mix: Dict[str, float],
+                 summary_mode: str, seed: int):
+        self.client = client
+        self.documents = documents
+        self.operations = [operation for operation in mix if mix[operation] > 0]
+        self.weights = [mix[operation] for operation in self.operations]
+        self.summary_mode = summary_mode
+        self.rng = random.Random(seed)
+        self.pending: List[str] = []  # uploaded, not analyzed yet
+        self.analyzed: List[str] = []
+        self.records = {operation: {'latencies': [], 'statuses': {}} for operation in OPERATIONS}
+
+    async def seed_contracts(self, count: int):
+        """Upload and analyze ``count`` contracts so reads have something to hit"""
+        for _ in range(count):
+            contract_id = await self.upload(record=False)
+            if contract_id:
+                self.pending.remove(contract_id)
+                await self.analyze(contract_id, record=False)
+
+    def _record(self, operation: str, started: float, status: int):
+        record = self.records[operation]
+        record['statuses'][status] = record['statuses'].get(status, 0) + 1
+        if status < 400:
+            record['latencies'].append(time.perf_counter() - started)
+
+    async def _send(self, operation: str, method: str, url: str, record: bool = True, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0  # connection-level failure
+        if record:
+            self._record(operation, started, status)
+        return response
+
+    async def upload(self, record: bool = True) -> Optional[str]:
+        path = self.rng.choice(self.documents)
+        with open(path, 'rb') as f:
+            content = f.read()
+        files = {'file': (os.path.basename(path), content, 'application/octet-stream')}
+        response = await self._send('upload', 'POST', '/upload', record=record, files=files)
+        if response is not None and response.status_code == 200:
+            contract_id = response.json()['id']
+            self.pending.append(contract_id)
+            return contract_id
+        return None
+
+    async def analyze(self, contract_id: Optional[str] = None, record: bool = True):
+        if contract_id is None:
+            # New uploads first; re-analysis when everything uploaded has been analyzed. Reads of a
+            # contract that is being re-analyzed get 400, as they would in production
+            if self.pending:
+                contract_id = self.pending.pop(self.rng.randrange(len(self.pending)))
+            elif self.analyzed:
+                contract_id = self.rng.choice(self.analyzed)
+            else:
+                contract_id = await self.upload()
+                if contract_id:
+                    self.pending.remove(contract_id)
+        if not contract_id:
+            return
+        response = await self._send('analyze', 'POST', f'/analyze/{contract_id}', record=record,
+                                    params={'mode': self.summary_mode})
+        if response is not None and response.status_code == 200 and contract_id not in self.analyzed:
+            self.analyzed.append(contract_id)
+
+    async def result(self):
+        if self.analyzed:
+            await self._send('result', 'GET', f'/result/{self.rng.choice(self.analyzed)}')
+
+    async def download(self):
+        if self.analyzed:
+            await self._send('download', 'GET', f'/download/{self.rng.choice(self.analyzed)}')
+
+    async def list(self):
+        await self._send('list', 'GET', '/contracts')
+
+    async def step(self):
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        await getattr(self, operation)()
+
+    async def closed_loop(self, concurrency: int, deadline: float, max_requests: Optional[int]):
+        sent = 0
+
+        async def client_loop():
+            nonlocal sent
+            while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+                sent += 1
+                await self.step()
+
+        await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+
+    async def open_loop(self, rate: float, deadline: float, max_requests: Optional[int], max_in_flight: int):
+        in_flight = set()
+        sent = 0
+        next_at = time.perf_counter()
+        while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_at += self.rng.expovariate(rate)
+            if len(in_flight) >= max_in_flight:
+                # The generator itself is saturated; count it instead of silently slowing down
+                self.records.setdefault('_dropped', 0)
+                self.records['_dropped'] += 1
+                continue
+            task = asyncio.ensure_future(self.step())
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            sent += 1
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        results = {}
+        for operation in OPERATIONS:
+            record = self.records[operation]
+            total = sum(record['statuses'].values())
+            if not total:
+                continue
+            rejected = sum(count for status, count in record['statuses'].items() if status in REJECTED_STATUSES)
+            ok = len(record['latencies'])
+            results[operation] = {
+                'requests': total,
+                'ok': ok,
+                'rejected': rejected,
+                'errors': total - ok - rejected,
+                'throughput_rps': ok / elapsed if elapsed else 0.0,
+                'statuses': {str(status): count for status, count in sorted(record['statuses'].items())},
+                **latency_stats(record['latencies']),
+            }
+        return results
+
+
+def build_documents(args) -> List[str]:
+    paths = []
+    for index in range(args.documents):
+        generator = SyntheticContractGenerator(seed=args.seed + index)
+        for pages in args.pages:
+            for file_type in args.formats:
+                paths.append(generator.ensure(args.data_dir, file_type, pages))
+    return paths
+
+
+async def in_process_client(args) -> httpx.AsyncClient:
+    """The app imported into this process, on a throwaway database and store"""
+    workdir = tempfile.mkdtemp(prefix='contract-load-')
+    # Always overridden, never defaulted: an exported DATABASE_URL (or a .env file, which does
+    # not override set variables) must not receive the load test's junk contracts
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'contracts.db')}",
+        'STORAGE_BACKEND': 'local',
+        'UPLOAD_DIR': os.path.join(workdir, 'uploads'),
+        'EMBEDDING_DIR': os.path.join(workdir, 'embeddings'),
+        'CLAUSE_CACHE_REDIS_URL': '',  # process-local clause cache only
+    })
+    if args.models == 'stub':
+        os.environ['MODEL_SERVING'] = 'local'
+        os.environ['NLP_LOAD_MODELS'] = 'false'
+    os.chdir(workdir)  # reports and profiles are written relative to the working directory
+
+    from app.main import app, nlp_analyzer
+    if args.models == 'stub':
+        nlp_analyzer.summarizer = SlowStubSummarizer(args.stub_latency_ms)
+    await app.router.startup()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://load-test', timeout=None)
+
+
+async def run_load(args) -> Dict[str, Any]:
+    commit = git_commit()  # before the in-process app changes the working directory
+    documents = build_documents(args)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.max_in_flight))
+    else:
+        client = await in_process_client(args)
+
+    async with client:
+        generator = LoadGenerator(client, documents, args.mix, args.summary_mode, args.seed)
+        print(f"Seeding {args.seed_contracts} analyzed contracts...", flush=True)
+        await generator.seed_contracts(args.seed_contracts)
+
+        print("Running load...", flush=True)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        if args.rate:
+            await generator.open_loop(args.rate, deadline, args.requests, args.max_in_flight)
+        else:
+            await generator.closed_loop(args.concurrency, deadline, args.requests)
+        elapsed = time.perf_counter() - started
+
+    results = generator.report(elapsed)
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'target': args.url or 'in-process',
+            'models': args.models if not args.url else 'server',
+            'stub_latency_ms': args.stub_latency_ms,
+            'summary_mode': args.summary_mode,
+            'mix': args.mix,
+            'load': {'rate': args.rate} if args.rate else {'concurrency': args.concurrency},
+            'duration_s': elapsed,
+            'dropped': generator.records.get('_dropped', 0),
+            'seed': args.seed,
+        },
+        'results': results,
+        'total': {
+            'requests': sum(result['requests'] for result in results.values()),
+            'throughput_rps': sum(result['throughput_rps'] for result in results.values()),
+        },
+    }
+
+
+def run(args) -> int:
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    report = asyncio.run(run_load(args))
+    print(f"\n{'endpoint':<10} {'requests':>8} {'ok':>6} {'rejected':>8} {'errors':>6} "
+          f"{'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for operation, result in report['results'].items():
+        print(f"{operation:<10} {result['requests']:>8} {result['ok']:>6} {result['rejected']:>8} "
+              f"{result['errors']:>6} {result['throughput_rps']:>8.2f} {result.get('p50_ms', 0):>9.1f} "
+              f"{result.get('p95_ms', 0):>9.1f} {result.get('p99_ms', 0):>9.1f}")
+    print(f"\n{report['total']['throughput_rps']:.2f} successful requests/s over {report['meta']['duration_s']:.1f}s")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = 0
+    print(f"{'endpoint':<10} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}")
+    for operation, result in current['results'].items():
+        base = baseline['results'].get(operation)
+        if not base:
+            continue
+        # Latency regresses upwards, throughput downwards
+        for metric, worse_when_higher in ((args.statistic, True), ('throughput_rps', False)):
+            if metric not in base or metric not in result:
+                continue
+            before, after = base[metric], result[metric]
+            change = (after - before) / before if before else 0.0
+            regressed = (change > args.threshold) if worse_when_higher else (change < -args.threshold)
+            regressions += regressed
+            marker = '  REGRESSION' if regressed else ''
+            print(f"{operation:<10} {metric:<15} {before:>10.2f} {after:>10.2f} {change:>+8.1%}{marker}")
+
+    print(f"\n{regressions} regression(s) above {args.threshold:.0%} "
+          f"({baseline['meta'].get('commit')} -> {current['meta'].get('commit')})")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Generate load and record latencies')
+    run_parser.add_argument('--url', help='Base URL of a running server (default: in-process app)')
+    load = run_parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', type=int, default=4, help='Closed loop: concurrent clients')
+    load.add_argument('--rate', type=float, help='Open loop: mean requests per second (Poisson arrivals)')
+    run_parser.add_argument('--duration', type=float, default=30, help='Seconds of load')
+    run_parser.add_argument('--requests', type=int, help='Stop after this many requests')
+    run_parser.add_argument('--mix', type=parse_mix, default='balanced',
+                            help=f"One of {', '.join(MIXES)} or op=weight,... over {', '.join(OPERATIONS)}")
+    run_parser.add_argument('--summary-mode', choices=['fast', 'abstractive'], default='abstractive')
+    run_parser.add_argument('--models', choices=['stub', 'real'], default='stub',
+                            help='In-process only: stubbed or real transformer models')
+    run_parser.add_argument('--stub-latency-ms', type=float, default=200,
+                            help='Time the stubbed summarizer holds each call')
+    run_parser.add_argument('--pages', type=int, nargs='+', default=[1, 10])
+    run_parser.add_argument('--formats', nargs='+', choices=['docx', 'pdf'], default=['docx', 'pdf'])
+    run_parser.add_argument('--documents', type=int, default=4, help='Distinct synthetic contracts per size and format')
+    run_parser.add_argument('--seed-contracts', type=int, default=5, help='Contracts analyzed before measuring')
+    run_parser.add_argument('--max-in-flight', type=int, default=256)
+    run_parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout against --url')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+    run_parser.add_argument('--output', default=os.path.abspath('load_results.json'))
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two load test result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10)
+    compare_parser.add_argument('--statistic', choices=['p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'], default='p95_ms')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        if isinstance(args.mix, str):
+            args.mix = parse_mix(args.mix)
+        return run(args)
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Stage-level micro-benchmarks for the contract analysis pipeline.
+
+Every stage is timed on its own for synthetic contracts of several sizes and formats:
+
+    python -m benchmarks.run_benchmarks run --pages 1 10 100 --output bench.json
+    python -m benchmarks.run_benchmarks run --pages 1000 --formats pdf --repeat 1
+    python -m benchmarks.run_benchmarks compare baseline.json bench.json --threshold 0.15
+
+Models are stubbed by default so the suite runs offline in seconds; ``--models real``
+loads the transformer pipelines configured in ``NLPAnalyzer``. ``compare`` exits with
+status 1 when a stage got slower than the threshold allows.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.text_extractor import TextExtractor  # noqa: E402
+from app.services.nlp_analyzer import NLPAnalyzer  # noqa: E402
+from app.services.risk_scorer import RiskScorer  # noqa: E402
+from app.services.pdf_generator import PDFGenerator  # noqa: E402
+from app.services.clause_cache import ClauseCache  # noqa: E402
+from app.services.document import ContractDocument  # noqa: E402
+from benchmarks.synthetic import SyntheticContractGenerator, FORMATS  # noqa: E402
+
+STAGES = [
+    'extract_text',
+    'extract_layout',
+    'split_into_clauses',
+    'classify_clauses',
+    'detect_risky_clauses',
+    'calculate_risk_score',
+    'generate_summary',
+    'generate_summary_fast',
+    'analyze_document',
+    'generate_report',
+]
+
+
+class StubSummarizer:
+    """Stands in for the BART pipeline: same call shape, near-zero cost"""
+
+    def __call__(self, texts, max_length: int = 100, **kwargs) -> List[Dict[str, str]]:
+        batch = [texts] if isinstance(texts, str) else texts
+        return [{'summary_text': ' '.join(text.split()[:max_length // 2])} for text in batch]
+
+
+def time_call(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Run ``func`` ``repeat`` times and summarize wall-clock durations in seconds"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - started)
+    return {
+        'runs': repeat,
+        'min_s': min(durations),
+        'median_s': statistics.median(durations),
+        'mean_s': statistics.fmean(durations),
+        'result': result,
+    }
+
+
+def build_analyzer(models: str, clause_cache: bool) -> NLPAnalyzer:
+    cache = ClauseCache(max_entries=100000) if clause_cache else None
+    if models == 'real':
+        return NLPAnalyzer(clause_cache=cache)
+    analyzer = NLPAnalyzer(clause_cache=cache, load_models=False)
+    analyzer.summarizer = StubSummarizer()
+    return analyzer
+
+
+def benchmark_document(path: str, file_type: str, analyzer: NLPAnalyzer, repeat: int) -> Dict[str, Dict[str, Any]]:
+    extractor = TextExtractor()
+    scorer = RiskScorer()
+    reporter = PDFGenerator()
+    stages = {}
+
+    def record(stage: str, func: Callable[[], Any]) -> Any:
+        timing = time_call(func, repeat)
+        result = timing.pop('result')
+        stages[stage] = timing
+        return result
+
+    text = record('extract_text', lambda: extractor.extract_text(path, file_type))
+    if file_type == 'pdf':
+        # Character-geometry segmentation replaces both extract_text and split_into_clauses
+        layout = TextExtractor(segmentation='layout')
+        record('extract_layout', lambda: layout.extract_document(path, file_type))
+    split = record('split_into_clauses', lambda: analyzer._split_into_clauses(text))
+    clauses = record('classify_clauses', lambda: analyzer.classify_clauses(text))
+    risky = record('detect_risky_clauses', lambda: analyzer.detect_risky_clauses(text))
+    score = record('calculate_risk_score', lambda: scorer.calculate_risk_score(clauses, risky))
+    summary = record('generate_summary', lambda: analyzer.generate_summary(text))
+    record('generate_summary_fast', lambda: analyzer.generate_summary(text, mode='fast', risky_clauses=risky))
+
+    def analyze_document():
+        # The stages above each build their own document; the pipeline shares one between them
+        document = ContractDocument(text)
+        analyzer.classify_clauses(document)
+        analyzer.generate_summary(document, mode='fast', risky_clauses=analyzer.detect_risky_clauses(document))
+
+    record('analyze_document', analyze_document)
+
+    contract = SimpleNamespace(filename=os.path.basename(path), summary=summary, risk_score=score)
+
+    def render_report():
+        report_path = reporter.generate_report(contract)
+        os.remove(report_path)
+
+    record('generate_report', render_report)
+
+    return {
+        'chars': len(text),
+        'clauses': len(split),
+        'risky_matches': len(risky),
+        'stages': stages,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def run(args) -> int:
+    generator = SyntheticContractGenerator(seed=args.seed)
+    analyzer = build_analyzer(args.models, args.clause_cache)
+
+    results = []
+    for pages in args.pages:
+        for file_type in args.formats:
+            path = generator.ensure(args.data_dir, file_type, pages)
+            print(f"Benchmarking {file_type} ({pages} pages)...", flush=True)
+            measured = benchmark_document(path, file_type, analyzer, args.repeat)
+            results.append({'format': file_type, 'pages': pages, **measured})
+            for stage in (stage for stage in STAGES if stage in measured['stages']):
+                print(f"  {stage:<22} {measured['stages'][stage]['median_s'] * 1000:>10.2f} ms")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'models': args.models,
+            'clause_cache': args.clause_cache,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    base_index = {(r['format'], r['pages']): r for r in baseline['results']}
+    regressions = 0
+    print(f"{'format':<6} {'pages':>6} {'stage':<22} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for result in current['results']:
+        base = base_index.get((result['format'], result['pages']))
+        if not base:
+            continue
+        for stage, timing in result['stages'].items():
+            if stage not in base['stages']:
+                continue
+            before = base['stages'][stage][args.statistic]
+            after = timing[args.statistic]
+            change = (after - before) / before if before else 0.0
+            # Ignore sub-millisecond jitter on stages that are essentially free
+            regressed = change > args.threshold and (after - before) * 1000 > args.min_delta_ms
+            regressions += regressed
+            marker = '  REGRESSION' if regressed else ''
+            print(f"{result['format']:<6} {result['pages']:>6} {stage:<22} "
+                  f"{before * 1000:>12.2f} {after * 1000:>12.2f} {change:>+8.1%}{marker}")
+
+    print(f"\n{regressions} regression(s) above {args.threshold:.0%} "
+          f"({baseline['meta'].get('commit')} -> {current['meta'].get('commit')})")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Benchmark every pipeline stage')
+    run_parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100],
+                            help='Synthetic contract sizes in pages (1 to 1000)')
+    run_parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    run_parser.add_argument('--models', choices=['stub', 'real'], default='stub')
+    run_parser.add_argument('--clause-cache', action='store_true',
+                            help='Enable the clause result cache (repeats after the first run hit it)')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(__file__), 'data'),
+                            help='Where generated contracts are cached')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two benchmark result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='Relative slowdown that counts as a regression')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=1.0)
+    compare_parser.add_argument('--statistic', choices=['min_s', 'median_s', 'mean_s'], default='median_s')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        if any(pages < 1 or pages > 1000 for pages in args.pages):
+            parser.error('--pages must be between 1 and 1000')
+        return run(args)
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
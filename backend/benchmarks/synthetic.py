@@ -0,0 +1,146 @@
+"""
+Synthetic contract generator for benchmarks.
+
+Sections are taken from the markdown contracts in ``sample-contracts/`` and recombined,
+renumbered and lightly varied (party names, amounts, periods) until the document reaches
+the requested number of pages. A fraction of sections gets a risky sentence appended so
+the rule-based detectors have realistic work to do. Output is deterministic for a seed.
+"""
+
+import glob
+import os
+import random
+import re
+from typing import List, Tuple
+
+from docx import Document
+from docx.enum.text import WD_BREAK
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from xml.sax.saxutils import escape
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'sample-contracts')
+WORDS_PER_PAGE = 450
+FORMATS = ('txt', 'docx', 'pdf')
+
+PARTY_NAMES = [
+    'ABC Corporation', 'Northwind Traders', 'Globex LLC', 'Initech Inc.', 'Umbrella Holdings',
+    'Stark Industries', 'Acme Ltd.', 'Wayne Enterprises', 'Hooli Inc.', 'Vandelay Imports'
+]
+PERSON_NAMES = ['John Doe', 'Jane Roe', 'Alex Smith', 'Maria Garcia', 'Wei Chen', 'Priya Patel']
+
+RISKY_SENTENCES = [
+    'Either party may terminate this Agreement immediately without notice.',
+    'The Company may terminate this Agreement at any time without cause.',
+    'The Contractor shall have unlimited liability for any breach of this Agreement.',
+    'The Contractor shall be liable for all damages arising from the services.',
+    'The Contractor shall indemnify the Company against all claims arising hereunder.',
+    'The Employee shall hold harmless the Company from any and all losses.',
+    'This Agreement shall automatically renew for successive one-year terms.',
+    'The courts of Delaware shall have exclusive jurisdiction over any dispute.',
+    'The Company may modify these terms at its sole discretion.'
+]
+
+Block = Tuple[str, str]  # (heading, body)
+
+
+def load_sections(sample_dir: str = SAMPLE_DIR) -> List[Block]:
+    """Split every sample contract into (heading, body) sections, dropping markdown markup"""
+    sections = []
+    for path in sorted(glob.glob(os.path.join(sample_dir, '*.md'))):
+        with open(path, encoding='utf-8') as f:
+            content = f.read()
+        for chunk in re.split(r'^#{2,}\s+', content, flags=re.MULTILINE)[1:]:
+            heading, _, body = chunk.partition('\n')
+            heading = re.sub(r'^\d+\.\s*', '', heading).strip()
+            body = re.sub(r'[*_`>#]', '', body)
+            body = ' '.join(body.split())
+            if heading and len(body) > 50:
+                sections.append((heading, body))
+    if not sections:
+        raise RuntimeError(f"No sample contracts with '##' sections found in {sample_dir}")
+    return sections
+
+
+class SyntheticContractGenerator:
+    def __init__(self, seed: int = 42, sample_dir: str = SAMPLE_DIR, risky_ratio: float = 0.2):
+        self.seed = seed
+        self.sections = load_sections(sample_dir)
+        self.risky_ratio = risky_ratio
+
+    def blocks(self, pages: int) -> List[Block]:
+        """Numbered sections totalling roughly ``pages`` x WORDS_PER_PAGE words"""
+        rng = random.Random(f"{self.seed}:{pages}")
+        target_words = pages * WORDS_PER_PAGE
+        blocks = []
+        words = 0
+        number = 1
+        while words < target_words:
+            heading, body = rng.choice(self.sections)
+            body = self._vary(body, rng)
+            if rng.random() < self.risky_ratio:
+                body += ' ' + rng.choice(RISKY_SENTENCES)
+            blocks.append((f"{number}. {heading.upper()}", body))
+            words += len(body.split()) + 2
+            number += 1
+        return blocks
+
+    def text(self, pages: int) -> str:
+        return '\n\n'.join(f"{heading}\n{body}" for heading, body in self.blocks(pages))
+
+    def write(self, path: str, file_type: str, pages: int) -> str:
+        """Write a synthetic contract of the given format and size to ``path``"""
+        if file_type in ('txt', 'md'):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.text(pages))
+        elif file_type == 'docx':
+            self._write_docx(path, self.blocks(pages))
+        elif file_type == 'pdf':
+            self._write_pdf(path, self.blocks(pages))
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
+        return path
+
+    def ensure(self, out_dir: str, file_type: str, pages: int) -> str:
+        """Return a cached synthetic contract, generating it on first use"""
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"synthetic_{pages}p_seed{self.seed}.{file_type}")
+        if not os.path.exists(path):
+            self.write(path + '.tmp', file_type, pages)
+            os.replace(path + '.tmp', path)
+        return path
+
+    def _vary(self, body: str, rng: random.Random) -> str:
+        body = body.replace('ABC Corporation', rng.choice(PARTY_NAMES))
+        body = body.replace('John Doe', rng.choice(PERSON_NAMES))
+        body = re.sub(r'\$[\d,]+', lambda m: f"${rng.randint(10, 500) * 1000:,}", body)
+        body = re.sub(r'\b(thirty|sixty|ninety) \((30|60|90)\)',
+                      lambda m: rng.choice(['thirty (30)', 'sixty (60)', 'ninety (90)']), body)
+        return body
+
+    def _write_docx(self, path: str, blocks: List[Block]):
+        doc = Document()
+        words = 0
+        for heading, body in blocks:
+            doc.add_paragraph(heading)
+            paragraph = doc.add_paragraph(body)
+            words += len(body.split()) + 2
+            if words >= WORDS_PER_PAGE:
+                paragraph.add_run().add_break(WD_BREAK.PAGE)
+                words = 0
+        doc.save(path)
+
+    def _write_pdf(self, path: str, blocks: List[Block]):
+        styles = getSampleStyleSheet()
+        story = []
+        words = 0
+        for heading, body in blocks:
+            story.append(Paragraph(escape(heading), styles['Heading3']))
+            story.append(Paragraph(escape(body), styles['Normal']))
+            story.append(Spacer(1, 6))
+            words += len(body.split()) + 2
+            if words >= WORDS_PER_PAGE:
+                story.append(PageBreak())
+                words = 0
+        SimpleDocTemplate(path, pagesize=A4).build(story)
@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for pre-fork model sharing.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+``preload_app`` imports ``app.main`` once in the master, so the summarization and
+classification models are loaded a single time before the workers are forked. Workers
+inherit the weights copy-on-write: tensor storage is never written after loading, so the
+pages stay shared and memory per node stays roughly constant in the number of workers.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+
+
+def when_ready(server):
+    # Move everything allocated while loading the app into the permanent generation so the
+    # cyclic GC in the workers never touches (and thereby copies) the inherited pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections opened by the master must not be shared between processes
+    from app.database import engine
+    engine.dispose(close=False)
+
+    # Each worker gets its own small intra-op thread pool instead of all cores
+    try:
+        import torch
+        torch.set_num_threads(int(os.getenv("TORCH_THREADS_PER_WORKER", "1")))
+    except ImportError:
+        pass
+
+
+def child_exit(server, worker):
+    # Drop a dead worker's in-flight and queue gauges from the multiprocess "livesum" totals
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Contract, AnalyticsContractRollup, AnalyticsClauseRollup
+from app.services.analytics import PortfolioAnalytics
+from app.services.embedding_store import EmbeddingStore
+from app.services.pipeline import store_analysis, remove_contract
+from app.services.risk_scorer import RiskScorer
+from app.services.search_index import SearchIndex
+from app.services.similarity_index import SimilarityIndex
+
+
+@pytest.fixture
+def services(tmp_path):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    yield db, {
+        'search_index': SearchIndex(engine),
+        'similarity_index': SimilarityIndex(),
+        'embedding_store': EmbeddingStore(str(tmp_path / "embeddings")),
+        'analytics': PortfolioAnalytics()
+    }
+    db.close()
+    engine.dispose()
+
+
+def _result(clauses, risky_count=0):
+    scorer = RiskScorer()
+    clauses = [{'text': f"{category} clause {i}", 'category': category, 'risk_level': level}
+               for i, (category, level) in enumerate(clauses)]
+    risky_clauses = [{'type': 'unlimited_liability', 'risk_level': 'high', 'matched_text': 'unlimited',
+                      'context': 'unlimited liability'}] * risky_count
+    return {
+        'text': " ".join(clause['text'] for clause in clauses),
+        'summary': "Summary.",
+        'summary_mode': "fast",
+        'risk_score': scorer.calculate_risk_score(clauses, risky_clauses),
+        'risk_breakdown': scorer.get_risk_breakdown(clauses),
+        'risky_pattern_counts': scorer.get_risky_pattern_counts(risky_clauses),
+        'clauses': clauses,
+        'risky_clauses': risky_clauses,
+        'signature': SimilarityIndex().signature([clause['text'] for clause in clauses])
+    }
+
+
+def _rollups(db):
+    contracts = sorted(
+        (row.day, row.file_type, row.risk_level, row.contracts, round(row.risk_score_sum, 6))
+        for row in db.query(AnalyticsContractRollup) if row.contracts
+    )
+    clauses = sorted(
+        (row.day, row.file_type, row.category, row.risk_level, row.clauses)
+        for row in db.query(AnalyticsClauseRollup) if row.clauses
+    )
+    return contracts, clauses
+
+
+def test_rollups_after_analyze_reanalyze_and_delete_match_a_rebuild(services):
+    db, indexes = services
+    for contract_id, file_type, day in (('a', 'pdf', 1), ('b', 'docx', 1), ('c', 'pdf', 2)):
+        db.add(Contract(id=contract_id, filename=f"{contract_id}.{file_type}", file_path=f"/{contract_id}",
+                        file_type=file_type, upload_date=datetime(2026, 10, day, 12, tzinfo=timezone.utc)))
+    db.commit()
+
+    def analyze(contract_id, result):
+        store_analysis(db, db.get(Contract, contract_id), result, **indexes)
+        db.commit()
+
+    analyze('a', _result([('liability', 'high'), ('payment', 'low')], risky_count=2))
+    analyze('b', _result([('termination', 'medium'), ('general', 'low')]))
+    analyze('c', _result([('confidentiality', 'high')], risky_count=1))
+    # Re-analysis moves the contract to another score level and other clause counts
+    analyze('a', _result([('payment', 'low'), ('general', 'low'), ('jurisdiction', 'medium')]))
+    remove_contract(db, db.get(Contract, 'b'), **indexes)
+    db.commit()
+
+    incremental = _rollups(db)
+    assert indexes['analytics'].rebuild(db) == 2
+    assert _rollups(db) == incremental
+    assert sum(row[3] for row in incremental[0]) == 2
@@ -0,0 +1,23 @@
+from app.services.clause_cache import clause_key, normalize_clause
+
+
+def test_leading_numbering_is_stripped():
+    assert normalize_clause("4.2.1 Payment is due monthly.") == "payment is due monthly."
+    assert normalize_clause("(a) Payment is due monthly.") == "payment is due monthly."
+    assert normalize_clause("iv) Payment is due monthly.") == "payment is due monthly."
+    assert normalize_clause("XII. Payment is due monthly.") == "payment is due monthly."
+    assert normalize_clause("Section 12: Payment is due monthly.") == "payment is due monthly."
+
+
+def test_clause_text_that_looks_like_numbering_is_kept():
+    assert normalize_clause("30 days after delivery the invoice is due.") == "30 days after delivery the invoice is due."
+    assert normalize_clause("Civil: claims are heard in Delaware.") == "civil: claims are heard in delaware."
+    assert normalize_clause("Ill. law governs this Agreement.") == "ill. law governs this agreement."
+    assert normalize_clause("Mix) of goods as ordered.") == "mix) of goods as ordered."
+
+
+def test_clauses_that_differ_only_in_a_numeral_like_word_get_different_keys():
+    key = clause_key(normalize_clause("Civil: claims are heard in Delaware."))
+    assert key != clause_key(normalize_clause("Claims are heard in Delaware."))
+    assert clause_key(normalize_clause("2. Claims are heard in Delaware.")) == clause_key(
+        normalize_clause("vii. Claims are heard in Delaware."))
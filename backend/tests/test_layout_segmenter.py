@@ -0,0 +1,64 @@
+from app.services.layout_segmenter import LayoutSegmenter
+
+
+def _chars(lines, x0=50.0, x1=550.0, top=70.0, pitch=12.0, size=10.0, fontname='Helvetica'):
+    """pdfplumber-style characters of full-width lines, one line per text"""
+    chars = []
+    for index, text in enumerate(lines):
+        width = (x1 - x0) / len(text)
+        for position, char in enumerate(text):
+            left = x0 + position * width
+            chars.append({'text': char, 'x0': left, 'x1': left + width * 0.9, 'top': top + index * pitch,
+                          'bottom': top + index * pitch + size, 'size': size, 'fontname': fontname})
+    return chars
+
+
+def _segment(lines):
+    segmenter = LayoutSegmenter()
+    _, clauses = segmenter.segment([segmenter.page_lines(_chars(lines), 612, 1)])
+    return [clause['text'] for clause in clauses]
+
+
+def test_wrapped_lines_starting_with_a_number_stay_in_their_clause():
+    clauses = _segment([
+        "1. Termination. Either party may terminate this Agreement by giving",
+        "30 days written notice to the other party, stating the reasons for it.",
+        "2. Payment. The Customer shall pay every correct invoice within",
+        "45 business days of receipt, by bank transfer to the stated account.",
+    ])
+
+    assert len(clauses) == 2
+    assert clauses[0].startswith("1. Termination.") and "30 days written notice" in clauses[0]
+    assert clauses[1].startswith("2. Payment.") and "45 business days of receipt" in clauses[1]
+
+
+def test_numbering_with_punctuation_starts_a_clause():
+    clauses = _segment([
+        "1. The Supplier shall deliver the goods to the premises of the Customer.",
+        "2) The Customer shall inspect the goods within a reasonable period of time.",
+        "3.1. Any defect shall be notified to the Supplier in writing without delay.",
+    ])
+
+    assert [clause[:4] for clause in clauses] == ["1. T", "2) T", "3.1."]
+
+
+def test_wrapped_lines_starting_like_a_letter_or_heading_stay_in_their_clause():
+    clauses = _segment([
+        "1. Notices. Notices under this Agreement shall be given as set out in",
+        "Section 12 hereof and are effective on receipt by the other party, or",
+        "article 3 of the Framework Agreement where that agreement applies to",
+        "a. purchase order issued under it, as confirmed by the Customer.",
+    ])
+
+    assert len(clauses) == 1
+
+
+def test_section_and_article_headings_start_a_clause():
+    clauses = _segment([
+        "Section 4. Term. This Agreement remains in force for three years unless",
+        "terminated earlier in accordance with the provisions set out below.",
+        "Article 5: Warranties. The Supplier warrants that the goods conform to the",
+        "agreed specification and are free from defects in design and material.",
+    ])
+
+    assert [clause[:10] for clause in clauses] == ["Section 4.", "Article 5:"]
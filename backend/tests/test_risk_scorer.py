@@ -0,0 +1,60 @@
+import numpy as np
+
+from app.services.rescoring import _count_matrix
+from app.services.risk_scorer import RiskScorer, RISK_LEVELS
+
+
+def _clauses(breakdown):
+    return [
+        {'category': category, 'risk_level': level}
+        for category, levels in breakdown.items()
+        for level, count in levels.items()
+        for _ in range(count)
+    ]
+
+
+def _random_breakdowns(rng, contracts):
+    categories = ['termination', 'liability', 'payment', 'confidentiality', 'jurisdiction',
+                  'indemnification', 'general', 'warranty']
+    return [
+        {
+            category: dict(zip(RISK_LEVELS, rng.integers(0, 4, size=3).tolist()))
+            for category in rng.choice(categories, size=rng.integers(0, 5), replace=False)
+        }
+        for _ in range(contracts)
+    ]
+
+
+def _assert_matches_per_contract(scorer, breakdowns, risky_counts):
+    counts, categories = _count_matrix(breakdowns)
+    scores = scorer.score_matrix(counts, np.array(risky_counts, dtype=float), categories)
+
+    expected = [
+        scorer.calculate_risk_score(_clauses(breakdown), [{}] * risky)
+        for breakdown, risky in zip(breakdowns, risky_counts)
+    ]
+    assert scores.tolist() == expected
+
+
+def test_score_matrix_matches_calculate_risk_score():
+    rng = np.random.default_rng(7)
+    breakdowns = _random_breakdowns(rng, 2000)
+    _assert_matches_per_contract(RiskScorer(), breakdowns, rng.integers(0, 4, size=len(breakdowns)).tolist())
+
+
+def test_score_matrix_matches_on_rounding_ties():
+    # Weights and level scores whose averages land on .x5, where summation order decides the rounding
+    scorer = RiskScorer(category_weights={'termination': 0.1, 'liability': 0.3, 'payment': 0.7},
+                        risk_scores={'low': 10.05, 'medium': 50.15, 'high': 90.25}, risky_pattern_penalty=0.05)
+    rng = np.random.default_rng(11)
+    breakdowns = [
+        {category: dict(zip(RISK_LEVELS, rng.integers(0, 3, size=3).tolist()))
+         for category in ('termination', 'liability', 'payment')}
+        for _ in range(2000)
+    ]
+    _assert_matches_per_contract(scorer, breakdowns, rng.integers(0, 3, size=len(breakdowns)).tolist())
+
+
+def test_score_matrix_scores_contracts_without_clauses_zero():
+    scorer = RiskScorer()
+    _assert_matches_per_contract(scorer, [{}, {'payment': {'low': 0, 'medium': 0, 'high': 0}}], [2, 1])